@@ -0,0 +1,3 @@
+"""性能基准脚本
+在无麦克风、无图形界面的环境中测量各模块的延迟和资源开销
+"""
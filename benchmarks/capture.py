@@ -0,0 +1,125 @@
+"""录音采集基准测试
+
+使用合成音频设备（AUDIO_BACKEND=synthetic）驱动 AudioRecorder，不需要麦克风。
+对每种采集模式和块大小统计:
+    - 回调次数和每次回调占用的 CPU 时间（复制数据块并放入队列）
+    - 每块从采样完成到回调开始的延迟 p50/p95/最大值
+    - 松开按键到得到 WAV 字节流的耗时（停止录音流、合并数据块、编码）
+    - 丢弃的帧数和 input_overflow 次数，以及实际采集到的录音时长
+
+采集模式:
+    realtime     按实际采样速度产生数据
+    accelerated  按 --speed 倍速产生数据，测量回调和队列的吞吐上限
+    contended    实时产生数据，同时用 --load 个线程执行纯 Python 计算占用 GIL，
+                 模拟转录后处理与录音同时进行时回调被推迟和溢出的情况
+
+用法:
+    python -m benchmarks.capture
+    python -m benchmarks.capture --modes realtime contended --blocks 128 512 --seconds 5
+    python -m benchmarks.capture --file sample.wav --save capture.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+os.environ["AUDIO_BACKEND"] = "synthetic"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("HOT_PATH_LOG_LEVEL", "WARNING")
+
+MODES = ("realtime", "accelerated", "contended")
+
+
+def percentile(samples, percent):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(percent / 100 * (len(samples) - 1))))]
+
+
+def busy(stop):
+    """占用 GIL 的纯 Python 计算"""
+    while not stop.is_set():
+        sum(i * i for i in range(2000))
+
+
+def run_capture(recorder, mode, block, args):
+    os.environ["SYNTHETIC_AUDIO_BLOCK"] = str(block)
+    os.environ["SYNTHETIC_AUDIO_SPEED"] = str(args.speed if mode == "accelerated" else 1.0)
+    os.environ["SYNTHETIC_AUDIO_BUFFER"] = str(args.buffer_blocks)
+    stop_load = threading.Event()
+    load = []
+    if mode == "contended":
+        load = [threading.Thread(target=busy, args=(stop_load,), daemon=True) for _ in range(args.load)]
+        for thread in load:
+            thread.start()
+
+    overflows = recorder.metrics.counter_value("audio_overflows")
+    speed = args.speed if mode == "accelerated" else 1.0
+    recorder.start_recording()
+    stream = recorder.stream
+    time.sleep(args.seconds / speed)
+    released = time.perf_counter()
+    buffer = recorder.stop_recording()
+    stop_ms = (time.perf_counter() - released) * 1000
+    stop_load.set()
+    for thread in load:
+        thread.join()
+
+    latencies = [seconds * 1000 for seconds in stream.latencies] or [0.0]
+    return {
+        "mode": mode,
+        "block": block,
+        "callbacks": stream.callbacks,
+        "callback_cpu_us": stream.callback_cpu / max(1, stream.callbacks) * 1e6,
+        "latency_p50_ms": statistics.median(latencies),
+        "latency_p95_ms": percentile(latencies, 95),
+        "latency_max_ms": max(latencies),
+        "stop_ms": stop_ms,
+        "captured_seconds": recorder.last_audio_seconds if buffer else 0.0,
+        "frames_dropped": stream.frames_dropped,
+        "overflows": recorder.metrics.counter_value("audio_overflows") - overflows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="录音采集基准测试（合成音频设备）")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--blocks", nargs="+", type=int, default=[128, 512, 2048], help="每次回调的帧数")
+    parser.add_argument("--seconds", type=float, default=3.0, help="每次采集的录音时长")
+    parser.add_argument("--speed", type=float, default=50.0, help="accelerated 模式的倍速")
+    parser.add_argument("--load", type=int, default=2, help="contended 模式占用 GIL 的线程数")
+    parser.add_argument("--buffer-blocks", type=int, default=8, help="设备缓存的块数，积压超过后丢帧")
+    parser.add_argument("--file", help="循环播放的 WAV 文件，默认生成带噪声的音调")
+    parser.add_argument("--save", help="把结果保存为 JSON")
+    args = parser.parse_args()
+
+    if args.file:
+        os.environ["SYNTHETIC_AUDIO_FILE"] = args.file
+    from src.audio import AudioRecorder
+
+    recorder = AudioRecorder()
+    recorder.min_record_duration = 0  # 加速模式下实际耗时很短，不按时长丢弃
+
+    print(f"采样率 {recorder.sample_rate}Hz，每次采集 {args.seconds:.1f} 秒录音")
+    print(f"{'模式':<12}{'块':>6}{'回调':>7}{'CPU/次(us)':>12}{'延迟p50':>9}{'p95':>8}{'最大':>8}"
+          f"{'停止(ms)':>10}{'采集(s)':>9}{'丢帧':>7}{'溢出':>6}")
+    results = []
+    for mode in args.modes:
+        for block in args.blocks:
+            result = run_capture(recorder, mode, block, args)
+            results.append(result)
+            print(f"{mode:<12}{block:>6}{result['callbacks']:>7}{result['callback_cpu_us']:>12.1f}"
+                  f"{result['latency_p50_ms']:>9.2f}{result['latency_p95_ms']:>8.2f}{result['latency_max_ms']:>8.2f}"
+                  f"{result['stop_ms']:>10.1f}{result['captured_seconds']:>9.2f}"
+                  f"{result['frames_dropped']:>7}{result['overflows']:>6}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,442 @@
+"""录音语料回归基准测试
+
+把一个目录中的参考录音（*.wav，同名 *.txt 为期望的转录文本）按录音回调的分块方式送入
+与热键相同的处理路径：WAV 编码 -> UtterancePipeline -> 转录处理器 -> 繁简转换/翻译等后处理，
+只是不经过键盘和麦克风。统计:
+    - 各阶段（encode/queue/connect/upload/provider/download/t2s/...）和总耗时的 p50/p95/p99
+    - 上传的音频字节数
+    - 词错误率 WER 和字错误率 CER（中文按字切分，英文按空格切分）
+并可与之前保存的基线 JSON 对比，超过容差时标记为回归并以退出码 1 结束。
+
+默认启动本地模拟服务（按音频内容返回期望文本，按音频时长模拟服务端耗时），
+不消耗 API 额度，适合比较录音编码、连接复用、后处理等本地改动；
+--server real 时请求真实服务商，用于比较识别准确率和网络耗时。
+
+用法:
+    python -m benchmarks.corpus --corpus tests/corpus
+    python -m benchmarks.corpus --synthetic 20 --runs 3
+    python -m benchmarks.corpus --corpus tests/corpus --server real --platform groq
+    python -m benchmarks.corpus --corpus tests/corpus --save corpus.json
+    python -m benchmarks.corpus --corpus tests/corpus --baseline corpus.json
+"""
+import argparse
+import email.parser
+import email.policy
+import hashlib
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+import unicodedata
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+SAMPLE_RATE = 16000
+BLOCK_FRAMES = 512  # 与录音回调每次送来的帧数相近
+PERCENTS = (50, 95, 99)
+CJK = "\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff"
+CJK_TOKEN = re.compile(f"[{CJK}]|[^\\s{CJK}]+")
+
+# 与基线对比时的判定阈值
+MIN_LATENCY_DELTA_MS = 5.0  # 小于此值的变化视为噪声
+ACCURACY_TOLERANCE = 0.005  # WER/CER 的绝对增量
+
+
+# ---------------- 语料 ----------------
+
+
+def load_corpus(directory):
+    """读取目录中的 *.wav 和同名 *.txt，返回 [(名称, float32 采样, 期望文本或 None)]"""
+    import numpy as np
+    import soundfile as sf
+
+    items = []
+    for path in sorted(Path(directory).glob("*.wav")):
+        audio, sample_rate = sf.read(path, dtype="float32", always_2d=True)
+        audio = audio.mean(axis=1)  # 与录音一致，转为单声道
+        if sample_rate != SAMPLE_RATE:
+            positions = np.arange(0, len(audio), sample_rate / SAMPLE_RATE)
+            audio = np.interp(positions, np.arange(len(audio)), audio).astype("float32")
+        transcript = path.with_suffix(".txt")
+        expected = transcript.read_text(encoding="utf-8").strip() if transcript.exists() else None
+        items.append((path.stem, audio.reshape(-1, 1), expected))
+    if not items:
+        raise SystemExit(f"{directory} 中没有 .wav 文件")
+    return items
+
+
+def synthetic_corpus(count, seed=0):
+    """生成 1~8 秒的合成录音（带噪声的音调），只适合配合模拟服务测试延迟"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    items = []
+    for index in range(count):
+        seconds = rng.uniform(1.0, 8.0)
+        t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+        audio = 0.2 * np.sin(2 * np.pi * rng.uniform(150, 400) * t) + 0.02 * rng.standard_normal(len(t))
+        items.append((f"synthetic-{index:03d}", audio.astype("float32").reshape(-1, 1), f"合成语音 {index} 号样本"))
+    return items
+
+
+# ---------------- 准确率 ----------------
+
+
+def normalize(text):
+    """统一全半角、大小写，去掉标点和多余空白"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = "".join(" " if unicodedata.category(ch)[0] in "PS" else ch for ch in text)
+    return " ".join(text.split())
+
+
+def tokenize(text):
+    """中日韩文字按字切分，其余按空格切分"""
+    return CJK_TOKEN.findall(text)
+
+
+def edit_distance(reference, hypothesis):
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref in enumerate(reference, 1):
+        current = [i]
+        for j, hyp in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref != hyp)))
+        previous = current
+    return previous[-1]
+
+
+class AccuracyCounter:
+    """累计整个语料的编辑距离，WER/CER = 总编辑距离 / 参考文本总长度"""
+
+    def __init__(self):
+        self.word_errors = self.words = self.char_errors = self.chars = 0
+
+    def add(self, expected, actual):
+        reference, hypothesis = normalize(expected), normalize(actual)
+        self.word_errors += edit_distance(tokenize(reference), tokenize(hypothesis))
+        self.words += len(tokenize(reference))
+        reference, hypothesis = reference.replace(" ", ""), hypothesis.replace(" ", "")
+        self.char_errors += edit_distance(reference, hypothesis)
+        self.chars += len(reference)
+
+    def result(self):
+        if not self.words:
+            return None, None
+        return self.word_errors / self.words, self.char_errors / max(1, self.chars)
+
+
+# ---------------- 模拟服务 ----------------
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """模拟转录和对话接口
+
+    - /v1/audio/transcriptions、/v1/audio/translations：按上传音频的哈希返回期望文本，
+      SiliconFlow 返回 JSON，Groq（response_format=text）返回纯文本
+    - /v1/chat/completions：原样返回用户消息，翻译、标点、润色不改变文本
+    """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # 响应头和响应体分两次写入，避免 Nagle 与延迟确认叠加的 40ms 等待
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server = self.server
+        if self.path.endswith("/chat/completions"):
+            messages = json.loads(body).get("messages", [])
+            content = messages[-1]["content"] if messages else ""
+            time.sleep(server.chat_ms / 1000)
+            self._reply(200, "application/json", json.dumps(
+                {"choices": [{"message": {"role": "assistant", "content": content}}]}, ensure_ascii=False))
+            return
+        if not self.path.endswith(("/audio/transcriptions", "/audio/translations")):
+            self._reply(404, "application/json", '{"error": "not found"}')
+            return
+        if random.random() < server.error_rate:
+            self._reply(500, "application/json", '{"error": "injected failure"}')
+            return
+        fields = self._parse_form(body)
+        audio = fields.get("file", b"")
+        text = server.transcripts.get(hashlib.sha1(audio).hexdigest(), "")
+        # 16 位单声道 WAV，按音频时长模拟服务端推理耗时
+        audio_seconds = max(0, len(audio) - 44) / (SAMPLE_RATE * 2)
+        delay = server.base_ms + server.per_second_ms * audio_seconds
+        time.sleep(max(0.0, random.gauss(delay, delay * server.jitter)) / 1000)
+        if fields.get("response_format", b"").decode() == "text":
+            self._reply(200, "text/plain; charset=utf-8", text)
+        else:
+            self._reply(200, "application/json", json.dumps({"text": text}, ensure_ascii=False))
+
+    def _parse_form(self, body):
+        header = f"Content-Type: {self.headers.get('Content-Type', '')}\r\n\r\n".encode()
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(header + body)
+        return {
+            part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+            for part in message.iter_parts()
+        }
+
+    def _reply(self, status, content_type, text):
+        data = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer:
+    def __init__(self, base_ms=150.0, per_second_ms=30.0, chat_ms=80.0, jitter=0.1, error_rate=0.0):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        self.server.daemon_threads = True
+        self.server.transcripts = {}
+        self.server.base_ms = base_ms
+        self.server.per_second_ms = per_second_ms
+        self.server.chat_ms = chat_ms
+        self.server.jitter = jitter
+        self.server.error_rate = error_rate  # 随机返回 500 的转录请求比例
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def register(self, wav_bytes, text):
+        self.server.transcripts[hashlib.sha1(wav_bytes).hexdigest()] = text
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="stand-in", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# ---------------- 运行 ----------------
+
+
+def configure_environment(args, server):
+    """在创建处理器之前设置服务地址和 API KEY"""
+    os.environ["SERVICE_PLATFORM"] = args.platform
+    os.environ.setdefault("TRACE_ENABLED", "false")  # 由基准测试自己收集追踪，不写入追踪文件和历史记录
+    os.environ.setdefault("AUDIO_BACKEND", "synthetic")  # 只用到 WAV 编码，不需要麦克风
+    if server is None:
+        return
+    os.environ["GROQ_BASE_URL"] = server.base_url
+    os.environ["SILICONFLOW_BASE_URL"] = server.base_url
+    os.environ["GROQ_API_KEY"] = "benchmark"
+    os.environ["SILICONFLOW_API_KEY"] = "benchmark"
+    no_proxy = os.environ.get("NO_PROXY", "")
+    os.environ["NO_PROXY"] = ",".join(filter(None, [no_proxy, "127.0.0.1", "localhost"]))
+
+
+def run_corpus(items, args, server):
+    import numpy as np
+
+    from src.audio import encode_wav
+    from src.pipeline import RemoteProcessor, UtterancePipeline
+    from src.transcription import create_processor
+    from src.utils.tracing import Trace
+
+    if args.split:
+        processor = RemoteProcessor(args.platform)
+    else:
+        processor = create_processor(args.platform)
+    processor.warm_up()
+
+    if server is not None:
+        for _, audio, expected in items:
+            server.register(encode_wav(audio, SAMPLE_RATE).getvalue(), expected or "")
+
+    results = []
+    labels = {}  # trace_id -> (名称, 期望文本)
+    done = threading.Condition()
+    slots = threading.Semaphore(args.concurrency)
+
+    def process(audio, mode, trace):
+        result = processor.process_audio(audio, mode=mode, prompt="", trace=trace)
+        return result if isinstance(result, tuple) else (result, None)
+
+    def deliver(text, error, trace):
+        trace.finish()
+        with done:
+            results.append((*labels.pop(trace.trace_id), text, error, trace.to_dict()))
+            done.notify_all()
+        slots.release()
+
+    pipeline = UtterancePipeline(process=process, deliver=deliver, workers=args.concurrency)
+    submitted = 0
+    for run in range(args.runs):
+        for name, audio, expected in items:
+            slots.acquire()
+            # 与录音回调一样按块收集采样，再走录音结束时的合并和编码
+            blocks = [audio[i:i + BLOCK_FRAMES].copy() for i in range(0, len(audio), BLOCK_FRAMES)]
+            trace = Trace(args.mode)
+            labels[trace.trace_id] = (name, expected)
+            with trace.span("encode"):
+                buffer = encode_wav(np.concatenate(blocks), SAMPLE_RATE)
+            trace.set(audio_seconds=round(len(audio) / SAMPLE_RATE, 2))
+            pipeline.submit(buffer, args.mode, trace)
+            submitted += 1
+    with done:
+        done.wait_for(lambda: len(results) >= submitted)
+    pipeline.shutdown()
+    if args.split:
+        processor.close()
+    return results
+
+
+def percentile(samples, percent):
+    samples = sorted(samples)
+    last = len(samples) - 1
+    return samples[min(last, int(round(percent / 100 * last)))]
+
+
+def summarize(results, args):
+    stages = {}
+    accuracy = AccuracyCounter()
+    upload_bytes = errors = 0
+    for _, expected, text, error, data in results:
+        if error:
+            errors += 1
+            continue
+        upload_bytes += data.get("audio_bytes", 0)
+        stages.setdefault("total", []).append(data["total_ms"])
+        for span in data["spans"]:
+            stages.setdefault(span["name"], []).append(span["duration_ms"])
+        if expected is not None and args.mode == "transcriptions":
+            accuracy.add(expected, text)
+    wer, cer = accuracy.result()
+    ok = len(results) - errors
+    return {
+        "platform": args.platform,
+        "server": args.server,
+        "mode": args.mode,
+        "split": args.split,
+        "utterances": len(results),
+        "errors": errors,
+        "upload_bytes": upload_bytes,
+        "upload_bytes_per_utterance": round(upload_bytes / ok) if ok else 0,
+        "wer": None if wer is None else round(wer, 4),
+        "cer": None if cer is None else round(cer, 4),
+        "stages": {
+            name: {
+                "count": len(values),
+                **{f"p{p}_ms": round(percentile(values, p), 1) for p in PERCENTS},
+                "mean_ms": round(statistics.fmean(values), 1),
+            }
+            for name, values in stages.items()
+        },
+    }
+
+
+def compare(result, baseline, tolerance):
+    """返回 [(指标, 基线, 当前, 是否回归)]"""
+    rows = []
+    for stage, current in result["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            delta = current[key] - base[key]
+            regressed = delta > MIN_LATENCY_DELTA_MS and current[key] > base[key] * (1 + tolerance)
+            rows.append((f"{stage}.{key}", base[key], current[key], regressed))
+    for key in ("wer", "cer"):
+        if result.get(key) is not None and baseline.get(key) is not None:
+            rows.append((key, baseline[key], result[key], result[key] - baseline[key] > ACCURACY_TOLERANCE))
+    key = "upload_bytes_per_utterance"
+    if baseline.get(key):
+        rows.append((key, baseline[key], result[key], result[key] > baseline[key] * (1 + tolerance)))
+    key = "errors"
+    if key in baseline:
+        rows.append((key, baseline[key], result[key], result[key] > baseline[key]))
+    return rows
+
+
+def print_result(result, results, verbose):
+    print(f"平台: {result['platform']}  服务: {result['server']}  模式: {result['mode']}"
+          f"{'  拆分进程' if result['split'] else ''}")
+    print(f"语音: {result['utterances']}  失败: {result['errors']}  "
+          f"上传: {result['upload_bytes'] / 1024:.1f} KB（每句 {result['upload_bytes_per_utterance'] / 1024:.1f} KB）")
+    if result["wer"] is not None:
+        print(f"WER: {result['wer']:.2%}  CER: {result['cer']:.2%}")
+    print(f"\n{'阶段':<14}{'次数':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'平均':>10}  (ms)")
+    order = ["encode", "queue", "connect", "upload", "provider", "download", "t2s", "translate",
+             "add_symbol", "optimize", "handoff", "total"]
+    # 未列出的阶段排在 total 之前
+    rank = {name: index for index, name in enumerate(order)}
+    for name in sorted(result["stages"], key=lambda n: (rank.get(n, rank["total"] - 0.5), n)):
+        stage = result["stages"][name]
+        print(f"{name:<14}{stage['count']:>6}{stage['p50_ms']:>10.1f}{stage['p95_ms']:>10.1f}"
+              f"{stage['p99_ms']:>10.1f}{stage['mean_ms']:>10.1f}")
+    if verbose:
+        print()
+        for name, expected, text, error, data in results:
+            status = error or ("✓" if expected is None or normalize(expected) == normalize(text) else f"≠ {expected}")
+            print(f"{name:<24}{data['total_ms']:>8.0f}ms  {text or ''}  {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="录音语料回归基准测试")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--corpus", help="参考录音目录（*.wav 和同名 *.txt）")
+    source.add_argument("--synthetic", type=int, metavar="N", help="使用 N 段合成录音（只适合模拟服务）")
+    parser.add_argument("--platform", default=os.getenv("SERVICE_PLATFORM", "siliconflow"),
+                        help="转录服务平台 (groq / siliconflow)")
+    parser.add_argument("--server", choices=["standin", "real"], default="standin",
+                        help="standin 使用本地模拟服务，real 请求真实服务商")
+    parser.add_argument("--mode", choices=["transcriptions", "translations"], default="transcriptions")
+    parser.add_argument("--runs", type=int, default=1, help="整个语料重复的次数")
+    parser.add_argument("--concurrency", type=int, default=1, help="同时处理的语音数，1 表示逐句处理")
+    parser.add_argument("--split", action="store_true", help="使用拆分进程模式（PROCESS_MODE=split）")
+    parser.add_argument("--server-latency-ms", type=float, default=150.0, help="模拟服务的基础耗时")
+    parser.add_argument("--server-ms-per-second", type=float, default=30.0, help="模拟服务每秒音频增加的耗时")
+    parser.add_argument("--verbose", action="store_true", help="逐句输出识别结果")
+    parser.add_argument("--save", help="把结果保存为 JSON，作为之后对比的基线")
+    parser.add_argument("--baseline", help="与之前保存的 JSON 结果对比")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="延迟和上传字节的相对容差")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    server = None
+    if args.server == "standin":
+        server = StandInServer(args.server_latency_ms, args.server_ms_per_second).start()
+    configure_environment(args, server)
+
+    items = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.synthetic)
+    results = run_corpus(items, args, server)
+    if server is not None:
+        server.stop()
+
+    result = summarize(results, args)
+    print_result(result, results, args.verbose)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\n与基线对比 ({args.baseline})")
+        mismatched = [key for key in ("platform", "server", "mode", "split") if baseline.get(key) != result[key]]
+        if mismatched:
+            print(f"注意: 基线的 {', '.join(mismatched)} 与本次运行不同，结果可能不可比")
+        for name, base, current, regressed in compare(result, baseline, args.tolerance):
+            print(f"{name:<28}{base:>10} -> {current:<10}{'  ⚠ 回归' if regressed else ''}")
+            if regressed:
+                regressions.append(name)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    if regressions:
+        print(f"\n发现 {len(regressions)} 项回归: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""按键阈值检测的空闲唤醒次数对比
+
+旧实现：每次按下启动一个线程，每 10 毫秒轮询一次按键持续时间。
+新实现：共享的 TimerScheduler，只在截止时间到达时唤醒。
+
+用法:
+    python -m benchmarks.idle_wakeups [--seconds 3]
+"""
+import argparse
+import resource
+import threading
+import time
+
+from src.utils.scheduler import TimerScheduler
+
+PRESS_DURATION_THRESHOLD = 0.5
+
+
+def _context_switches():
+    """进程累计的主动上下文切换次数（线程睡眠/唤醒都会计入）"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_nvcsw
+
+
+def measure_polling(seconds):
+    """旧实现：按住按键期间 10 毫秒轮询"""
+    state = {"pressed": True, "press_time": time.time(), "triggered": False, "wakeups": 0}
+
+    def check_duration():
+        while state["pressed"]:
+            state["wakeups"] += 1
+            if not state["triggered"] and time.time() - state["press_time"] >= PRESS_DURATION_THRESHOLD:
+                state["triggered"] = True
+            time.sleep(0.01)
+
+    switches = _context_switches()
+    thread = threading.Thread(target=check_duration, daemon=True)
+    thread.start()
+    time.sleep(seconds)
+    state["pressed"] = False
+    thread.join()
+    return state["wakeups"], _context_switches() - switches
+
+
+def measure_scheduler(seconds):
+    """新实现：截止时间驱动的定时器"""
+    scheduler = TimerScheduler()
+    scheduler.start()
+    triggered = threading.Event()
+
+    switches = _context_switches()
+    wakeups = scheduler.wakeups
+    scheduler.call_later(PRESS_DURATION_THRESHOLD, triggered.set)
+    time.sleep(seconds)
+    wakeups = scheduler.wakeups - wakeups
+    switches = _context_switches() - switches
+    scheduler.stop()
+    return wakeups, switches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按键阈值检测的空闲唤醒次数对比")
+    parser.add_argument("--seconds", type=float, default=3.0, help="模拟按住按键的时长（秒）")
+    args = parser.parse_args()
+
+    print(f"模拟按住按键 {args.seconds:.1f} 秒，阈值 {PRESS_DURATION_THRESHOLD} 秒")
+    print(f"{'实现':<12}{'唤醒/秒':>12}{'上下文切换/秒':>16}")
+    for name, measure in (("10ms 轮询", measure_polling), ("定时器堆", measure_scheduler)):
+        wakeups, switches = measure(args.seconds)
+        print(f"{name:<12}{wakeups / args.seconds:>12.1f}{switches / args.seconds:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""键盘事件回放
+
+使用虚拟键盘、虚拟剪贴板和可控时钟驱动 KeyboardManager 的状态机，
+统计状态切换延迟、丢失的按键释放以及按键阈值与释放之间的竞争。
+
+trace 文件为 JSONL，每行一个事件:
+    {"t": 0.00, "type": "press", "key": "alt"}
+    {"t": 0.80, "type": "release", "key": "alt"}
+
+用法:
+    python -m benchmarks.replay_keys trace.jsonl
+    python -m benchmarks.replay_keys --generate 500 --save trace.jsonl
+    python -m benchmarks.replay_keys --generate 200 --realtime --load 4
+    python -m benchmarks.replay_keys --generate 200 --realtime --speed 8
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+
+os.environ["INPUT_DRIVER"] = "virtual"
+os.environ.setdefault("TRANSCRIPTIONS_BUTTON", "alt")
+os.environ.setdefault("TRANSLATIONS_BUTTON", "shift")
+os.environ.setdefault("IPC_EVENTS", "false")
+
+from src.keyboard.clipboard import ClipboardService
+from src.keyboard.listener import KeyboardManager
+from src.keyboard.virtual import Key, VirtualClipboardBackend, VirtualController, VirtualListener
+from src.utils.scheduler import ManualScheduler, TimerScheduler
+
+MIN_RECORD_DURATION = 1.0  # 与 AudioRecorder.min_record_duration 一致
+NEAR_THRESHOLD_WINDOW = 0.02  # 在阈值前后 20 毫秒内释放视为竞争窗口
+
+
+def generate_trace(cycles, seed=None):
+    """生成随机按键序列：轻点、阈值附近释放、过短录音、正常录音和翻译模式"""
+    rng = random.Random(seed)
+    events = []
+    t = 0.0
+    for _ in range(cycles):
+        kind = rng.choice(["tap", "near_threshold", "too_short", "normal", "normal", "translate"])
+        hold = {
+            "tap": rng.uniform(0.05, 0.4),
+            "near_threshold": rng.uniform(0.48, 0.52),
+            "too_short": rng.uniform(0.6, 1.4),
+            "normal": rng.uniform(1.6, 5.0),
+            "translate": rng.uniform(1.6, 5.0),
+        }[kind]
+        if kind == "translate":
+            events.append({"t": round(t, 4), "type": "press", "key": "shift"})
+            t += rng.uniform(0.02, 0.1)
+        events.append({"t": round(t, 4), "type": "press", "key": "alt"})
+        t += hold
+        if kind == "translate":
+            events.append({"t": round(t, 4), "type": "release", "key": "shift"})
+            t += rng.uniform(0.0, 0.05)
+        events.append({"t": round(t, 4), "type": "release", "key": "alt"})
+        t += rng.uniform(0.05, 1.5)
+    return events
+
+
+def load_trace(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class TracedKeyboardManager(KeyboardManager):
+    """记录状态切换和事件处理延迟的 KeyboardManager"""
+
+    def __init__(self, *args, **kwargs):
+        self.transitions = []
+        self.dispatch_latencies = []
+        self.stale_holds = 0
+        self._enqueued = deque()
+        super().__init__(*args, **kwargs)
+
+    @KeyboardManager.state.setter
+    def state(self, new_state):
+        if new_state != self._state:
+            self.transitions.append((self.scheduler.clock(), self._state, new_state))
+        KeyboardManager.state.fset(self, new_state)
+
+    def on_press(self, key):
+        self._enqueued.append(time.perf_counter())
+        super().on_press(key)
+
+    def on_release(self, key):
+        self._enqueued.append(time.perf_counter())
+        super().on_release(key)
+
+    def _dispatch(self, event):
+        super()._dispatch(event)
+        if event[0] in ("press", "release"):
+            # 从入队到状态机处理完成的耗时
+            self.dispatch_latencies.append(time.perf_counter() - self._enqueued.popleft())
+
+    def _handle_hold(self, press_time):
+        if not self.option_pressed or self.option_press_time != press_time:
+            self.stale_holds += 1
+        super()._handle_hold(press_time)
+
+
+class ScaledScheduler(TimerScheduler):
+    """加速的实时定时器：时钟按 speed 倍速前进，等待的真实时间相应缩短
+
+    按键时刻、按住阈值、录音时长和模拟的转录耗时都按这个时钟计算，加速回放时不会因为
+    真实时间变短而把录音判为过短。
+    """
+
+    def __init__(self, speed):
+        origin = time.monotonic()
+        self.speed = speed
+        super().__init__(clock=lambda: (time.monotonic() - origin) * speed, name="scaled-scheduler")
+
+    def _pop_due(self):
+        due, timeout = super()._pop_due()
+        return due, None if timeout is None else timeout / self.speed
+
+
+class ReplayHarness:
+    """在虚拟设备上回放按键序列"""
+
+    def __init__(self, realtime=False, processing_delay=0.8, speed=1.0):
+        self.realtime = realtime
+        self.processing_delay = processing_delay
+        self.speed = speed
+        self.scheduler = ScaledScheduler(speed) if realtime else ManualScheduler()
+        self.clipboard = ClipboardService(VirtualClipboardBackend("原始剪贴板"))
+        self.controller = VirtualController(self.clipboard.backend)
+        self.listener = None
+        self.record_starts = 0
+        self.record_stops = 0
+        self.too_short = 0
+        self.expected_text = []
+        self._record_start_time = None
+        self.manager = TracedKeyboardManager(
+            on_record_start=self._record_start,
+            on_record_stop=self._record_stop,
+            on_translate_start=self._record_start,
+            on_translate_stop=self._record_stop,
+            on_reset_state=lambda: None,
+            scheduler=self.scheduler,
+            controller=self.controller,
+            listener_factory=self._create_listener,
+            clipboard=self.clipboard,
+        )
+
+    def _create_listener(self, on_press, on_release):
+        self.listener = VirtualListener(on_press=on_press, on_release=on_release)
+        return self.listener
+
+    def _record_start(self):
+        self.record_starts += 1
+        self._record_start_time = self.scheduler.clock()
+
+    def _record_stop(self):
+        """模拟 VoiceAssistant：过短录音重置状态，否则延迟交付识别结果"""
+        self.record_stops += 1
+        if self.scheduler.clock() - self._record_start_time < MIN_RECORD_DURATION:
+            self.too_short += 1
+            self.manager.reset_state()
+            return False
+        text = f"[句子{self.record_stops}]"
+        self.expected_text.append(text)
+        self.scheduler.call_later(self.processing_delay, self.manager.deliver_result, text, None)
+        return True
+
+    def _emit(self, event):
+        key = Key[event["key"]]
+        if event["type"] == "press":
+            self.listener.emit_press(key)
+        else:
+            self.listener.emit_release(key)
+
+    def run(self, events):
+        """回放事件，返回统计结果"""
+        lost_releases = 0
+        near_threshold = 0
+        press_times = {}
+        threshold = self.manager.PRESS_DURATION_THRESHOLD
+
+        if self.realtime:
+            threading.Thread(target=self.manager.start_listening, daemon=True).start()
+            while self.listener is None:
+                time.sleep(0.001)
+            origin = self.scheduler.clock()
+        else:
+            self._create_listener(self.manager.on_press, self.manager.on_release)
+
+        for event in events:
+            if self.realtime:
+                delay = (origin + event["t"] - self.scheduler.clock()) / self.speed
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                self._advance_to(event["t"])
+
+            self._emit(event)
+            if not self.realtime:
+                self.manager.dispatch_pending()
+
+            if event["key"] == "alt":
+                if event["type"] == "press":
+                    press_times["alt"] = event["t"]
+                else:
+                    held = event["t"] - press_times.get("alt", event["t"])
+                    if abs(held - threshold) <= NEAR_THRESHOLD_WINDOW:
+                        near_threshold += 1
+                    if not self.realtime and self.manager.state.is_recording:
+                        lost_releases += 1
+
+        # 等待所有结果交付和消息清除
+        drain = self.processing_delay + 3.0
+        if self.realtime:
+            time.sleep(drain / self.speed)
+        else:
+            self._advance_to(events[-1]["t"] + drain if events else drain)
+
+        latencies = sorted(self.manager.dispatch_latencies)
+        document = self.controller.text
+        return {
+            "events": len(events),
+            "transitions": len(self.manager.transitions),
+            "dispatch_ms_p50": _percentile(latencies, 50) * 1000,
+            "dispatch_ms_p99": _percentile(latencies, 99) * 1000,
+            "dispatch_ms_max": (latencies[-1] if latencies else 0.0) * 1000,
+            "record_starts": self.record_starts,
+            "record_stops": self.record_stops,
+            "too_short": self.too_short,
+            "lost_releases": lost_releases,
+            "stuck_recording": int(self.manager.state.is_recording),
+            "near_threshold_releases": near_threshold,
+            "stale_holds": self.manager.stale_holds,
+            "final_state": self.manager.state.name,
+            "document_ok": document == "".join(self.expected_text),
+            "clipboard_restored": self.clipboard.backend.get() == "原始剪贴板",
+        }
+
+    def _advance_to(self, deadline):
+        """推进虚拟时钟，每个到期任务后立即处理它产生的事件"""
+        while True:
+            next_deadline = self.scheduler.next_deadline()
+            if next_deadline is None or next_deadline > deadline:
+                break
+            self.scheduler.advance_to(next_deadline)
+            self.manager.dispatch_pending()
+        self.scheduler.advance_to(deadline)
+
+
+def _percentile(values, percent):
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def _start_load(threads):
+    """启动纯 Python 计算线程，模拟 GIL 争用"""
+    stop = threading.Event()
+
+    def spin():
+        while not stop.is_set():
+            sum(i * i for i in range(1000))
+
+    for _ in range(threads):
+        threading.Thread(target=spin, daemon=True).start()
+    return stop
+
+
+def main():
+    parser = argparse.ArgumentParser(description="键盘事件回放")
+    parser.add_argument("trace", nargs="?", help="JSONL 格式的按键序列")
+    parser.add_argument("--generate", type=int, metavar="N", help="生成 N 轮随机按键序列")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+    parser.add_argument("--save", help="保存生成的按键序列")
+    parser.add_argument("--realtime", action="store_true", help="使用真实时钟和分发线程回放")
+    parser.add_argument("--speed", type=float, default=1.0, help="实时回放的加速倍数")
+    parser.add_argument("--load", type=int, default=0, help="实时回放时的并发计算线程数")
+    parser.add_argument("--processing-delay", type=float, default=0.8, help="模拟的转录耗时（秒）")
+    args = parser.parse_args()
+
+    if args.trace:
+        events = load_trace(args.trace)
+    elif args.generate:
+        events = generate_trace(args.generate, args.seed)
+    else:
+        parser.error("需要指定 trace 文件或 --generate")
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event) + "\n")
+
+    stop_load = _start_load(args.load) if args.load else None
+    try:
+        harness = ReplayHarness(realtime=args.realtime, processing_delay=args.processing_delay, speed=args.speed)
+        result = harness.run(events)
+    finally:
+        if stop_load:
+            stop_load.set()
+
+    for name, value in result.items():
+        print(f"{name:<26}{value:.3f}" if isinstance(value, float) else f"{name:<26}{value}")
+
+
+if __name__ == "__main__":
+    main()
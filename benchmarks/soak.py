@@ -0,0 +1,254 @@
+"""长时间运行（soak）测试
+
+连续处理数千句合成语音，检查常驻进程是否随时间增长：
+    录音（AudioRecorder，AUDIO_BACKEND=synthetic 手动送入数据）-> WAV 编码 -> UtterancePipeline
+    -> 转录处理器（本地模拟服务）-> 追踪记录 / 历史记录写入
+其中按比例混入录音过短（丢弃录音）和服务端返回 500 的语音。
+
+预热若干句之后记录基线，之后每隔一段采样常驻内存、线程数、打开的文件描述符数和
+tracemalloc 统计的 Python 内存；结束时输出增长最多的分配位置，任一项增长超过预算时
+以退出码 1 结束。
+
+用法:
+    python -m benchmarks.soak
+    python -m benchmarks.soak --utterances 5000 --concurrency 2 --save soak.json
+    python -m benchmarks.soak --rss-budget-mb 10 --no-tracemalloc
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from .corpus import SAMPLE_RATE, BLOCK_FRAMES, StandInServer, configure_environment, synthetic_corpus
+
+MB = 1024 * 1024
+
+
+def measure():
+    from src.utils.resources import process_resources
+
+    gc.collect()
+    sample = process_resources()
+    sample["traced_bytes"] = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+    return sample
+
+
+class SoakRunner:
+    def __init__(self, args, server):
+        from src.audio import AudioRecorder, encode_wav
+        from src.history import start_history_writer
+        from src.pipeline import UtterancePipeline
+        from src.transcription import create_processor
+        from src.utils.tracing import get_trace_recorder
+
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.recorder = AudioRecorder()
+        self.processor = create_processor(args.platform)
+        self.processor.warm_up()
+        self.items = synthetic_corpus(args.pool, seed=args.seed)
+        for _, audio, expected in self.items:
+            server.register(encode_wav(audio, SAMPLE_RATE).getvalue(), expected)
+
+        # 与 main.py 相同的追踪监听器，记录和历史文件写到临时目录
+        self.trace_recorder = get_trace_recorder()
+        self.history_writer = start_history_writer()
+        if self.history_writer is not None:
+            self.trace_recorder.listeners.append(self.history_writer.add)
+
+        self.slots = threading.Semaphore(args.concurrency)
+        self.idle = threading.Condition()
+        self.pending = 0
+        self.counts = {"delivered": 0, "errors": 0, "too_short": 0}
+        self.pipeline = UtterancePipeline(process=self.process, deliver=self.deliver, workers=args.concurrency)
+
+    def process(self, audio, mode, trace):
+        result = self.processor.process_audio(audio, mode=mode, prompt="", trace=trace)
+        return result if isinstance(result, tuple) else (result, None)
+
+    def deliver(self, text, error, trace):
+        if error:
+            self.counts["errors"] += 1
+            trace.finish(error=error)
+        else:
+            trace.finish(text=text, text_chars=len(text or ""))
+        self.counts["delivered"] += 1
+        with self.idle:
+            self.pending -= 1
+            self.idle.notify_all()
+        self.slots.release()
+
+    def utterance(self):
+        """模拟一次按键录音：过短的录音被丢弃，其余提交处理"""
+        from src.utils.tracing import Trace
+
+        _, audio, _ = self.rng.choice(self.items)
+        too_short = self.rng.random() < self.args.too_short_rate
+        trace = Trace("transcriptions", self.trace_recorder)
+        self.recorder.start_recording()
+        self.recorder.stream.feed(audio)
+        if not too_short:
+            # 录音按实际时长计算，不必真的等待
+            self.recorder.record_start_time -= len(audio) / SAMPLE_RATE
+        with trace.span("encode"):
+            buffer = self.recorder.stop_recording()
+        if buffer == "TOO_SHORT":
+            self.counts["too_short"] += 1
+            return
+        self.slots.acquire()
+        with self.idle:
+            self.pending += 1
+        self.pipeline.submit(buffer, "transcriptions", trace)
+
+    def wait_idle(self):
+        with self.idle:
+            self.idle.wait_for(lambda: self.pending == 0)
+
+    def close(self):
+        self.pipeline.shutdown()
+        if self.history_writer is not None:
+            self.history_writer.close()
+
+
+def check_budgets(baseline, final, args):
+    """返回 [(指标, 基线, 结束, 增长, 预算, 是否超出)]"""
+    budgets = [
+        ("rss_mb", "rss_bytes", MB, args.rss_budget_mb),
+        ("threads", "threads", 1, args.thread_budget),
+        ("open_fds", "open_fds", 1, args.fd_budget),
+        ("traced_mb", "traced_bytes", MB, args.tracemalloc_budget_mb),
+    ]
+    rows = []
+    for name, key, unit, budget in budgets:
+        if baseline[key] is None or final[key] is None:
+            continue
+        start, end = baseline[key] / unit, final[key] / unit
+        rows.append((name, start, end, end - start, budget, end - start > budget))
+    return rows
+
+
+def print_sample(count, sample):
+    traced = "-" if sample["traced_bytes"] is None else f"{sample['traced_bytes'] / MB:.1f}"
+    rss = "-" if sample["rss_bytes"] is None else f"{sample['rss_bytes'] / MB:.1f}"
+    fds = "-" if sample["open_fds"] is None else sample["open_fds"]
+    print(f"{count:>8}{rss:>10}{traced:>10}{sample['threads']:>8}{fds:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="长时间运行测试：内存、线程和文件描述符增长")
+    parser.add_argument("--utterances", type=int, default=2000, help="处理的语音总数")
+    parser.add_argument("--warmup", type=int, default=200, help="预热的语音数，之后记录基线")
+    parser.add_argument("--sample-every", type=int, default=200, help="每处理多少句采样一次")
+    parser.add_argument("--concurrency", type=int, default=2, help="同时处理的语音数")
+    parser.add_argument("--pool", type=int, default=20, help="循环使用的合成录音数量")
+    parser.add_argument("--too-short-rate", type=float, default=0.1, help="录音过短被丢弃的比例")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="模拟服务返回 500 的比例")
+    parser.add_argument("--platform", default="siliconflow", help="转录服务平台 (groq / siliconflow)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-tracemalloc", action="store_true", help="不统计 Python 内存分配（运行更快）")
+    parser.add_argument("--top", type=int, default=10, help="输出增长最多的分配位置数量")
+    parser.add_argument("--rss-budget-mb", type=float, default=20.0, help="允许的常驻内存增长")
+    parser.add_argument("--tracemalloc-budget-mb", type=float, default=5.0, help="允许的 Python 内存增长")
+    parser.add_argument("--thread-budget", type=int, default=1, help="允许增加的线程数")
+    parser.add_argument("--fd-budget", type=int, default=2, help="允许增加的文件描述符数")
+    parser.add_argument("--save", help="把采样和结果保存为 JSON")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    workdir = tempfile.mkdtemp(prefix="soak-")
+    os.environ["TRACE_ENABLED"] = "true"
+    os.environ["TRACE_FILE"] = os.path.join(workdir, "traces.jsonl")
+    os.environ["HISTORY_FILE"] = os.path.join(workdir, "history.db")
+    os.environ["IPC_EVENTS"] = "false"
+    # 合成音频设备的手动模式：每句录音由测试线程一次性送入回调
+    os.environ["AUDIO_BACKEND"] = "synthetic"
+    os.environ["SYNTHETIC_AUDIO_SPEED"] = "0"
+    os.environ["SYNTHETIC_AUDIO_BLOCK"] = str(BLOCK_FRAMES)
+    # 注入的失败和过短录音会大量输出错误日志
+    os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+    os.environ.setdefault("HOT_PATH_LOG_LEVEL", "CRITICAL")
+
+    server = StandInServer(base_ms=5.0, per_second_ms=1.0, chat_ms=1.0, error_rate=args.error_rate).start()
+    configure_environment(args, server)
+    runner = SoakRunner(args, server)
+
+    if not args.no_tracemalloc:
+        tracemalloc.start()
+    print(f"工作目录: {workdir}")
+    print(f"{'语音':>8}{'RSS(MB)':>10}{'Py(MB)':>10}{'线程':>8}{'FD':>8}")
+
+    samples = []
+    baseline = snapshot = None
+    started = time.perf_counter()
+    for count in range(1, args.utterances + 1):
+        runner.utterance()
+        if count == args.warmup or count % args.sample_every == 0 or count == args.utterances:
+            runner.wait_idle()
+            sample = measure()
+            sample["utterances"] = count
+            samples.append(sample)
+            print_sample(count, sample)
+            if count == args.warmup:
+                baseline = sample
+                snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+    elapsed = time.perf_counter() - started
+    final = samples[-1]
+    top = []
+    if snapshot is not None:
+        stats = tracemalloc.take_snapshot().compare_to(snapshot, "lineno")
+        top = [stat for stat in stats if stat.size_diff > 0][:args.top]
+    runner.close()
+    server.stop()
+
+    counts = runner.counts
+    print(f"\n共 {args.utterances} 句（提交 {counts['delivered']}，过短 {counts['too_short']}，"
+          f"失败 {counts['errors']}），耗时 {elapsed:.1f} 秒")
+    if baseline is None:
+        print("语音数不超过预热数，没有基线可以比较")
+        return 0
+    if top:
+        print(f"\n预热后增长最多的 {len(top)} 个分配位置:")
+        for stat in top:
+            frame = stat.traceback[0]
+            print(f"{stat.size_diff / 1024:>+10.1f} KB {stat.count_diff:>+8}  {frame.filename}:{frame.lineno}")
+
+    print(f"\n{'指标':<12}{'基线':>10}{'结束':>10}{'增长':>10}{'预算':>10}")
+    over = []
+    rows = check_budgets(baseline, final, args)
+    for name, start, end, growth, budget, exceeded in rows:
+        print(f"{name:<12}{start:>10.1f}{end:>10.1f}{growth:>+10.1f}{budget:>10.1f}{'  ⚠ 超出' if exceeded else ''}")
+        if exceeded:
+            over.append(name)
+
+    if args.save:
+        result = {
+            "args": vars(args),
+            "counts": counts,
+            "elapsed_seconds": round(elapsed, 1),
+            "samples": samples,
+            "budgets": [dict(zip(("name", "baseline", "final", "growth", "budget", "exceeded"), row)) for row in rows],
+            "top_allocations": [
+                {"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                 "size_diff": stat.size_diff, "count_diff": stat.count_diff}
+                for stat in top
+            ],
+        }
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    if over:
+        print(f"\n超出预算: {', '.join(over)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
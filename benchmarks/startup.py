@@ -0,0 +1,139 @@
+"""启动耗时基准测试
+
+在子进程中以 `python -X importtime` 导入 main 并创建转录处理器，统计:
+    - 进程启动到处理器就绪的总耗时
+    - import main 和创建处理器各自的耗时
+    - 导入耗时最多的模块，以及 openai / opencc 等重量级依赖是否在启动路径上被导入
+
+用法:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --platform groq --runs 10
+    python -m benchmarks.startup --save startup.json
+    python -m benchmarks.startup --baseline startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# 启动路径上应当避免的重量级依赖
+HEAVY_MODULES = [
+    "openai", "opencc", "requests", "PyQt5", "numpy", "soundfile", "sounddevice", "pynput", "httpx",
+]
+
+SNIPPET = """
+import json, os, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+from src.transcription import create_processor
+processor = create_processor(os.environ["SERVICE_PLATFORM"])
+ready = time.perf_counter()
+if os.environ.get("BENCHMARK_WARM_UP") == "true":
+    processor.warm_up()
+warmed = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "construct_ms": (ready - imported) * 1000,
+    "warm_up_ms": (warmed - ready) * 1000,
+}))
+"""
+
+
+def parse_importtime(stderr):
+    """解析 -X importtime 输出，返回 {模块: (自身耗时 us, 累计耗时 us, 层级)}"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(parts[0]), int(parts[1]), depth)
+    return modules
+
+
+def run_once(platform, warm_up=False):
+    env = dict(os.environ)
+    env["SERVICE_PLATFORM"] = platform
+    env["BENCHMARK_WARM_UP"] = "true" if warm_up else "false"
+    # 创建处理器只检查 API KEY 是否存在，不会发出请求
+    env.setdefault("GROQ_API_KEY", "benchmark")
+    env.setdefault("SILICONFLOW_API_KEY", "benchmark")
+    env.setdefault("METRICS_ENABLED", "false")
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", SNIPPET],
+        capture_output=True, text=True, env=env
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "子进程启动失败")
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["wall_ms"] = wall_ms
+    return timings, parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时基准测试")
+    parser.add_argument("--platform", default=os.getenv("SERVICE_PLATFORM", "siliconflow"),
+                        help="转录服务平台 (groq / siliconflow)")
+    parser.add_argument("--runs", type=int, default=5, help="重复次数，取中位数")
+    parser.add_argument("--top", type=int, default=15, help="显示导入耗时最多的前 N 个模块")
+    parser.add_argument("--warm-up", action="store_true", help="同时统计后台预热的耗时")
+    parser.add_argument("--save", help="把结果保存为 JSON，便于跟踪")
+    parser.add_argument("--baseline", help="与之前保存的 JSON 结果对比")
+    args = parser.parse_args()
+
+    runs = []
+    modules = {}
+    for _ in range(args.runs):
+        timings, modules = run_once(args.platform, args.warm_up)
+        runs.append(timings)
+
+    summary = {
+        key: statistics.median(run[key] for run in runs)
+        for key in ("wall_ms", "import_ms", "construct_ms", "warm_up_ms")
+    }
+    heavy = {name: modules[name][1] / 1000 for name in HEAVY_MODULES if name in modules}
+    result = {
+        "platform": args.platform,
+        "runs": args.runs,
+        **{key: round(value, 1) for key, value in summary.items()},
+        "heavy_modules_ms": {name: round(value, 1) for name, value in heavy.items()},
+    }
+
+    print(f"平台: {args.platform}  重复 {args.runs} 次（中位数）")
+    for key in ("wall_ms", "import_ms", "construct_ms", "warm_up_ms"):
+        print(f"{key:<20}{summary[key]:>10.1f}")
+
+    print(f"\n导入耗时最多的 {args.top} 个模块（累计毫秒，最后一次运行）")
+    for name, (self_us, cumulative_us, depth) in sorted(
+            modules.items(), key=lambda item: item[1][1], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>10.1f}  {'  ' * depth}{name}")
+
+    print("\n启动路径上的重量级依赖")
+    for name in HEAVY_MODULES:
+        print(f"{name:<20}{f'{heavy[name]:.1f} ms' if name in heavy else '未导入'}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\n与基线对比 ({args.baseline})")
+        for key in ("wall_ms", "import_ms", "construct_ms", "warm_up_ms"):
+            if key in baseline:
+                delta = result[key] - baseline[key]
+                print(f"{key:<20}{baseline[key]:>10.1f} -> {result[key]:>8.1f}  ({delta:+.1f})")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,37 @@ from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QPushButton, QPlainTextEdit, QLineEdit,
     QHBoxLayout, QLabel, QGroupBox, QGraphicsDropShadowEffect
 )
-from PyQt5.QtCore import QFileSystemWatcher, QTimer
+from PyQt5.QtCore import QFileSystemWatcher, QObject, pyqtSignal
 from PyQt5.QtGui import QDesktopServices, QColor
+from PyQt5.QtNetwork import QHostAddress, QUdpSocket
+import json
 import os
 from dotenv import load_dotenv
 import subprocess
+import sys
+import threading
 import os
 from src.utils.logger import logger
+from src.utils.ipc import get_ipc_address
+from src.utils.supervisor import Supervisor
+from src.utils.tail import LogTailer
+from src.ui import DashboardPanel, HistoryPanel
+
+
+class LogSignal(QObject):
+    """把后台线程读取到的日志转发到界面线程"""
+    lines = pyqtSignal(str)
+
+
+class SupervisorSignal(QObject):
+    """把监督线程的进程事件转发到界面线程"""
+    event = pyqtSignal(str, object)
 
 
 class ControlUI(QWidget):
+    LOG_PATH = 'logs/app.log'
+    DEFAULT_LOG_VIEW_MAX_LINES = 5000
+
     def __init__(self):
         super().__init__()
         
@@ -22,7 +43,7 @@ class ControlUI(QWidget):
         # 清空日志文件
         if not os.path.exists('logs'):
             os.makedirs('logs')
-        with open('logs/app.log', 'w') as f:
+        with open(self.LOG_PATH, 'w') as f:
             f.truncate(0)
             
         logger.info("初始化控制界面")
@@ -36,25 +57,24 @@ class ControlUI(QWidget):
         # 加载环境变量
         self.reload_env()
         
-        # 初始化进程
+        # 初始化进程（SUPERVISOR_ENABLED=true 时由监督器管理活动进程和备用进程）
         self.process = None
+        self.supervisor = None
+        self.supervisor_signal = SupervisorSignal()
+        self.supervisor_signal.event.connect(self.handle_supervisor_event)
+
+        # 订阅主程序的状态事件
+        self.init_ipc()
         
-        # 初始化日志监控
-        self.log_watcher = QFileSystemWatcher(['logs/app.log'])
-        self.log_watcher.fileChanged.connect(self.update_log_view)
-        
-        # 记录日志文件读取位置
-        self._log_file_pos = 0
-        
-        # 初始化定时器
-        self.log_timer = QTimer()
-        self.log_timer.timeout.connect(self.update_log_view)
-        self.log_timer.start(500)  # 每500ms更新一次
+        # 初始化日志监控：在后台线程中读取新增内容，按批次追加到界面
+        self.log_signal = LogSignal()
+        self.log_signal.lines.connect(self.append_log)
+        self.log_tailer = LogTailer(self.LOG_PATH, self.log_signal.lines.emit).start()
         
     def init_ui(self):
         """初始化界面"""
         self.setWindowTitle('主程序控制')
-        self.setGeometry(300, 300, 800, 600)
+        self.setGeometry(300, 300, 900, 800)
         
         # 设置窗口样式
         # 设置窗口阴影效果
@@ -237,6 +257,12 @@ class ControlUI(QWidget):
         self.start_btn = QPushButton('启动')
         self.start_btn.clicked.connect(self.start_main)
         button_layout.addWidget(self.start_btn)
+
+        # 创建重启按钮（切换到已预热的备用进程）
+        self.restart_btn = QPushButton('重启')
+        self.restart_btn.clicked.connect(self.restart_main)
+        self.restart_btn.setEnabled(False)
+        button_layout.addWidget(self.restart_btn)
         
         # 创建关闭按钮
         self.stop_btn = QPushButton('关闭')
@@ -253,10 +279,29 @@ class ControlUI(QWidget):
         button_layout.addWidget(self.stop_btn)
         
         layout.addLayout(button_layout)
+
+        # 创建主程序进程状态显示
+        self.process_label = QLabel("主程序: 未启动")
+        layout.addWidget(self.process_label)
+
+        # 创建状态显示（主程序配置 STATUS_SINK=socket 时由事件通道驱动）
+        self.status_label = QLabel("状态: 未连接")
+        layout.addWidget(self.status_label)
+
+        # 创建实时性能面板（由主程序发布的状态和追踪事件驱动）
+        self.dashboard = DashboardPanel()
+        layout.addWidget(self.dashboard)
+
+        # 创建历史记录搜索（读取主程序写入的历史记录数据库）
+        self.history_panel = HistoryPanel()
+        layout.addWidget(self.history_panel)
         
         # 创建日志显示区域
         self.log_view = QPlainTextEdit()
         self.log_view.setReadOnly(True)
+        # 只保留最近的日志行，超出后自动丢弃最早的内容
+        self.log_view.setMaximumBlockCount(
+            int(os.getenv('LOG_VIEW_MAX_LINES', self.DEFAULT_LOG_VIEW_MAX_LINES)))
         self.log_view.setStyleSheet("""
             QPlainTextEdit {
                 background-color: #2d2d2d;
@@ -290,6 +335,29 @@ class ControlUI(QWidget):
         
         self.setLayout(layout)
         
+    def init_ipc(self):
+        """监听主程序发布的本地事件"""
+        host, port = get_ipc_address()
+        self.ipc_socket = QUdpSocket(self)
+        if not self.ipc_socket.bind(QHostAddress(host), port):
+            logger.warning(f"无法监听事件端口 {host}:{port}，状态显示不可用")
+            return
+        self.ipc_socket.readyRead.connect(self.read_ipc_events)
+
+    def read_ipc_events(self):
+        """读取并分发所有待处理的事件"""
+        while self.ipc_socket.hasPendingDatagrams():
+            datagram = self.ipc_socket.receiveDatagram()
+            try:
+                event = json.loads(bytes(datagram.data()).decode('utf-8'))
+            except ValueError:
+                continue
+            if event.get('type') == 'status':
+                self.status_label.setText(f"状态: {event.get('message') or '空闲'}")
+            else:
+                self.dashboard.handle_event(event)
+                self.history_panel.handle_event(event)
+
     def get_api_key(self):
         """获取当前输入的API Key"""
         return self.api_key_input.text().strip()
@@ -352,50 +420,71 @@ class ControlUI(QWidget):
             self.log_view.setPlainText("请先输入SILICONFLOW API Key")
             return
             
-        if self.process is None:
+        if self.process is None and self.supervisor is None:
             logger.info("启动主程序")
-            self.process = subprocess.Popen(["python", "main.py"])
+            if os.getenv('SUPERVISOR_ENABLED', 'true').lower() == 'true':
+                self.supervisor = Supervisor(
+                    on_event=lambda event, **fields: self.supervisor_signal.event.emit(event, fields),
+                    standby=os.getenv('SUPERVISOR_STANDBY', 'true').lower() == 'true'
+                ).start()
+                self.restart_btn.setEnabled(True)
+            else:
+                self.process = subprocess.Popen([sys.executable, "main.py"])
+            self.process_label.setText("主程序: 正在启动...")
             self.start_btn.setEnabled(False)
             self.stop_btn.setEnabled(True)
-            
-            # 初始化日志显示
-            self.update_log_view()
+
+    def restart_main(self):
+        """重启main.py：切换到备用进程，旧进程处理完当前语音后退出"""
+        if self.supervisor is not None:
+            logger.info("重启主程序")
+            self.supervisor.restart()
     
     def stop_main(self):
         """停止main.py"""
-        if self.process is not None:
+        if self.supervisor is not None:
+            logger.info("停止主程序")
+            # 等待处理中的语音完成可能需要几秒，不阻塞界面
+            threading.Thread(target=self.supervisor.stop, name="supervisor-stop", daemon=True).start()
+            self.supervisor = None
+            self.process_label.setText("主程序: 正在停止...")
+        elif self.process is not None:
             logger.info("停止主程序")
             self.process.terminate()
             self.process = None
-            self.start_btn.setEnabled(True)
-            self.stop_btn.setEnabled(False)
+            self.process_label.setText("主程序: 已停止")
+        self.start_btn.setEnabled(True)
+        self.restart_btn.setEnabled(False)
+        self.stop_btn.setEnabled(False)
+
+    def handle_supervisor_event(self, event, fields):
+        """显示监督器报告的进程事件"""
+        if event == "activated":
+            self.process_label.setText(f"主程序: 运行中 (PID {fields['pid']})")
+        elif event == "standby":
+            text = self.process_label.text().split("，")[0]
+            self.process_label.setText(f"{text}，备用进程已就绪 (PID {fields['pid']})")
+        elif event == "crashed":
+            self.process_label.setText(
+                f"主程序: 进程 {fields['pid']} 异常退出 (退出码 {fields['code']})，"
+                f"{fields['backoff']:.0f} 秒后补充备用进程")
+        elif event == "stopped":
+            self.process_label.setText("主程序: 已停止")
     
-    def update_log_view(self):
-        """实时更新日志显示"""
-        try:
-            with open('logs/app.log', 'r', encoding='utf-8') as f:
-                # 跳转到上次读取位置
-                f.seek(self._log_file_pos)
-                
-                # 读取新增内容
-                new_content = f.read()
-                
-                # 更新文件位置
-                self._log_file_pos = f.tell()
-                
-                # 如果文件被清空或轮转，重置位置
-                if self._log_file_pos > os.path.getsize('logs/app.log'):
-                    self._log_file_pos = 0
-                    new_content = f.read()
-                
-                # 追加新内容到日志视图
-                if new_content:
-                    self.log_view.appendPlainText(new_content)
-                    self.log_view.verticalScrollBar().setValue(
-                        self.log_view.verticalScrollBar().maximum()
-                    )
-        except FileNotFoundError:
-            self.log_view.setPlainText('日志文件不存在')
+    def append_log(self, text):
+        """追加一批新日志，只在已滚动到底部时跟随最新内容"""
+        scroll_bar = self.log_view.verticalScrollBar()
+        at_bottom = scroll_bar.value() >= scroll_bar.maximum()
+        self.log_view.appendPlainText(text)
+        if at_bottom:
+            scroll_bar.setValue(scroll_bar.maximum())
+
+    def closeEvent(self, event):
+        """关闭窗口时停止主程序和日志读取线程"""
+        if self.supervisor is not None:
+            self.supervisor.stop()
+        self.log_tailer.stop()
+        super().closeEvent(event)
 
 if __name__ == "__main__":
     app = QApplication([])
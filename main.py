@@ -1,15 +1,26 @@
 import os
 import sys
+import threading
+import time
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from src.audio.archive import start_audio_archiver
 from src.audio.recorder import AudioRecorder
+from src.history import start_history_writer
 from src.keyboard.listener import KeyboardManager, check_accessibility_permissions
-from src.transcription.whisper import WhisperProcessor
-from src.utils.logger import logger
-from src.transcription.senseVoiceSmall import SenseVoiceSmallProcessor
+from src.pipeline import RemoteProcessor, UtterancePipeline
+from src.transcription import create_processor
+from src.utils.ipc import get_publisher, ipc_events_enabled
+from src.utils.config import ConfigWatcher
+from src.utils.logger import apply_log_levels, enable_file_logging, get_dropped_count, get_queue_depth, logger
+from src.utils.metrics import get_registry, start_metrics_server
+from src.utils.profiling import get_profiler, profile_thread
+from src.utils.resources import register_resource_gauges
+from src.utils.supervisor import WorkerChannel
+from src.utils.tracing import Trace, get_trace_recorder, span
 
 
 def check_microphone_permissions():
@@ -26,6 +37,23 @@ def check_microphone_permissions():
     logger.warning("===============================\n")
 
 class VoiceAssistant:
+    # 配置热更新时按变化的键决定如何生效
+    PROCESSOR_KEYS = {"SERVICE_PLATFORM"}  # 重新创建转录处理器
+    POST_PROCESSING_KEYS = {  # 在原处理器上重新读取，保留连接和缓存
+        "CONVERT_TO_SIMPLIFIED", "ADD_SYMBOL", "OPTIMIZE_RESULT", "GROQ_ADD_SYMBOL_MODEL",
+        "SILICONFLOW_API_KEY", "SILICONFLOW_TRANSLATE_MODEL", "SILICONFLOW_BASE_URL",
+    }
+    KEYBOARD_KEYS = {  # 由键盘分发线程重新读取
+        "TRANSCRIPTIONS_BUTTON", "TRANSLATIONS_BUTTON", "SYSTEM_PLATFORM", "STATUS_SINK",
+        "INJECT_TYPE_MAX_CHARS", "INJECT_CHUNK_SIZE", "INJECT_SETTLE_MS",
+    }
+    LOG_KEYS = {"LOG_LEVEL", "HOT_PATH_LOG_LEVEL"}
+    LIVE_KEYS = {  # 每次使用时读取，无需处理
+        "KEEP_ORIGINAL_CLIPBOARD", "CONFIG_WATCH_INTERVAL", "TIMEOUT_CONNECT", "TIMEOUT_UPLOAD_KBPS",
+        "TIMEOUT_READ_FACTOR", "TIMEOUT_READ_MIN", "TIMEOUT_READ_MAX", "TIMEOUT_RETRY",
+        "ROUTER_OVERRIDE", "ROUTER_PROBE_RATE", "ROUTER_EWMA_ALPHA", "ROUTER_FAILOVER",
+    }
+
     def __init__(self, audio_processor):
         self.audio_recorder = AudioRecorder()
         self.audio_processor = audio_processor
@@ -36,51 +64,87 @@ class VoiceAssistant:
             on_translate_stop=self.stop_translation_recording,
             on_reset_state=self.reset_state
         )
+        # 追踪文件、历史记录和录音保存在 run() 中创建，备用进程接管前不打开这些文件
+        self.trace_recorder = None
+        self.history_writer = None
+        self.audio_archiver = None
+        self.current_trace = None  # 正在录音的语音片段的追踪记录
+        self._capture_start = None
+        self.pipeline = UtterancePipeline(
+            process=self.process_utterance,
+            deliver=self.keyboard_manager.deliver_result
+        )
+        self.metrics_server = None
+        self.api_server = None
+        self.config_watcher = None
+        self._warmed_up = False
     
     def start_transcription_recording(self):
         """开始录音（转录模式）"""
-        self.audio_recorder.start_recording()
+        self._start_recording(mode="transcriptions")
     
     def stop_transcription_recording(self):
-        """停止录音并处理（转录模式）"""
-        audio = self.audio_recorder.stop_recording()
-        if audio == "TOO_SHORT":
-            logger.warning("录音时长太短，状态将重置")
-            self.keyboard_manager.reset_state()
-        elif audio:
-            result = self.audio_processor.process_audio(
-                audio,
-                mode="transcriptions",
-                prompt=""
-            )
-            # 解构返回值
-            text, error = result if isinstance(result, tuple) else (result, None)
-            self.keyboard_manager.type_text(text, error)
-        else:
-            logger.error("没有录音数据，状态将重置")
-            self.keyboard_manager.reset_state()
+        """停止录音并提交处理（转录模式）"""
+        return self._submit_recording(mode="transcriptions")
     
     def start_translation_recording(self):
         """开始录音（翻译模式）"""
-        self.audio_recorder.start_recording()
+        self._start_recording(mode="translations")
+
+    def _start_recording(self, mode):
+        """开始录音，并从按下按键的时刻开始追踪这段语音"""
+        trace = None
+        if self.trace_recorder is not None:
+            press_time = self.keyboard_manager.option_press_time
+            trace = Trace(mode, self.trace_recorder, start_time=press_time)
+            if press_time is not None:
+                trace.add_span("hold", press_time)
+        with span(trace, "stream_open"):
+            self.audio_recorder.start_recording()
+        self.current_trace = trace
+        self._capture_start = time.monotonic()
     
     def stop_translation_recording(self):
-        """停止录音并处理（翻译模式）"""
-        audio = self.audio_recorder.stop_recording()
+        """停止录音并提交处理（翻译模式）"""
+        return self._submit_recording(mode="translations")
+
+    def _submit_recording(self, mode):
+        """停止录音并将音频加入处理队列
+
+        Returns:
+            bool: 是否成功提交，结果稍后由处理队列按顺序交付
+        """
+        trace, self.current_trace = self.current_trace, None
+        if trace is not None:
+            trace.add_span("capture", self._capture_start)
+        with profile_thread(trace), span(trace, "encode"):
+            audio = self.audio_recorder.stop_recording()
         if audio == "TOO_SHORT":
             logger.warning("录音时长太短，状态将重置")
             self.keyboard_manager.reset_state()
         elif audio:
-            result = self.audio_processor.process_audio(
-                    audio,
-                    mode="translations",
-                    prompt=""
-                )
-            text, error = result if isinstance(result, tuple) else (result, None)
-            self.keyboard_manager.type_text(text,error)
+            if trace is not None:
+                trace.set(audio_seconds=round(self.audio_recorder.last_audio_seconds, 2))
+            samples = self.audio_recorder.take_last_audio()
+            if self.audio_archiver is not None:
+                self.audio_archiver.submit(samples, self.audio_recorder.sample_rate, mode, trace)
+            self.pipeline.submit(audio, mode, trace)
+            return True
         else:
             logger.error("没有录音数据，状态将重置")
             self.keyboard_manager.reset_state()
+        return False
+
+    def process_utterance(self, audio, mode, trace=None):
+        """在工作线程中处理一段录音（转录或翻译）"""
+        result = self.audio_processor.process_audio(
+            audio,
+            mode=mode,
+            prompt="",
+            trace=trace
+        )
+        # 解构返回值
+        return result if isinstance(result, tuple) else (result, None)
 
     def reset_state(self):
         """重置状态"""
@@ -88,21 +152,157 @@ class VoiceAssistant:
     
     def run(self):
         """运行语音助手"""
+        enable_file_logging()
         logger.info("=== 语音助手已启动 ===")
+        self.start_sinks()
+        self.start_metrics()
+        if os.getenv("API_ENABLED", "false").lower() == "true":
+            # 本地转录接口与热键共用同一个处理器，客户端和缓存只创建一次；
+            # 未开启时不导入，启动时不加载 http.server 等模块
+            from src.api import start_api_server
+            self.api_server = start_api_server(self.process_utterance)
+        threading.Thread(target=self.warm_up, name="warm-up", daemon=True).start()
+        if os.getenv("CONFIG_WATCH", "true").lower() == "true":
+            self.config_watcher = ConfigWatcher(on_change=self.apply_config).start()
         self.keyboard_manager.start_listening()
 
+    def start_sinks(self):
+        """创建追踪记录及其监听器（事件通道、历史记录、录音保存、性能分析）
+
+        由 run() 调用：监督进程的备用进程接管后才写这些文件，不会与活动进程同时滚动
+        同一个追踪文件，也不会各自统计录音目录的配额。
+        """
+        self.trace_recorder = get_trace_recorder()
+        if self.trace_recorder is not None and ipc_events_enabled():
+            # 每句语音完成后把追踪记录发送给控制界面
+            publisher = get_publisher()
+            self.trace_recorder.listeners.append(lambda data: publisher.publish("trace", trace=data))
+        # 识别文本和各阶段耗时随追踪记录一起批量写入历史记录数据库
+        self.history_writer = start_history_writer() if self.trace_recorder is not None else None
+        if self.history_writer is not None:
+            self.trace_recorder.listeners.append(self.history_writer.add)
+        # 录音在后台编码保存，语音完成后把识别结果补充到元数据
+        self.audio_archiver = start_audio_archiver()
+        if self.audio_archiver is not None and self.trace_recorder is not None:
+            self.trace_recorder.listeners.append(self.audio_archiver.on_trace)
+        # 性能分析按追踪记录判断语音是否完成、是否超过阈值
+        profiler = get_profiler()
+        if profiler is not None:
+            if self.trace_recorder is None:
+                logger.warning("性能分析需要开启 TRACE_ENABLED，本次不会保存任何分析文件")
+            else:
+                self.trace_recorder.listeners.append(profiler.on_trace)
+
+    def health(self):
+        """供监督进程检查的运行状态"""
+        return {
+            "state": self.keyboard_manager.state.name,
+            "pending": self.pipeline.pending,
+        }
+
+    def drain(self, timeout=10.0):
+        """停止接收新录音，等正在进行的录音和处理中的语音输入完成后停止监听"""
+        keyboard_manager = self.keyboard_manager
+        keyboard_manager.stop_accepting()
+        api_server = self.api_server
+        if api_server is not None:
+            # 先释放端口，重启时新进程可以立即接管
+            api_server.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        logger.info("正在停止，等待处理中的语音完成...")
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if (not keyboard_manager.option_pressed and not keyboard_manager.state.is_recording
+                    and not self.pipeline.pending and not keyboard_manager.pending_utterances
+                    and not keyboard_manager.queued_events
+                    and (api_server is None or not api_server.in_flight)):
+                break
+            time.sleep(0.05)
+        else:
+            logger.warning(f"等待处理中的语音超时 ({timeout}秒)")
+        if self.config_watcher is not None:
+            self.config_watcher.stop()
+        keyboard_manager.stop_listening()
+
+    def apply_config(self, changed):
+        """应用 .env 中变化的配置（在配置监控线程中调用）"""
+        processor = self.audio_processor
+        remote = isinstance(processor, RemoteProcessor)
+        if remote:
+            # 拆分进程模式下转录进程有自己的环境变量，先同步变化的配置
+            processor.sync_env(changed)
+        if changed & (self.PROCESSOR_KEYS | set(processor.CLIENT_KEYS)):
+            platform = os.getenv("SERVICE_PLATFORM", "siliconflow")
+            try:
+                if remote:
+                    processor.switch(platform)
+                    new_processor = processor
+                else:
+                    new_processor = create_processor(platform)
+                    new_processor.warm_up()
+            except Exception as e:
+                logger.error(f"切换转录服务失败，继续使用原配置: {e}")
+            else:
+                # 一次赋值完成切换，已在处理中的录音继续使用原处理器
+                self.audio_processor = new_processor
+                logger.info(f"转录服务已切换: {platform}")
+        elif changed & self.POST_PROCESSING_KEYS:
+            processor.reconfigure()
+            logger.info("后处理配置已更新")
+
+        if changed & self.KEYBOARD_KEYS:
+            self.keyboard_manager.reload_config()
+        if changed & self.LOG_KEYS:
+            apply_log_levels()
+
+        restart_keys = changed - (
+            self.PROCESSOR_KEYS | set(processor.CLIENT_KEYS) | self.POST_PROCESSING_KEYS
+            | self.KEYBOARD_KEYS | self.LOG_KEYS | self.LIVE_KEYS
+        )
+        if restart_keys:
+            logger.warning(f"以下配置需要重启后生效: {', '.join(sorted(restart_keys))}")
+
+    def warm_up(self):
+        """在后台创建 API 客户端、加载繁简转换表并列出音频设备，不阻塞按键监听"""
+        if self._warmed_up:
+            return
+        start_time = time.perf_counter()
+        try:
+            self.audio_processor.warm_up()
+            self.audio_recorder.list_audio_devices()
+        except Exception as e:
+            logger.warning(f"预热失败，将在首次使用时重试: {e}")
+            return
+        self._warmed_up = True
+        logger.info(f"预热完成, 耗时: {(time.perf_counter() - start_time) * 1000:.0f}毫秒")
+
+    def start_metrics(self):
+        """注册队列深度等瞬时指标，并按配置启动本地指标接口"""
+        registry = get_registry()
+        registry.gauge("pipeline_pending", lambda: self.pipeline.pending)
+        registry.gauge("keyboard_event_queue", lambda: self.keyboard_manager.queued_events)
+        registry.gauge("log_queue", get_queue_depth)
+        registry.counter_callback("log_dropped", get_dropped_count)
+        register_resource_gauges(registry)
+        self.metrics_server = start_metrics_server(registry)
+
 def main():
-    # 判断是 Whisper 还是 SiliconFlow
+    # 判断是 Whisper 还是 SiliconFlow，只导入选中的服务
     service_platform = os.getenv("SERVICE_PLATFORM", "siliconflow")
-    if service_platform == "groq":
-        audio_processor = WhisperProcessor()
-    elif service_platform == "siliconflow":
-        audio_processor = SenseVoiceSmallProcessor()
+    if os.getenv("PROCESS_MODE", "single").lower() == "split":
+        # 转录和后处理在单独的进程中执行，本进程只负责录音、按键和文本输入
+        audio_processor = RemoteProcessor(service_platform)
     else:
-        raise ValueError(f"无效的服务平台: {service_platform}")
+        audio_processor = create_processor(service_platform)
     try:
         assistant = VoiceAssistant(audio_processor)
-        assistant.run()
+        # 由控制界面的监督进程启动时，先作为备用进程预热，收到激活命令后再监听按键
+        channel = WorkerChannel.from_env()
+        if channel is not None:
+            channel.serve(assistant)
+        else:
+            assistant.run()
     except Exception as e:
         error_msg = str(e)
         if "Input event monitoring will not be possible" in error_msg:
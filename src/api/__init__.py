@@ -0,0 +1,7 @@
+"""本地转录接口模块
+通过 localhost HTTP 或 Unix 域套接字接收其他程序上传的音频，返回识别结果
+"""
+
+from .server import APIServer, start_api_server
+
+__all__ = ['APIServer', 'start_api_server']
@@ -0,0 +1,376 @@
+import io
+import json
+import os
+import socketserver
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from ..utils.logger import hot_logger, logger
+from ..utils.metrics import get_registry
+from ..utils.tracing import Trace, get_trace_recorder
+
+DEFAULT_API_PORT = 28733
+
+# 请求路径 -> 处理模式
+ROUTES = {
+    "/v1/audio/transcriptions": "transcriptions",
+    "/v1/audio/translations": "translations",
+}
+
+
+class RequestError(Exception):
+    """请求无效或无法接收，转换为对应的 HTTP 状态码返回"""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class APIRequestHandler(BaseHTTPRequestHandler):
+    """本地转录接口
+
+    POST /v1/audio/transcriptions 或 /v1/audio/translations，请求体为音频文件（WAV 等），
+    也可以用 ?format=pcm&sample_rate=16000&channels=1 上传 16 位小端 PCM；
+    支持 Content-Length 和 chunked 分块上传，边录边传时上传与录音同时进行。
+    GET /health 返回当前的处理和排队数量。
+    """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # 响应头和响应体分两次写入，避免 Nagle 与延迟确认叠加的 40ms 等待
+
+    def do_GET(self):
+        if urlsplit(self.path).path != "/health":
+            self._send_json(404, {"error": "not found"})
+            return
+        self._send_json(200, {"status": "ok", **self.server.api.status()})
+
+    def do_POST(self):
+        api = self.server.api
+        url = urlsplit(self.path)
+        mode = ROUTES.get(url.path)
+        status = 500
+        try:
+            if mode is None:
+                raise RequestError(404, "not found")
+            self._check_token(api.token)
+            # 先占用名额再接收上传，队列已满时直接拒绝，不读取请求体
+            if not api.admit():
+                raise RequestError(503, "服务繁忙，请稍后重试", {"Retry-After": "1"})
+            try:
+                status, payload = self._transcribe(api, mode, parse_qs(url.query))
+            finally:
+                api.release()
+        except RequestError as e:
+            status, payload = e.status, {"error": str(e)}
+            # 请求体可能还没有读取，不能继续复用这个连接
+            self.close_connection = True
+            self._send_json(status, payload, e.headers)
+        else:
+            self._send_json(status, payload)
+        finally:
+            api.registry.inc("api_requests", status=str(status), mode=mode or "none")
+
+    def _check_token(self, token):
+        if token and self.headers.get("Authorization", "") != f"Bearer {token}":
+            raise RequestError(401, "unauthorized")
+
+    def _transcribe(self, api, mode, query):
+        trace = Trace(mode, api.trace_recorder) if api.trace_recorder is not None else None
+        if trace is not None:
+            trace.set(source="api")
+
+        start = time.monotonic()
+        audio = self._read_body(api.max_upload_bytes)
+        if query.get("format", [""])[0] == "pcm":
+            audio = self._wrap_pcm(audio, query)
+        if trace is not None:
+            trace.add_span("receive", start)
+
+        queued_at = time.monotonic()
+        if not api.acquire_slot():
+            raise RequestError(503, f"排队超过 {api.queue_timeout:.0f} 秒", {"Retry-After": "1"})
+        try:
+            if trace is not None:
+                trace.add_span("queue", queued_at)
+            text, error = api.process(audio, mode, trace)
+        except Exception as e:
+            logger.error(f"本地接口处理失败: {e}", exc_info=True)
+            if trace is not None:
+                trace.finish(error=str(e))
+            return 500, {"error": str(e)}
+        finally:
+            api.release_slot()
+
+        if trace is not None:
+            if error:
+                trace.finish(error=error)
+            else:
+                trace.finish(text=text or "", text_chars=len(text or ""))
+        if error:
+            return 502, {"error": error}
+        return 200, {
+            "text": text or "",
+            "mode": mode,
+            "duration_ms": round((time.monotonic() - start) * 1000, 1),
+        }
+
+    def _read_body(self, limit):
+        """读取请求体，返回 BytesIO"""
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            return self._read_chunked(limit)
+        length = self.headers.get("Content-Length")
+        if length is None:
+            raise RequestError(411, "需要 Content-Length 或 chunked 分块上传")
+        try:
+            length = int(length)
+        except ValueError:
+            raise RequestError(400, "无效的 Content-Length") from None
+        if length > limit:
+            raise RequestError(413, f"音频超过 {limit // (1024 * 1024)}MB")
+        if length == 0:
+            raise RequestError(400, "请求体为空")
+        data = self.rfile.read(length)
+        if len(data) < length:
+            raise RequestError(400, "请求体不完整")
+        return io.BytesIO(data)
+
+    def _read_chunked(self, limit):
+        buffer = io.BytesIO()
+        while True:
+            line = self.rfile.readline(65537)
+            try:
+                size = int(line.split(b";", 1)[0].strip(), 16)
+            except ValueError:
+                raise RequestError(400, "无效的分块编码") from None
+            if size == 0:
+                # 跳过可能存在的 trailer
+                while self.rfile.readline(65537) not in (b"\r\n", b"\n", b""):
+                    pass
+                break
+            if buffer.tell() + size > limit:
+                raise RequestError(413, f"音频超过 {limit // (1024 * 1024)}MB")
+            chunk = self.rfile.read(size)
+            if len(chunk) < size:
+                raise RequestError(400, "请求体不完整")
+            buffer.write(chunk)
+            self.rfile.readline()
+        if buffer.tell() == 0:
+            raise RequestError(400, "请求体为空")
+        buffer.seek(0)
+        return buffer
+
+    @staticmethod
+    def _wrap_pcm(audio, query):
+        """给原始 PCM 加上 WAV 头"""
+        try:
+            sample_rate = int(query.get("sample_rate", ["16000"])[0])
+            channels = int(query.get("channels", ["1"])[0])
+        except ValueError:
+            raise RequestError(400, "无效的 sample_rate 或 channels") from None
+        wrapped = io.BytesIO()
+        with wave.open(wrapped, "wb") as wav:
+            wav.setnchannels(channels)
+            wav.setsampwidth(2)
+            wav.setframerate(sample_rate)
+            wav.writeframes(audio.getbuffer())
+        wrapped.seek(0)
+        return wrapped
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        hot_logger.debug(f"本地接口: {format % args}")
+
+
+class UnixAPIRequestHandler(APIRequestHandler):
+    """Unix 域套接字上的同一接口；TCP_NODELAY 只适用于 TCP，AF_UNIX 上设置会失败"""
+
+    disable_nagle_algorithm = False
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+        """通过 Unix 域套接字提供同样的 HTTP 接口"""
+
+        daemon_threads = True
+
+        def get_request(self):
+            request, _ = super().get_request()
+            # BaseHTTPRequestHandler 需要 (host, port) 形式的客户端地址
+            return request, ("unix", 0)
+else:  # Windows
+    UnixHTTPServer = None
+
+
+class APIServer:
+    """本地转录接口服务
+
+    热键和接口共用同一个转录处理器，连接池、繁简转换表等缓存只创建一次。
+    每个连接由单独的线程处理；同时处理的请求数受 API_MAX_CONCURRENT 限制，
+    超出的请求最多排队 API_MAX_QUEUE 个，队列已满时直接返回 503 和 Retry-After。
+    """
+
+    DEFAULT_MAX_CONCURRENT = 2
+    DEFAULT_MAX_QUEUE = 8
+    DEFAULT_QUEUE_TIMEOUT = 30.0
+    DEFAULT_MAX_UPLOAD_MB = 25
+    BIND_TIMEOUT = 10.0  # 重启时旧进程可能还没有释放端口
+
+    def __init__(self, process, host=None, port=None, socket_path=None, registry=None):
+        """
+        Args:
+            process: 处理函数 process(audio, mode, trace)，返回 (文本, 错误信息)
+        """
+        self.process = process
+        self.host = host or os.getenv("API_HOST", "127.0.0.1")
+        port = port if port is not None else os.getenv("API_PORT", str(DEFAULT_API_PORT))
+        self.port = int(port) if str(port).strip() else None
+        self.socket_path = socket_path if socket_path is not None else os.getenv("API_SOCKET", "")
+        self.token = os.getenv("API_TOKEN", "")
+        self.max_concurrent = int(os.getenv("API_MAX_CONCURRENT", self.DEFAULT_MAX_CONCURRENT))
+        self.max_queue = int(os.getenv("API_MAX_QUEUE", self.DEFAULT_MAX_QUEUE))
+        self.queue_timeout = float(os.getenv("API_QUEUE_TIMEOUT", self.DEFAULT_QUEUE_TIMEOUT))
+        self.max_upload_bytes = int(float(os.getenv("API_MAX_UPLOAD_MB", self.DEFAULT_MAX_UPLOAD_MB)) * 1024 * 1024)
+        self.registry = registry or get_registry()
+        self.trace_recorder = get_trace_recorder()
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._lock = threading.Lock()
+        self._admitted = 0  # 已接收（上传、排队或处理中）的请求数
+        self._active = 0  # 正在处理的请求数
+        self._servers = []
+        self._socket_inode = None
+        self._stopped = False
+
+    # ---- 背压控制 ----
+
+    def admit(self):
+        with self._lock:
+            if self._admitted >= self.max_concurrent + self.max_queue:
+                return False
+            self._admitted += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._admitted -= 1
+
+    def acquire_slot(self):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            return False
+        with self._lock:
+            self._active += 1
+        return True
+
+    def release_slot(self):
+        with self._lock:
+            self._active -= 1
+        self._slots.release()
+
+    @property
+    def in_flight(self):
+        """已接收但尚未返回的请求数"""
+        return self._admitted
+
+    def status(self):
+        return {
+            "active": self._active,
+            "queued": self._admitted - self._active,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+        }
+
+    # ---- 启动和停止 ----
+
+    def start(self):
+        self.registry.gauge("api_active", lambda: self._active)
+        self.registry.gauge("api_queued", lambda: self._admitted - self._active)
+        if self.port is not None:
+            self._start_listener(self._bind_tcp, f"http://{self.host}:{self.port}")
+        if self.socket_path:
+            if UnixHTTPServer is None:
+                logger.warning("当前系统不支持 Unix 域套接字，已忽略 API_SOCKET")
+            else:
+                self._start_listener(self._bind_unix, f"unix:{self.socket_path}")
+        return self
+
+    def stop(self):
+        """停止接收新连接，已接收的请求继续处理完"""
+        self._stopped = True
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
+        if self._socket_inode is not None:
+            # 重启时新进程可能已经接管了这个路径，只删除自己创建的套接字文件
+            try:
+                if os.stat(self.socket_path).st_ino == self._socket_inode:
+                    os.unlink(self.socket_path)
+            except OSError:
+                pass
+            self._socket_inode = None
+
+    def _bind_tcp(self):
+        server = ThreadingHTTPServer((self.host, self.port), APIRequestHandler, bind_and_activate=False)
+        server.daemon_threads = True
+        try:
+            server.server_bind()
+            server.server_activate()
+        except OSError:
+            server.server_close()
+            raise
+        return server
+
+    def _bind_unix(self):
+        if os.path.exists(self.socket_path):
+            # 之前的进程留下的套接字文件，或者正在退出的旧进程，直接接管路径
+            os.unlink(self.socket_path)
+        server = UnixHTTPServer(self.socket_path, UnixAPIRequestHandler)
+        os.chmod(self.socket_path, 0o600)
+        self._socket_inode = os.stat(self.socket_path).st_ino
+        return server
+
+    def _start_listener(self, bind, address):
+        threading.Thread(
+            target=self._serve, args=(bind, address), name="api-server", daemon=True
+        ).start()
+
+    def _serve(self, bind, address):
+        """绑定地址后开始服务，端口被占用时在 BIND_TIMEOUT 内重试"""
+        deadline = time.monotonic() + self.BIND_TIMEOUT
+        while True:
+            try:
+                server = bind()
+                break
+            except OSError as e:
+                if self._stopped or time.monotonic() > deadline:
+                    logger.error(f"本地接口启动失败 ({address}): {e}")
+                    return
+                time.sleep(0.2)
+        if self._stopped:
+            server.server_close()
+            return
+        server.api = self
+        self._servers.append(server)
+        logger.info(f"本地接口已启动: {address}")
+        server.serve_forever()
+
+
+def start_api_server(process):
+    """API_ENABLED=true 时启动本地转录接口，返回 APIServer，否则返回 None"""
+    if os.getenv("API_ENABLED", "false").lower() != "true":
+        return None
+    return APIServer(process).start()
@@ -1,7 +1,8 @@
 """音频处理模块
-提供音频录制和处理功能
+提供音频录制和处理功能，以及在后台保存录音
 """
 
-from .recorder import AudioRecorder
+from .archive import AudioArchiver, start_audio_archiver
+from .recorder import AudioRecorder, encode_wav
 
-__all__ = ['AudioRecorder']
+__all__ = ['AudioArchiver', 'AudioRecorder', 'encode_wav', 'start_audio_archiver']
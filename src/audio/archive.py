@@ -0,0 +1,217 @@
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+
+import soundfile as sf
+
+from ..utils.logger import logger
+from ..utils.metrics import get_registry
+
+# 格式 -> (文件扩展名, soundfile 格式, 子类型)
+FORMATS = {
+    "flac": (".flac", "FLAC", "PCM_16"),
+    "opus": (".opus", "OGG", "OPUS"),
+}
+OPUS_SAMPLE_RATES = {8000, 12000, 16000, 24000, 48000}
+SIDECAR_FIELDS = (
+    "trace_id", "time", "mode", "provider", "route", "text", "error", "total_ms", "audio_seconds", "spans",
+)
+
+
+class AudioArchiver:
+    """在低优先级后台线程中保存录音，供质量检查使用
+
+    录音结束时只把合并后的采样数组（不复制）和少量元数据放入有界队列，编码和写盘都在后台线程完成，
+    不增加松开按键后的延迟；队列已满时丢弃并计数，不阻塞录音和处理线程。
+    文件按日期分目录（YYYY/MM/DD），每段录音旁边有同名 .json 元数据，语音完成后补充识别结果和耗时；
+    目录总大小超过 ARCHIVE_MAX_MB 时从最早的录音开始删除。
+    """
+
+    MAX_QUEUE = 16
+
+    def __init__(self, directory=None, audio_format=None, max_bytes=None, registry=None):
+        self.directory = directory or os.getenv("ARCHIVE_DIR", "logs/audio")
+        self.format = (audio_format or os.getenv("ARCHIVE_FORMAT", "flac")).lower()
+        if self.format not in FORMATS:
+            raise ValueError(f"不支持的录音保存格式: {self.format}（可选 {', '.join(FORMATS)}）")
+        self.max_bytes = max_bytes if max_bytes is not None else float(os.getenv("ARCHIVE_MAX_MB", "500")) * 1024 * 1024
+        self.registry = registry or get_registry()
+        os.makedirs(self.directory, exist_ok=True)
+        self._queue = queue.Queue(maxsize=self.MAX_QUEUE)
+        self._files = deque()  # (路径, 录音和元数据的总字节数)，按写入时间从早到晚
+        self._total_bytes = 0
+        self.registry.gauge("archive_queue", self._queue.qsize)
+        self.registry.gauge("archive_bytes", lambda: self._total_bytes)
+        self._thread = threading.Thread(target=self._run, name="audio-archiver", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ---- 调用方线程 ----
+
+    def submit(self, audio, sample_rate, mode, trace=None):
+        """提交一段录音，返回相对于 ARCHIVE_DIR 的路径；队列已满时丢弃并返回 None
+
+        audio 为录音结束时合并的采样数组，之后不会被修改，直接传引用。
+        """
+        now = time.time()
+        trace_id = trace.trace_id if trace is not None else f"{int(now * 1000):x}"
+        audio_format = self.format
+        if audio_format == "opus" and sample_rate not in OPUS_SAMPLE_RATES:
+            audio_format = "flac"  # Opus 只支持部分采样率
+        extension = FORMATS[audio_format][0]
+        ref = os.path.join(time.strftime("%Y/%m/%d", time.localtime(now)),
+                           f"{time.strftime('%H%M%S', time.localtime(now))}-{trace_id}{extension}")
+        metadata = {
+            "trace_id": trace_id, "time": now, "mode": mode, "sample_rate": sample_rate,
+            "audio_seconds": round(len(audio) / sample_rate, 2), "format": audio_format,
+        }
+        try:
+            self._queue.put_nowait(("audio", ref, audio, metadata))
+        except queue.Full:
+            self.registry.inc("archive_dropped", reason="queue_full")
+            return None
+        if trace is not None:
+            trace.set(audio_ref=ref)
+        return ref
+
+    def on_trace(self, data):
+        """追踪完成的回调（TraceRecorder.listeners），把识别结果和耗时补充到元数据"""
+        ref = data.get("audio_ref")
+        if ref is None:
+            return
+        try:
+            self._queue.put_nowait(("result", ref, None, data))
+        except queue.Full:
+            self.registry.inc("archive_dropped", reason="queue_full")
+
+    def close(self, timeout=5.0):
+        """保存队列中剩余的录音后停止"""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    # ---- 后台线程 ----
+
+    def _run(self):
+        self._lower_priority()
+        self._scan()
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            kind, ref, audio, metadata = item
+            try:
+                if kind == "audio":
+                    self._write_audio(ref, audio, metadata)
+                else:
+                    self._update_sidecar(ref, metadata)
+            except (OSError, RuntimeError, ValueError) as e:
+                # soundfile 编码失败时抛出 RuntimeError/LibsndfileError
+                logger.error(f"保存录音失败 ({ref}): {e}")
+                self.registry.inc("archive_dropped", reason="error")
+                continue
+            self._enforce_quota()
+
+    @staticmethod
+    def _lower_priority():
+        """降低写入线程的调度优先级（Linux 上线程可以单独设置 nice 值）"""
+        if sys.platform.startswith("linux") and hasattr(os, "setpriority"):
+            try:
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+            except OSError:
+                pass
+
+    def _scan(self):
+        """启动时统计已有的录音，按修改时间排序用于淘汰"""
+        files = []
+        extensions = tuple(extension for extension, _, _ in FORMATS.values())
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(extensions):
+                    path = os.path.join(root, name)
+                    try:
+                        files.append((os.path.getmtime(path), path, self._size(path)))
+                    except OSError:
+                        continue
+        files.sort()
+        self._files = deque((path, size) for _, path, size in files)
+        self._total_bytes = sum(size for _, size in self._files)
+
+    @staticmethod
+    def _sidecar(path):
+        return os.path.splitext(path)[0] + ".json"
+
+    def _size(self, path):
+        size = os.path.getsize(path)
+        try:
+            size += os.path.getsize(self._sidecar(path))
+        except OSError:
+            pass
+        return size
+
+    def _write_audio(self, ref, audio, metadata):
+        path = os.path.join(self.directory, ref)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _, container, subtype = FORMATS[metadata["format"]]
+        sf.write(path, audio, metadata["sample_rate"], format=container, subtype=subtype)
+        with open(self._sidecar(path), "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=2)
+        size = self._size(path)
+        self._files.append((path, size))
+        self._total_bytes += size
+        self.registry.inc("archive_writes")
+
+    def _update_sidecar(self, ref, data):
+        path = os.path.join(self.directory, ref)
+        sidecar = self._sidecar(path)
+        if not os.path.exists(sidecar):
+            return  # 录音已被丢弃或淘汰
+        with open(sidecar, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        metadata.update({key: data[key] for key in SIDECAR_FIELDS if key in data})
+        with open(sidecar, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=2)
+        # 补充识别结果后元数据变大，按新的大小计入配额；刚写入的录音在队尾附近，从后往前找
+        for index in range(len(self._files) - 1, -1, -1):
+            file, size = self._files[index]
+            if file == path:
+                new_size = self._size(path)
+                self._files[index] = (path, new_size)
+                self._total_bytes += new_size - size
+                break
+
+    def _enforce_quota(self):
+        """总大小超过上限时删除最早的录音和元数据，以及删空的日期目录"""
+        while self._total_bytes > self.max_bytes and len(self._files) > 1:
+            path, size = self._files.popleft()
+            self._total_bytes -= size
+            for file in (path, self._sidecar(path)):
+                try:
+                    os.remove(file)
+                except OSError:
+                    pass
+            self.registry.inc("archive_evicted")
+            directory = os.path.dirname(path)
+            while os.path.abspath(directory) != os.path.abspath(self.directory):
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    break
+                directory = os.path.dirname(directory)
+
+
+def start_audio_archiver():
+    """ARCHIVE_ENABLED=true 时创建录音保存线程，否则返回 None"""
+    if os.getenv("ARCHIVE_ENABLED", "false").lower() != "true":
+        return None
+    try:
+        return AudioArchiver()
+    except (OSError, ValueError) as e:
+        logger.error(f"无法启用录音保存: {e}")
+        return None
@@ -0,0 +1,12 @@
+import os
+
+# AUDIO_BACKEND=synthetic 时不加载 sounddevice（及 PortAudio），录音数据由合成设备产生，
+# 用于没有麦克风的 CI 和基准测试；默认使用 sounddevice，加载失败时直接报错，避免把合成信号当作录音转录
+if os.getenv("AUDIO_BACKEND", "sounddevice").lower() == "synthetic":
+    from . import synthetic as sd
+    AUDIO_BACKEND = "synthetic"
+else:
+    import sounddevice as sd
+    AUDIO_BACKEND = "sounddevice"
+
+__all__ = ["sd", "AUDIO_BACKEND"]
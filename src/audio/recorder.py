@@ -1,13 +1,23 @@
 import io
-import sounddevice as sd
 import numpy as np
 import queue
 import soundfile as sf
 import os
 import tempfile
-from ..utils.logger import logger
+from .backend import sd
+from ..utils.logger import hot_logger, logger
+from ..utils.metrics import get_registry
 import time
 
+
+def encode_wav(audio, sample_rate):
+    """把录音采样编码为 WAV 字节流，录音结束和基准测试使用同一编码路径"""
+    audio_buffer = io.BytesIO()
+    sf.write(audio_buffer, audio, sample_rate, format='WAV')
+    audio_buffer.seek(0)  # 将缓冲区指针移动到开始位置
+    return audio_buffer
+
+
 class AudioRecorder:
     def __init__(self):
         self.recording = False
@@ -17,11 +27,14 @@ class AudioRecorder:
         self.current_device = None
         self.record_start_time = None
         self.min_record_duration = 1.0  # 最小录音时长（秒）
+        self.last_audio_seconds = 0.0  # 上一段录音的实际时长（秒）
+        self.last_audio = None  # 上一段录音合并后的采样，由 take_last_audio 取走（如交给录音保存）
+        self.metrics = get_registry()
         self._check_audio_devices()
         # logger.info(f"初始化完成，临时文件目录: {self.temp_dir}")
         logger.info(f"初始化完成")
     
-    def _list_audio_devices(self):
+    def list_audio_devices(self):
         """列出所有可用的音频输入设备"""
         devices = sd.query_devices()
         logger.info("\n=== 可用的音频输入设备 ===")
@@ -51,9 +64,6 @@ class AudioRecorder:
                 self.sample_rate = int(default_input['default_samplerate'])
                 logger.info(f"调整采样率为: {self.sample_rate}Hz")
             
-            # 列出所有可用设备
-            self._list_audio_devices()
-            
         except Exception as e:
             logger.error(f"检查音频设备时出错: {e}")
             raise RuntimeError("无法访问音频设备，请检查系统权限设置")
@@ -84,11 +94,13 @@ class AudioRecorder:
                 logger.info("开始录音...")
                 self.recording = True
                 self.record_start_time = time.time()
-                self.audio_data = []
+                self._drain_queue()  # 丢弃上一段录音停止后回调可能残留的数据块
                 
                 def audio_callback(indata, frames, time, status):
                     if status:
-                        logger.warning(f"音频录制状态: {status}")
+                        if status.input_overflow:
+                            self.metrics.inc("audio_overflows")
+                        hot_logger.warning(f"音频录制状态: {status}")
                     if self.recording:
                         self.audio_queue.put(indata.copy())
                 
@@ -106,6 +118,20 @@ class AudioRecorder:
                 logger.error(f"启动录音失败: {e}")
                 raise
     
+    def _drain_queue(self):
+        """取出队列中的所有音频块"""
+        blocks = []
+        while True:
+            try:
+                blocks.append(self.audio_queue.get_nowait())
+            except queue.Empty:
+                return blocks
+
+    def take_last_audio(self):
+        """取走上一段录音的采样数组，之后不再持有引用"""
+        audio, self.last_audio = self.last_audio, None
+        return audio
+
     def stop_recording(self):
         """停止录音并返回音频数据"""
         if not self.recording:
@@ -121,12 +147,12 @@ class AudioRecorder:
             record_duration = time.time() - self.record_start_time
             if record_duration < self.min_record_duration:
                 logger.warning(f"录音时长太短 ({record_duration:.1f}秒 < {self.min_record_duration}秒)")
+                # 丢弃这段录音，否则会一直留在队列中并混入下一段录音
+                self._drain_queue()
                 return "TOO_SHORT"
         
         # 收集所有音频数据
-        audio_data = []
-        while not self.audio_queue.empty():
-            audio_data.append(self.audio_queue.get())
+        audio_data = self._drain_queue()
         
         if not audio_data:
             logger.warning("没有收集到音频数据")
@@ -135,10 +161,8 @@ class AudioRecorder:
         # 合并音频数据
         audio = np.concatenate(audio_data)
         logger.info(f"音频数据长度: {len(audio)} 采样点")
+        self.last_audio_seconds = len(audio) / self.sample_rate
+        self.last_audio = audio
 
         # 将 numpy 数组转换为字节流
-        audio_buffer = io.BytesIO()
-        sf.write(audio_buffer, audio, self.sample_rate, format='WAV')
-        audio_buffer.seek(0)  # 将缓冲区指针移动到开始位置
-        
-        return audio_buffer
\ No newline at end of file
+        return encode_wav(audio, self.sample_rate)
\ No newline at end of file
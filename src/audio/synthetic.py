@@ -0,0 +1,178 @@
+"""合成音频设备
+
+与 sounddevice 中 AudioRecorder 用到的部分（query_devices、InputStream）接口相同，
+不访问声卡，把 WAV 文件或生成的信号按块送入录音回调，用于无麦克风环境下的测试和基准测试。
+
+- SYNTHETIC_AUDIO_FILE：循环播放的 WAV 文件，留空时生成带噪声的音调
+- SYNTHETIC_AUDIO_SPEED：1 为实时，大于 1 为加速；0 为手动模式，不启动线程，由调用方 feed()
+- SYNTHETIC_AUDIO_BLOCK：每次回调的帧数
+- SYNTHETIC_AUDIO_BUFFER：回调跟不上时设备最多缓存的块数，超过后丢弃最早的帧并报告 input_overflow
+"""
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+DEFAULT_SAMPLE_RATE = 16000
+DEFAULT_BLOCK = 512
+DEFAULT_BUFFER_BLOCKS = 8
+
+
+class CallbackFlags:
+    """与 sounddevice.CallbackFlags 对应的状态标记"""
+
+    def __init__(self, input_overflow=False):
+        self.input_overflow = input_overflow
+        self.input_underflow = False
+
+    def __bool__(self):
+        return self.input_overflow or self.input_underflow
+
+    def __str__(self):
+        return "input overflow" if self.input_overflow else ""
+
+
+class SignalSource:
+    """循环读取 WAV 文件或生成的信号（单声道 float32）"""
+
+    def __init__(self, path=None, sample_rate=DEFAULT_SAMPLE_RATE):
+        path = path if path is not None else os.getenv("SYNTHETIC_AUDIO_FILE", "")
+        if path:
+            import soundfile as sf
+
+            audio, sample_rate = sf.read(path, dtype="float32", always_2d=True)
+            self.audio = audio.mean(axis=1).astype("float32")
+        else:
+            rng = np.random.default_rng(0)
+            t = np.arange(sample_rate * 2) / sample_rate
+            self.audio = (0.2 * np.sin(2 * np.pi * 220 * t) + 0.02 * rng.standard_normal(len(t))).astype("float32")
+        self.sample_rate = sample_rate
+        self._position = 0
+
+    def read(self, frames):
+        """读取 frames 帧，返回 (frames, 1) 数组"""
+        out = np.empty(frames, dtype="float32")
+        filled = 0
+        while filled < frames:
+            chunk = self.audio[self._position:self._position + frames - filled]
+            out[filled:filled + len(chunk)] = chunk
+            filled += len(chunk)
+            self._position = (self._position + len(chunk)) % len(self.audio)
+        return out.reshape(-1, 1)
+
+    def skip(self, frames):
+        self._position = (self._position + frames) % len(self.audio)
+
+
+_source = None
+
+
+def _get_source():
+    global _source
+    if _source is None:
+        _source = SignalSource()
+    return _source
+
+
+def query_devices(kind=None):
+    device = {
+        "name": "synthetic",
+        "default_samplerate": float(_get_source().sample_rate),
+        "max_input_channels": 1,
+    }
+    return device if kind else [device]
+
+
+class InputStream:
+    """合成输入流
+
+    实时或加速模式下由后台线程按采样时钟产生数据块并调用回调；回调耗时超过块时长、
+    积压超过 SYNTHETIC_AUDIO_BUFFER 块时，与声卡一样丢弃最早的帧，并在下一次回调报告 input_overflow。
+    统计回调次数、回调占用的 CPU 时间、送达和丢弃的帧数，以及每块从采样到回调的延迟。
+    """
+
+    def __init__(self, samplerate=None, channels=1, callback=None, blocksize=None, device=None,
+                 latency=None, dtype="float32", source=None, speed=None, buffer_blocks=None, **kwargs):
+        self.source = source or _get_source()
+        self.samplerate = samplerate or self.source.sample_rate
+        self.channels = channels
+        self.callback = callback
+        self.blocksize = blocksize or int(os.getenv("SYNTHETIC_AUDIO_BLOCK", DEFAULT_BLOCK))
+        self.speed = float(speed if speed is not None else os.getenv("SYNTHETIC_AUDIO_SPEED", "1"))
+        self.buffer_blocks = int(buffer_blocks or os.getenv("SYNTHETIC_AUDIO_BUFFER", DEFAULT_BUFFER_BLOCKS))
+        self.active = False
+        self.callbacks = 0
+        self.callback_cpu = 0.0  # 秒
+        self.frames_delivered = 0
+        self.frames_dropped = 0
+        self.overflows = 0
+        self.latencies = []  # 每块从采样完成到回调开始的延迟（秒，按采样时钟折算）
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.active = True
+        if self.speed <= 0:
+            return  # 手动模式
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="synthetic-audio", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.active = False
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def feed(self, audio):
+        """手动模式：立即把音频按块送入回调"""
+        for start in range(0, len(audio), self.blocksize):
+            self._deliver(audio[start:start + self.blocksize], time.monotonic(), CallbackFlags())
+
+    def _deliver(self, block, adc_time, status):
+        now = time.monotonic()
+        self.latencies.append(now - adc_time)
+        info = SimpleNamespace(inputBufferAdcTime=adc_time, currentTime=now)
+        cpu = time.thread_time()
+        self.callback(block, len(block), info, status)
+        self.callback_cpu += time.thread_time() - cpu
+        self.callbacks += 1
+        self.frames_delivered += len(block)
+
+    def _run(self):
+        block_seconds = self.blocksize / self.samplerate / self.speed
+        started = time.monotonic()
+        produced = 0  # 已经“采样完成”的块数（按时钟计算），含丢弃的块
+        overflow = False
+        while not self._stop.is_set():
+            due = started + (produced + 1) * block_seconds
+            delay = due - time.monotonic()
+            if delay > 0:
+                if self._stop.wait(delay):
+                    break
+            # 回调太慢时按时钟已经产生了更多块，超过设备缓存的部分被覆盖
+            available = int((time.monotonic() - started) / block_seconds) - produced
+            if available > self.buffer_blocks:
+                dropped = available - self.buffer_blocks
+                self.source.skip(dropped * self.blocksize)
+                self.frames_dropped += dropped * self.blocksize
+                produced += dropped
+                self.overflows += 1
+                overflow = True
+            block = self.source.read(self.blocksize)
+            produced += 1
+            self._deliver(block, started + produced * block_seconds, CallbackFlags(input_overflow=overflow))
+            overflow = False
@@ -0,0 +1,9 @@
+"""语音历史记录模块
+把每句语音的识别结果和各阶段耗时保存到 SQLite，支持全文搜索和延迟统计
+
+命令行用法见 python -m src.history --help
+"""
+
+from .store import HistoryStore, HistoryWriter, default_history_path, start_history_writer
+
+__all__ = ['HistoryStore', 'HistoryWriter', 'default_history_path', 'start_history_writer']
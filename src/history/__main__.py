@@ -0,0 +1,95 @@
+"""语音历史记录命令行
+
+用法:
+    python -m src.history recent --limit 20
+    python -m src.history search 关键词 --mode translations
+    python -m src.history show <trace_id>
+    python -m src.history stats --days 7 --provider siliconflow
+    python -m src.history prune --days 90
+"""
+import argparse
+import json
+import sys
+import time
+
+from dotenv import load_dotenv
+
+from .store import HistoryStore
+
+
+def _since(days):
+    return time.time() - days * 86400 if days else None
+
+
+def _print_records(records, as_json):
+    if as_json:
+        print(json.dumps(records, ensure_ascii=False, indent=2))
+        return
+    for record in records:
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record["time"]))
+        total = f"{record['total_ms']:.0f}ms" if record["total_ms"] is not None else "-"
+        content = record["text"] if not record["error"] else f"[失败] {record['error']}"
+        print(f"{when}  {record['trace_id']}  {record['mode'] or '-':<14} {total:>8}  {content}")
+
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(prog="python -m src.history", description="查询语音历史记录")
+    parser.add_argument("--db", help="数据库路径，默认读取 HISTORY_FILE")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    recent = commands.add_parser("recent", help="最近的语音")
+    search = commands.add_parser("search", help="按文本搜索")
+    search.add_argument("query")
+    for command in (recent, search):
+        command.add_argument("--limit", type=int, default=20)
+        command.add_argument("--mode", choices=["transcriptions", "translations"])
+        command.add_argument("--days", type=float, help="只查询最近 N 天")
+
+    show = commands.add_parser("show", help="查看一句语音的各阶段耗时")
+    show.add_argument("trace_id")
+
+    stats = commands.add_parser("stats", help="各服务商各阶段的耗时分位数")
+    stats.add_argument("--days", type=float, default=7, help="统计最近 N 天，0 表示全部")
+    stats.add_argument("--provider")
+
+    prune = commands.add_parser("prune", help="删除较早的记录")
+    prune.add_argument("--days", type=float, required=True, help="保留最近 N 天")
+
+    args = parser.parse_args(argv)
+    store = HistoryStore(args.db)
+
+    if args.command in ("recent", "search"):
+        query = args.query if args.command == "search" else None
+        _print_records(store.search(query, args.limit, mode=args.mode, since=_since(args.days)), args.json)
+    elif args.command == "show":
+        record = store.get(args.trace_id)
+        if record is None:
+            print(f"未找到记录: {args.trace_id}", file=sys.stderr)
+            return 1
+        if args.json:
+            print(json.dumps(record, ensure_ascii=False, indent=2))
+        else:
+            _print_records([record], False)
+            if record.get("audio_ref"):
+                print(f"    录音: {record['audio_ref']}（相对于 ARCHIVE_DIR）")
+            for span in record["spans"]:
+                print(f"    {span['name']:<14}{span['start_ms']:>10.1f}{span['duration_ms']:>10.1f} ms")
+    elif args.command == "stats":
+        rows = store.stage_latency(since=_since(args.days), provider=args.provider)
+        if args.json:
+            print(json.dumps(rows, ensure_ascii=False, indent=2))
+        else:
+            print(f"{'服务商':<14}{'阶段':<14}{'次数':>8}{'p50':>10}{'p95':>10}{'p99':>10}  (ms)")
+            for row in rows:
+                print(f"{row['provider']:<14}{row['stage']:<14}{row['count']:>8}"
+                      f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}")
+    elif args.command == "prune":
+        deleted = store.delete_before(time.time() - args.days * 86400)
+        print(f"已删除 {deleted} 条记录")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
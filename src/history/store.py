@@ -0,0 +1,310 @@
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from ..utils.logger import logger
+from ..utils.metrics import get_registry
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS utterances (
+    id INTEGER PRIMARY KEY,
+    trace_id TEXT UNIQUE,
+    time REAL NOT NULL,
+    mode TEXT,
+    source TEXT,
+    provider TEXT,
+    text TEXT,
+    error TEXT,
+    error_kind TEXT,
+    total_ms REAL,
+    audio_seconds REAL,
+    audio_bytes INTEGER,
+    audio_ref TEXT
+);
+CREATE INDEX IF NOT EXISTS utterances_time ON utterances(time);
+CREATE TABLE IF NOT EXISTS stages (
+    utterance_id INTEGER NOT NULL REFERENCES utterances(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    start_ms REAL,
+    duration_ms REAL
+);
+CREATE INDEX IF NOT EXISTS stages_utterance ON stages(utterance_id);
+CREATE INDEX IF NOT EXISTS stages_name ON stages(name);
+"""
+
+# trigram 分词支持中文等不带空格的文本做子串匹配（需要 SQLite 3.34+）
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS utterances_fts USING fts5(
+    text, content='utterances', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS utterances_ai AFTER INSERT ON utterances BEGIN
+    INSERT INTO utterances_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS utterances_ad AFTER DELETE ON utterances BEGIN
+    INSERT INTO utterances_fts(utterances_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+COLUMNS = [
+    "id", "trace_id", "time", "mode", "source", "provider", "text", "error",
+    "error_kind", "total_ms", "audio_seconds", "audio_bytes", "audio_ref",
+]
+
+
+def default_history_path():
+    return os.getenv("HISTORY_FILE", "logs/history.db")
+
+
+def _percentile(samples, percent):
+    """已排序样本的分位数，与 LatencyHistogram.percentiles 的取法一致"""
+    last = len(samples) - 1
+    return samples[min(last, int(round(percent / 100 * last)))]
+
+
+class HistoryStore:
+    """语音历史记录（SQLite，WAL 模式）
+
+    主程序通过 HistoryWriter 在后台批量写入；控制界面和命令行可以在其他进程中同时查询，
+    WAL 模式下读取不会阻塞写入。每个线程使用自己的连接。
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_history_path()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._local = threading.local()
+        self.fts_enabled = self._init_schema()
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self.connection()
+        with conn:
+            conn.executescript(SCHEMA)
+        try:
+            with conn:
+                conn.executescript(FTS_SCHEMA)
+            return True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"SQLite 不支持 FTS5 trigram 分词，历史记录搜索将使用 LIKE: {e}")
+            return False
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ---- 写入 ----
+
+    def insert_many(self, records):
+        """在一个事务中写入多条追踪记录（TraceRecorder 生成的字典）"""
+        conn = self.connection()
+        with conn:
+            for data in records:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO utterances (trace_id, time, mode, source, provider, text, error, "
+                    "error_kind, total_ms, audio_seconds, audio_bytes, audio_ref) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        data.get("trace_id"), data.get("time", time.time()), data.get("mode"),
+                        data.get("source", "hotkey"), data.get("provider"), data.get("text"),
+                        data.get("error"), data.get("error_kind"), data.get("total_ms"),
+                        data.get("audio_seconds"), data.get("audio_bytes"), data.get("audio_ref"),
+                    ),
+                )
+                if cursor.rowcount:
+                    conn.executemany(
+                        "INSERT INTO stages (utterance_id, name, start_ms, duration_ms) VALUES (?, ?, ?, ?)",
+                        [
+                            (cursor.lastrowid, span["name"], span["start_ms"], span["duration_ms"])
+                            for span in data.get("spans", [])
+                        ],
+                    )
+
+    def delete_before(self, timestamp):
+        """删除指定时间之前的记录，返回删除的条数"""
+        conn = self.connection()
+        with conn:
+            return conn.execute("DELETE FROM utterances WHERE time < ?", (timestamp,)).rowcount
+
+    # ---- 查询 ----
+
+    def search(self, query, limit=50, mode=None, since=None, until=None):
+        """按文本搜索，最新的在前
+
+        3 个字符及以上使用 FTS5 索引，更短的关键词（如两个汉字）退回 LIKE 扫描。
+        """
+        query = (query or "").strip()
+        if not query:
+            return self.recent(limit, mode=mode, since=since, until=until)
+        where, params = self._filters(mode, since, until)
+        if self.fts_enabled and len(query) >= 3:
+            # 作为短语匹配，避免用户输入中的引号、运算符被当作 FTS 语法
+            phrase = '"' + query.replace('"', '""') + '"'
+            sql = (
+                f"SELECT {', '.join('u.' + c for c in COLUMNS)} FROM utterances_fts f "
+                f"JOIN utterances u ON u.id = f.rowid WHERE utterances_fts MATCH ?{where} "
+                f"ORDER BY u.time DESC LIMIT ?"
+            )
+            params = [phrase, *params, limit]
+        else:
+            pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            sql = (
+                f"SELECT {', '.join('u.' + c for c in COLUMNS)} FROM utterances u "
+                f"WHERE u.text LIKE ? ESCAPE '\\'{where} ORDER BY u.time DESC LIMIT ?"
+            )
+            params = [pattern, *params, limit]
+        return [dict(row) for row in self.connection().execute(sql, params)]
+
+    def recent(self, limit=50, mode=None, since=None, until=None):
+        where, params = self._filters(mode, since, until)
+        sql = (
+            f"SELECT {', '.join('u.' + c for c in COLUMNS)} FROM utterances u "
+            f"WHERE 1 = 1{where} ORDER BY u.time DESC LIMIT ?"
+        )
+        return [dict(row) for row in self.connection().execute(sql, [*params, limit])]
+
+    def get(self, trace_id):
+        """按 trace_id 获取一条记录及其各阶段耗时"""
+        conn = self.connection()
+        row = conn.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM utterances WHERE trace_id = ?", (trace_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        record = dict(row)
+        record["spans"] = [
+            dict(span) for span in conn.execute(
+                "SELECT name, start_ms, duration_ms FROM stages WHERE utterance_id = ? ORDER BY start_ms",
+                (record["id"],),
+            )
+        ]
+        return record
+
+    def stage_latency(self, since=None, until=None, provider=None):
+        """各服务商各阶段的耗时分位数，只统计成功的语音
+
+        Returns:
+            list[dict]: provider、stage、count、p50_ms、p95_ms、p99_ms
+        """
+        where, params = self._filters(None, since, until)
+        if provider:
+            where += " AND u.provider = ?"
+            params.append(provider)
+        rows = self.connection().execute(
+            "SELECT u.provider, s.name, s.duration_ms FROM stages s JOIN utterances u ON u.id = s.utterance_id "
+            f"WHERE u.error IS NULL{where} "
+            "UNION ALL "
+            "SELECT u.provider, 'total', u.total_ms FROM utterances u "
+            f"WHERE u.error IS NULL{where}",
+            [*params, *params],
+        )
+        groups = {}
+        for row in rows:
+            groups.setdefault((row[0] or "none", row[1]), []).append(row[2])
+        result = []
+        for (provider_name, stage), durations in sorted(groups.items()):
+            durations.sort()
+            result.append({
+                "provider": provider_name,
+                "stage": stage,
+                "count": len(durations),
+                **{f"p{percent}_ms": round(_percentile(durations, percent), 1) for percent in (50, 95, 99)},
+            })
+        return result
+
+    @staticmethod
+    def _filters(mode, since, until):
+        where, params = "", []
+        if mode:
+            where += " AND u.mode = ?"
+            params.append(mode)
+        if since is not None:
+            where += " AND u.time >= ?"
+            params.append(since)
+        if until is not None:
+            where += " AND u.time < ?"
+            params.append(until)
+        return where, params
+
+
+class HistoryWriter:
+    """在后台线程中批量写入历史记录
+
+    追踪完成的回调只把记录放入队列；写入线程攒够一批或等待 FLUSH_INTERVAL 后在一个事务中提交，
+    队列已满时丢弃新记录并计数，不阻塞键盘和处理线程。
+    """
+
+    BATCH_SIZE = 50
+    FLUSH_INTERVAL = 1.0  # 秒
+    MAX_QUEUE = 1000
+
+    def __init__(self, store=None, registry=None):
+        self.store = store or HistoryStore()
+        self.registry = registry or get_registry()
+        self._queue = queue.Queue(maxsize=self.MAX_QUEUE)
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, data):
+        """追踪记录回调（TraceRecorder.listeners）"""
+        try:
+            self._queue.put_nowait(data)
+        except queue.Full:
+            self.registry.inc("history_dropped")
+
+    def close(self, timeout=5.0):
+        """写入队列中剩余的记录后停止"""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.FLUSH_INTERVAL
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                self.store.insert_many(batch)
+                self.registry.inc("history_writes", len(batch))
+            except sqlite3.Error as e:
+                logger.error(f"写入历史记录失败: {e}")
+                self.registry.inc("history_dropped", len(batch))
+        self.store.close()
+
+
+def start_history_writer():
+    """HISTORY_ENABLED=true（默认）时创建历史记录写入线程，否则返回 None"""
+    if os.getenv("HISTORY_ENABLED", "true").lower() != "true":
+        return None
+    try:
+        return HistoryWriter()
+    except (OSError, sqlite3.Error) as e:
+        logger.error(f"无法打开历史记录数据库: {e}")
+        return None
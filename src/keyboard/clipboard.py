@@ -0,0 +1,198 @@
+import os
+import sys
+import threading
+import time
+
+import pyperclip
+
+from ..utils.logger import logger
+from ..utils.metrics import get_registry
+
+
+class PyperclipBackend:
+    """pyperclip 后端，Linux 上每次读写都会启动 xclip/xsel 子进程"""
+
+    name = "pyperclip"
+
+    def get(self):
+        return pyperclip.paste()
+
+    def set(self, text):
+        pyperclip.copy(text)
+
+    def change_count(self):
+        """不支持变更计数"""
+        return None
+
+
+class MacClipboardBackend:
+    """macOS 原生后端，复用同一个 NSPasteboard 连接（需要 pyobjc）"""
+
+    name = "appkit"
+
+    def __init__(self):
+        from AppKit import NSPasteboard, NSPasteboardTypeString
+        self._pasteboard = NSPasteboard.generalPasteboard()
+        self._type = NSPasteboardTypeString
+
+    def get(self):
+        return self._pasteboard.stringForType_(self._type) or ""
+
+    def set(self, text):
+        self._pasteboard.clearContents()
+        self._pasteboard.setString_forType_(text, self._type)
+
+    def change_count(self):
+        return self._pasteboard.changeCount()
+
+
+class WindowsClipboardBackend:
+    """Windows 原生后端，直接调用剪贴板 API（需要 pywin32）"""
+
+    name = "win32"
+
+    def __init__(self):
+        import win32clipboard
+        self._clipboard = win32clipboard
+
+    def get(self):
+        self._clipboard.OpenClipboard()
+        try:
+            if self._clipboard.IsClipboardFormatAvailable(self._clipboard.CF_UNICODETEXT):
+                return self._clipboard.GetClipboardData(self._clipboard.CF_UNICODETEXT)
+            return ""
+        finally:
+            self._clipboard.CloseClipboard()
+
+    def set(self, text):
+        self._clipboard.OpenClipboard()
+        try:
+            self._clipboard.EmptyClipboard()
+            self._clipboard.SetClipboardData(self._clipboard.CF_UNICODETEXT, text)
+        finally:
+            self._clipboard.CloseClipboard()
+
+    def change_count(self):
+        return self._clipboard.GetClipboardSequenceNumber()
+
+
+def create_backend(name=None):
+    """按 CLIPBOARD_BACKEND 配置创建剪贴板后端，原生后端不可用时回退到 pyperclip"""
+    name = (name or os.getenv("CLIPBOARD_BACKEND", "auto")).lower()
+    if name == "pyperclip":
+        return PyperclipBackend()
+
+    native = None
+    if sys.platform == "darwin":
+        native = MacClipboardBackend
+    elif sys.platform == "win32":
+        native = WindowsClipboardBackend
+    if native is not None:
+        try:
+            return native()
+        except ImportError as e:
+            logger.info(f"原生剪贴板后端不可用，使用 pyperclip: {e}")
+    return PyperclipBackend()
+
+
+class ClipboardService:
+    """剪贴板服务
+
+    - 保持一个常驻的后端连接，避免每次操作重新建立
+    - 只在真正开始录音时才保存原始内容（懒快照），轻点按键不会读取剪贴板
+    - 跳过与当前内容相同的重复写入
+    - 记录每种操作的次数和耗时
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or create_backend()
+        self._lock = threading.Lock()
+        self._original = None
+        self._has_snapshot = False
+        self._last_set = None
+        self._last_change_count = None
+        self._stats = {}  # 操作名 -> [次数, 总耗时, 最大耗时]
+        self._registry = get_registry()
+        logger.info(f"剪贴板后端: {self.backend.name}")
+
+    def _record(self, operation, start_time):
+        elapsed = time.perf_counter() - start_time
+        stats = self._stats.setdefault(operation, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] = max(stats[2], elapsed)
+        logger.debug(f"剪贴板 {operation} 耗时: {elapsed * 1000:.1f}毫秒")
+
+    def paste(self):
+        """读取剪贴板文本"""
+        start_time = time.perf_counter()
+        try:
+            return self.backend.get()
+        finally:
+            self._record("paste", start_time)
+
+    def _is_unchanged(self, text):
+        """剪贴板中是否仍是上一次写入的 text"""
+        if text != self._last_set:
+            return False
+        change_count = self.backend.change_count()
+        if change_count is not None:
+            return change_count == self._last_change_count
+        # 无法检测外部修改时，只在一次录音的快照期间内跳过重复写入
+        return self._has_snapshot
+
+    def copy(self, text):
+        """写入剪贴板文本
+
+        Returns:
+            bool: 是否实际写入（内容未变化时跳过）
+        """
+        with self._lock:
+            if self._is_unchanged(text):
+                self._stats.setdefault("skipped", [0, 0.0, 0.0])[0] += 1
+                self._registry.inc("clipboard_writes", result="skipped")
+                return False
+            start_time = time.perf_counter()
+            self.backend.set(text)
+            self._last_set = text
+            self._last_change_count = self.backend.change_count()
+            self._record("copy", start_time)
+            self._registry.inc("clipboard_writes", result="written")
+            return True
+
+    def snapshot(self):
+        """保存原始剪贴板内容，一次录音会话内只保存一次"""
+        with self._lock:
+            if self._has_snapshot:
+                return
+            start_time = time.perf_counter()
+            self._original = self.backend.get()
+            self._has_snapshot = True
+            self._record("snapshot", start_time)
+
+    def restore(self):
+        """恢复保存的原始内容并结束会话"""
+        with self._lock:
+            if not self._has_snapshot:
+                return
+            original, self._original = self._original, None
+            self._has_snapshot = False
+        self.copy(original)
+
+    def discard(self):
+        """放弃保存的原始内容（保留当前剪贴板）"""
+        with self._lock:
+            self._original = None
+            self._has_snapshot = False
+
+    def stats(self):
+        """各操作的统计: {操作: {"count", "avg_ms", "max_ms"}}"""
+        with self._lock:
+            return {
+                operation: {
+                    "count": count,
+                    "avg_ms": total / count * 1000 if count and total else 0.0,
+                    "max_ms": maximum * 1000,
+                }
+                for operation, (count, total, maximum) in self._stats.items()
+            }
@@ -0,0 +1,12 @@
+import os
+
+# INPUT_DRIVER=virtual 时不加载 pynput，按键和输入都在内存中模拟；
+# 其他情况下 pynput 导入失败直接报错，不会悄悄换成不会真正输入的虚拟驱动
+if os.getenv("INPUT_DRIVER", "pynput").lower() == "virtual":
+    from .virtual import Key, VirtualController as Controller, VirtualListener as Listener
+    INPUT_DRIVER = "virtual"
+else:
+    from pynput.keyboard import Controller, Key, Listener
+    INPUT_DRIVER = "pynput"
+
+__all__ = ["Controller", "Key", "Listener", "INPUT_DRIVER"]
@@ -0,0 +1,130 @@
+import os
+import time
+
+from .driver import Key
+
+
+class ClipboardPasteStrategy:
+    """写入剪贴板后模拟 Ctrl/Cmd + V 粘贴"""
+
+    name = "paste"
+
+    def __init__(self, injector):
+        self.injector = injector
+
+    def inject(self, text):
+        self.injector.paste(text)
+
+
+class ChunkedPasteStrategy(ClipboardPasteStrategy):
+    """长文本分段粘贴，避免部分应用一次粘贴过多内容时卡顿或截断"""
+
+    name = "chunked"
+
+    def inject(self, text):
+        chunk_size = self.injector.chunk_size
+        for start in range(0, len(text), chunk_size):
+            # paste 在覆盖剪贴板之前会等待上一段被目标应用读取
+            self.injector.paste(text[start:start + chunk_size])
+
+
+class KeySynthesisStrategy:
+    """逐字符合成按键事件，不经过剪贴板，适合短文本"""
+
+    name = "type"
+
+    def __init__(self, injector):
+        self.injector = injector
+
+    def inject(self, text):
+        self.injector.keyboard.type(text)
+
+
+class TextInjector:
+    """文本输入引擎
+
+    根据文本长度自动选择输入方式：短文本直接合成按键，普通文本通过剪贴板
+    粘贴，超长文本分段粘贴，并记录每次输入的耗时。剪贴板读写都经过
+    ClipboardService，其后端的写入是同步完成的。
+
+    系统不会通知目标应用何时读取了剪贴板，粘贴后再次修改剪贴板（下一次粘贴、
+    恢复原始内容）之前至少等待 INJECT_SETTLE_MS；只等待距上次粘贴的剩余时间，
+    虚拟键盘同步完成粘贴，不需要等待。
+    """
+
+    DEFAULT_TYPE_MAX_CHARS = 16
+    DEFAULT_CHUNK_SIZE = 1000
+    DEFAULT_SETTLE_TIME = 0.3  # 粘贴后等待目标应用读取剪贴板的最短时间（秒）
+
+    def __init__(self, keyboard, paste_modifier, clipboard):
+        self.keyboard = keyboard
+        self.paste_modifier = paste_modifier
+        self.clipboard = clipboard
+        self.type_max_chars = int(os.getenv("INJECT_TYPE_MAX_CHARS", self.DEFAULT_TYPE_MAX_CHARS))
+        self.chunk_size = max(1, int(os.getenv("INJECT_CHUNK_SIZE", self.DEFAULT_CHUNK_SIZE)))
+        self.settle_time = float(os.getenv("INJECT_SETTLE_MS", self.DEFAULT_SETTLE_TIME * 1000)) / 1000
+        # Windows 上合成 BMP 以外的字符（如 emoji）不可靠，交给剪贴板
+        self.unicode_safe = os.getenv("SYSTEM_PLATFORM") != "win"
+        # 虚拟键盘在 press/release 返回前就完成粘贴
+        self.synchronous = getattr(keyboard, "synchronous", False)
+        self.strategies = {
+            strategy.name: strategy
+            for strategy in (
+                KeySynthesisStrategy(self),
+                ClipboardPasteStrategy(self),
+                ChunkedPasteStrategy(self),
+            )
+        }
+        self.last_strategy = None
+        self.last_duration = 0.0
+        self._last_paste_time = None
+
+    def select_strategy(self, text):
+        """根据文本长度和内容选择输入方式"""
+        if len(text) <= self.type_max_chars and (
+                self.unicode_safe or all(ord(char) < 0x10000 for char in text)):
+            return self.strategies["type"]
+        if len(text) > self.chunk_size:
+            return self.strategies["chunked"]
+        return self.strategies["paste"]
+
+    def inject(self, text):
+        """输入文本到当前光标位置
+
+        Returns:
+            float: 输入耗时（秒）
+        """
+        if not text:
+            return 0.0
+        strategy = self.select_strategy(text)
+        start_time = time.perf_counter()
+        strategy.inject(text)
+        self.last_strategy = strategy.name
+        self.last_duration = time.perf_counter() - start_time
+        return self.last_duration
+
+    def erase(self, count):
+        """删除光标前的 count 个字符，退格键连续发送，中间不等待"""
+        press, release, backspace = self.keyboard.press, self.keyboard.release, Key.backspace
+        for _ in range(count):
+            press(backspace)
+            release(backspace)
+
+    def paste(self, text):
+        """写入剪贴板并粘贴；覆盖剪贴板前先等待上一次粘贴被读取"""
+        self.wait_settled()
+        self.clipboard.copy(text)
+        with self.keyboard.pressed(self.paste_modifier):
+            self.keyboard.press('v')
+            self.keyboard.release('v')
+        if not self.synchronous:
+            self._last_paste_time = time.perf_counter()
+
+    def wait_settled(self):
+        """修改剪贴板前，等待上一次粘贴被目标应用读取"""
+        if self._last_paste_time is None:
+            return
+        remaining = self._last_paste_time + self.settle_time - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+        self._last_paste_time = None
@@ -1,14 +1,28 @@
-from pynput.keyboard import Controller, Key, Listener
-import pyperclip
-from ..utils.logger import logger
-import time
+from .driver import Controller, Key, Listener
+from ..utils.logger import hot_logger, logger
 from .inputState import InputState
+from .clipboard import ClipboardService
+from .injector import TextInjector
+from .status import create_status_sinks
+from ..utils.ipc import get_publisher, ipc_events_enabled
+from ..utils.scheduler import get_scheduler
+from ..utils.profiling import profile_thread
+from ..utils.tracing import span
 import os
+import queue
+import threading
 
 
 class KeyboardManager:
-    def __init__(self, on_record_start, on_record_stop, on_translate_start, on_translate_stop, on_reset_state):
-        self.keyboard = Controller()
+    def __init__(self, on_record_start, on_record_stop, on_translate_start, on_translate_stop, on_reset_state,
+                 scheduler=None, controller=None, listener_factory=None, clipboard=None):
+        """
+        scheduler、controller、listener_factory、clipboard 可替换为虚拟实现，
+        以便在无图形界面的环境中驱动状态机（见 src/keyboard/virtual.py）
+        """
+        self.keyboard = controller or Controller()
+        self.listener_factory = listener_factory or Listener
+        self.scheduler = scheduler or get_scheduler()  # 按键阈值和消息清除共用的定时器
         self.option_pressed = False
         self.shift_pressed = False
         self.temp_text_length = 0  # 用于跟踪临时文本的长度
@@ -17,9 +31,14 @@ class KeyboardManager:
         self.warning_message = None  # 用于跟踪警告信息
         self.option_press_time = None  # 记录 Option 按下的时间戳
         self.PRESS_DURATION_THRESHOLD = 0.5  # 按键持续时间阈值（秒）
-        self.is_checking_duration = False  # 用于控制定时器线程
+        self._hold_timer = None  # 按键持续时间阈值定时器
+        self._clear_timer = None  # 警告/错误消息清除定时器
         self.has_triggered = False  # 用于防止重复触发
-        self._original_clipboard = None  # 保存原始剪贴板内容
+        self.clipboard = clipboard or ClipboardService()  # 剪贴板服务，负责原始内容的快照和恢复
+        self.pending_utterances = 0  # 已提交但尚未输入结果的录音数量
+        self._events = queue.Queue()  # 键盘事件和识别结果队列，由分发线程串行处理
+        self.accepting = True  # 是否接收新的录音，停止前置为 False，只处理已开始的录音
+        self._listener = None
         
         
         # 回调函数
@@ -42,6 +61,12 @@ class KeyboardManager:
             InputState.WARNING: lambda msg: f"⚠️ {msg}"  # 警告消息使用函数动态生成
         }
 
+        # 状态切换事件，供控制界面显示当前状态
+        self.event_publisher = get_publisher() if ipc_events_enabled() else None
+        self._load_config()
+
+    def _load_config(self):
+        """读取平台、状态输出和按键配置，启动时和配置热更新时调用"""
         # 获取系统平台
         sysetem_platform = os.getenv("SYSTEM_PLATFORM")
         if sysetem_platform == "win" :
@@ -50,9 +75,11 @@ class KeyboardManager:
         else:
             self.sysetem_platform = Key.cmd
             logger.info("配置到Mac平台")
-        
+        self.injector = TextInjector(self.keyboard, self.sysetem_platform, self.clipboard)
+        # 状态提示的输出位置，不输入到文档时不会占用剪贴板和当前窗口
+        self.status_in_document, self.status_sinks = create_status_sinks()
 
-        # 获取转录和翻译按钮
+        # 获取转录和翻译按钮（无效配置保留原有按键）
         transcriptions_button = os.getenv("TRANSCRIPTIONS_BUTTON")
         try:
             self.transcriptions_button = Key[transcriptions_button]
@@ -80,6 +107,9 @@ class KeyboardManager:
         """设置新状态并更新UI"""
         if new_state != self._state:
             self._state = new_state
+            if self.event_publisher is not None:
+                self.event_publisher.publish(
+                    "state", state=new_state.name, pending=self.pending_utterances)
             
             # 获取状态消息
             message = self._state_messages[new_state]
@@ -88,14 +118,16 @@ class KeyboardManager:
             match new_state:
                 case InputState.RECORDING :
                     # 录音状态
-                    self.temp_text_length = 0
+                    self._save_clipboard()
+                    self._clear_processing_text()
                     self.type_temp_text(message)
                     self.on_record_start()
                     
                 
                 case InputState.RECORDING_TRANSLATE:
                     # 翻译,录音状态
-                    self.temp_text_length = 0
+                    self._save_clipboard()
+                    self._clear_processing_text()
                     self.type_temp_text(message)
                     self.on_translate_start()
 
@@ -103,14 +135,16 @@ class KeyboardManager:
                     self._delete_previous_text()
                     self.type_temp_text(message)
                     self.processing_text = message
-                    self.on_record_stop()
+                    if self.on_record_stop():
+                        self.pending_utterances += 1
 
                 case InputState.TRANSLATING:
                     # 翻译状态
                     self._delete_previous_text()                 
                     self.type_temp_text(message)
                     self.processing_text = message
-                    self.on_translate_stop()
+                    if self.on_translate_stop():
+                        self.pending_utterances += 1
                 
                 case InputState.WARNING:
                     # 警告状态
@@ -131,168 +165,233 @@ class KeyboardManager:
                 case InputState.IDLE:
                     # 空闲状态，清除所有临时文本
                     self.processing_text = None
+                    self._publish_status("")
                 
                 case _:
                     # 其他状态
                     self.type_temp_text(message)
     
+    def _clear_processing_text(self):
+        """开始新录音前处理上一条状态文本"""
+        if self.pending_utterances:
+            # 仍有录音在后台处理，删除“正在转录”提示，结果输入后再恢复
+            self._delete_previous_text()
+        else:
+            self.temp_text_length = 0
+
     def _schedule_message_clear(self):
         """计划清除消息"""
-        def clear_message():
-            time.sleep(2)  # 警告消息显示2秒
+        if self._clear_timer is not None:
+            self._clear_timer.cancel()
+        # 警告消息显示2秒
+        self._clear_timer = self.scheduler.call_later(2, self._events.put, ("clear",))
+
+    def _clear_message(self):
+        """警告或错误消息到期后回到空闲状态"""
+        # 期间可能已经开始了新的录音，此时不能打断
+        if self.state in (InputState.WARNING, InputState.ERROR):
             self.state = InputState.IDLE
-        
-        import threading
-        threading.Thread(target=clear_message, daemon=True).start()
     
     def show_warning(self, warning_message):
         """显示警告消息"""
+        if self.state.is_recording:
+            logger.warning(warning_message)
+            return
         self.warning_message = warning_message
         self.state = InputState.WARNING
     
     def show_error(self, error_message):
         """显示错误消息"""
+        if self.state.is_recording:
+            logger.error(error_message)
+            return
         self.error_message = error_message
         self.state = InputState.ERROR
     
+    def _keep_original_clipboard(self):
+        """输入完成后是否恢复原始剪贴板内容"""
+        return os.getenv("KEEP_ORIGINAL_CLIPBOARD", "true").lower() == "true"
+
     def _save_clipboard(self):
-        """保存当前剪贴板内容"""
-        if self._original_clipboard is None:
-            self._original_clipboard = pyperclip.paste()
+        """保存当前剪贴板内容（在真正开始录音时调用，而不是每次按键）"""
+        if self._keep_original_clipboard():
+            self.clipboard.snapshot()
 
     def _restore_clipboard(self):
         """恢复原始剪贴板内容"""
-        if self._original_clipboard is not None:
-            pyperclip.copy(self._original_clipboard)
-            self._original_clipboard = None
+        self.injector.wait_settled()
+        self.clipboard.restore()
 
-    def type_text(self, text, error_message=None):
+    def type_text(self, text, error_message=None, trace=None):
         """将文字输入到当前光标位置
         
         Args:
             text: 要输入的文本或包含文本和错误信息的元组
             error_message: 错误信息
+            trace: 可选的 Trace，输入完成后记录 inject 阶段并结束追踪
         """
         # 如果text是元组，说明是从process_audio返回的结果
         if isinstance(text, tuple):
             text, error_message = text
+
+        if self.pending_utterances > 0:
+            self.pending_utterances -= 1
             
         if error_message:
+            if trace is not None:
+                trace.finish(error=error_message)
             self.show_error(error_message)
             return
             
         if not text:
+            if trace is not None:
+                trace.finish(error="empty")
             # 如果没有文本且不是错误，可能是录音时长不足
             if self.state in (InputState.PROCESSING, InputState.TRANSLATING):
                 self.show_warning("录音时长过短，请至少录制1秒")
             return
             
         try:
-            logger.info("正在输入转录文本...")
+            hot_logger.info("正在输入转录文本...")
             self._delete_previous_text()
             
-            # 先输入文本和完成标记
-            self.type_temp_text(text+" ✅")
-            
-            # 等待一小段时间确保文本已输入
-            time.sleep(0.5)
-            
-            # 删除完成标记（2个字符：空格和✅）
-            self.temp_text_length = 2
-            self._delete_previous_text()
+            with span(trace, "inject"):
+                duration = self.injector.inject(text)
+            if trace is not None:
+                trace.finish(text=text, text_chars=len(text), inject_strategy=self.injector.last_strategy)
+            hot_logger.info(f"文本输入完成 ({self.injector.last_strategy}), 耗时: {duration * 1000:.0f}毫秒")
+
+            if self.state.is_recording:
+                # 下一句正在录音，恢复录音提示
+                self.type_temp_text(self._state_messages[self.state])
+                return
+            if self.pending_utterances:
+                # 还有录音在后台处理，恢复处理提示
+                self.type_temp_text(self.processing_text)
+                return
             
             # 将转录结果复制到剪贴板
-            if os.getenv("KEEP_ORIGINAL_CLIPBOARD", "true").lower() != "true":
-                pyperclip.copy(text)
+            if not self._keep_original_clipboard():
+                self.injector.wait_settled()
+                self.clipboard.copy(text)
+                self.clipboard.discard()
             else:
                 # 恢复原始剪贴板内容
                 self._restore_clipboard()
             
-            logger.info("文本输入完成")
-            
             # 清理处理状态
             self.state = InputState.IDLE
         except Exception as e:
+            if trace is not None:
+                trace.finish(error=f"文本输入失败: {e}")
             logger.error(f"文本输入失败: {e}")
             self.show_error(f"❌ 文本输入失败: {e}")
     
     def _delete_previous_text(self):
         """删除之前输入的临时文本"""
         if self.temp_text_length > 0:
-            for _ in range(self.temp_text_length):
-                self.keyboard.press(Key.backspace)
-                self.keyboard.release(Key.backspace)
+            self.injector.erase(self.temp_text_length)
 
         self.temp_text_length = 0
     
+    def _publish_status(self, text):
+        """将状态发送到文档以外的状态输出"""
+        for sink in self.status_sinks:
+            try:
+                sink.publish(self.state, text)
+            except Exception as e:
+                logger.error(f"状态输出失败 ({sink.name}): {e}")
+
     def type_temp_text(self, text):
         """输入临时状态文本"""
         if not text:
             return
-            
-        # 将文本复制到剪贴板
-        pyperclip.copy(text)
 
-        # 模拟 Ctrl + V 粘贴文本
-        with self.keyboard.pressed(self.sysetem_platform):
-            self.keyboard.press('v')
-            self.keyboard.release('v')
+        self._publish_status(text)
+        if not self.status_in_document:
+            return
+            
+        # 短状态文本直接合成按键，不占用剪贴板
+        self.injector.inject(text)
 
         # 更新临时文本长度
         self.temp_text_length = len(text)
     
     def start_duration_check(self):
         """开始检查按键持续时间"""
-        if self.is_checking_duration:
-            return
+        self._cancel_duration_check()
+        press_time = self.option_press_time
+        # 在按下时刻 + 阈值处触发，到期后交给分发线程切换状态
+        self._hold_timer = self.scheduler.call_at(
+            press_time + self.PRESS_DURATION_THRESHOLD,
+            self._events.put, ("hold", press_time)
+        )
 
-        def check_duration():
-            while self.is_checking_duration and self.option_pressed:
-                current_time = time.time()
-                if (not self.has_triggered and 
-                    self.option_press_time and 
-                    (current_time - self.option_press_time) >= self.PRESS_DURATION_THRESHOLD):
-                    
-                    # 达到阈值时触发相应功能
-                    if self.option_pressed and self.shift_pressed and self.state.can_start_recording:
-                        self.state = InputState.RECORDING_TRANSLATE
-                        # self.on_translate_start()
-                        self.has_triggered = True
-                    elif self.option_pressed and not self.shift_pressed and self.state.can_start_recording:
-                        self.state = InputState.RECORDING
-                        # self.on_record_start()
-                        self.has_triggered = True
-                
-                time.sleep(0.01)  # 短暂休眠以降低 CPU 使用率
+    def _cancel_duration_check(self):
+        """取消尚未到期的按键阈值检查"""
+        if self._hold_timer is not None:
+            self._hold_timer.cancel()
+            self._hold_timer = None
+
+    def _handle_hold(self, press_time):
+        """按键持续时间达到阈值"""
+        # 按键已松开或已重新按下，忽略过期事件
+        if (self.has_triggered or not self.option_pressed or
+                self.option_press_time != press_time):
+            return
 
-        self.is_checking_duration = True
-        import threading
-        threading.Thread(target=check_duration, daemon=True).start()
+        # 达到阈值时触发相应功能
+        if self.shift_pressed and self.state.can_start_recording:
+            self.state = InputState.RECORDING_TRANSLATE
+            self.has_triggered = True
+        elif not self.shift_pressed and self.state.can_start_recording:
+            self.state = InputState.RECORDING
+            self.has_triggered = True
 
     def on_press(self, key):
-        """按键按下时的回调"""
+        """按键按下时的回调，只负责入队"""
+        self._events.put(("press", key, self.scheduler.clock()))
+
+    def on_release(self, key):
+        """按键释放时的回调，只负责入队"""
+        self._events.put(("release", key))
+
+    @property
+    def queued_events(self):
+        """等待分发线程处理的事件数"""
+        return self._events.qsize()
+
+    def deliver_result(self, text, error_message=None, trace=None):
+        """交付识别结果，由分发线程输入到当前窗口"""
+        self._events.put(("result", text, error_message, trace))
+
+    def _handle_result(self, text, error_message=None, trace=None):
+        """输入识别结果，开启性能分析时把输入过程计入这句语音"""
+        with profile_thread(trace):
+            self.type_text(text, error_message, trace)
+
+    def _handle_press(self, key, press_time):
+        """处理按键按下"""
         try:
             if key == self.transcriptions_button: #Key.f8:  # Option 键按下
-                # 在开始任何操作前保存剪贴板内容
-                if self._original_clipboard is None:
-                    self._original_clipboard = pyperclip.paste()
-                    
+                if not self.accepting:
+                    return
                 self.option_pressed = True
-                self.option_press_time = time.time()
+                self.option_press_time = press_time
                 self.start_duration_check()
             elif key == self.translations_button:
                 self.shift_pressed = True
         except AttributeError:
             pass
 
-    def on_release(self, key):
-        """按键释放时的回调"""
+    def _handle_release(self, key):
+        """处理按键释放"""
         try:
             if key == self.transcriptions_button:# Key.f8:  # Option 键释放
                 self.shift_pressed = False
                 self.option_pressed = False
                 self.option_press_time = None
-                self.is_checking_duration = False
+                self._cancel_duration_check()
                 
                 if self.has_triggered:
                     if self.state == InputState.RECORDING_TRANSLATE:
@@ -310,24 +409,91 @@ class KeyboardManager:
         except AttributeError:
             pass
     
+    def reload_config(self):
+        """重新读取按键、平台和状态输出配置，由分发线程在事件之间切换"""
+        self._events.put(("reconfigure",))
+
+    def _handle_reconfigure(self):
+        """切换配置；按键按住或正在录音时推迟，避免松开的旧按键无法匹配新配置"""
+        if self.option_pressed or self.shift_pressed or self.state.is_recording:
+            self.scheduler.call_later(self.PRESS_DURATION_THRESHOLD, self.reload_config)
+            return
+        self._load_config()
+
+    def _dispatch(self, event):
+        """处理单个事件"""
+        kind, *args = event
+        handler = {
+            "press": self._handle_press,
+            "release": self._handle_release,
+            "hold": self._handle_hold,
+            "result": self._handle_result,
+            "clear": self._clear_message,
+            "reconfigure": self._handle_reconfigure,
+        }[kind]
+        try:
+            handler(*args)
+        except Exception as e:
+            logger.error(f"处理键盘事件失败 ({kind}): {e}", exc_info=True)
+
+    def _dispatch_events(self):
+        """串行处理队列中的事件，状态机只在这个线程中运行"""
+        while True:
+            event = self._events.get()
+            if event[0] == "stop":
+                break
+            self._dispatch(event)
+
+    def dispatch_pending(self):
+        """在当前线程中处理所有已入队的事件（不启动分发线程时使用，如回放测试）
+
+        Returns:
+            int: 处理的事件数量
+        """
+        count = 0
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                return count
+            if event[0] != "stop":
+                self._dispatch(event)
+                count += 1
+
     def start_listening(self):
         """开始监听键盘事件"""
-        with Listener(on_press=self.on_press, on_release=self.on_release) as listener:
+        dispatcher = threading.Thread(target=self._dispatch_events, name="keyboard-dispatcher", daemon=True)
+        dispatcher.start()
+        with self.listener_factory(on_press=self.on_press, on_release=self.on_release) as listener:
+            self._listener = listener
             listener.join()
+        self._listener = None
+        self._events.put(("stop",))
+
+    def stop_accepting(self):
+        """不再开始新的录音，已开始的录音和处理中的结果照常完成"""
+        self.accepting = False
+
+    def stop_listening(self):
+        """停止键盘监听，start_listening 随之返回"""
+        self.accepting = False
+        if self._listener is not None:
+            self._listener.stop()
 
     def reset_state(self):
         """重置所有状态和临时文本"""
         # 清除临时文本
         self._delete_previous_text()
         
-        # 恢复剪贴板
-        self._restore_clipboard()
+        # 恢复剪贴板（仍有录音在后台处理时，等最后一条结果输入后再恢复）
+        if not self.pending_utterances:
+            self._restore_clipboard()
         
         # 重置状态标志
         self.option_pressed = False
         self.shift_pressed = False
         self.option_press_time = None
-        self.is_checking_duration = False
+        self._cancel_duration_check()
         self.has_triggered = False
         self.processing_text = None
         self.error_message = None
@@ -0,0 +1,64 @@
+import os
+import sys
+
+from ..utils.ipc import get_publisher
+from ..utils.logger import logger
+
+
+class TerminalStatusSink:
+    """在终端中原地刷新一行状态"""
+
+    name = "terminal"
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def publish(self, state, message):
+        self.stream.write(f"\r\033[K{message}")
+        self.stream.flush()
+
+
+class SocketStatusSink:
+    """通过本地事件通道发布状态，由控制界面渲染"""
+
+    name = "socket"
+
+    def __init__(self, publisher=None):
+        self.publisher = publisher or get_publisher()
+
+    def publish(self, state, message):
+        self.publisher.publish("status", state=state.name, message=message)
+
+
+SINK_TYPES = {
+    "terminal": TerminalStatusSink,
+    "socket": SocketStatusSink,
+}
+
+
+def create_status_sinks(config=None):
+    """按 STATUS_SINK 配置创建状态输出
+
+    配置为逗号分隔的列表，可选 document / terminal / socket / none。
+    只有包含 document 时状态文本才会输入到当前文档中。
+
+    Returns:
+        tuple: (是否输入到文档, 其他状态输出列表)
+    """
+    names = [
+        name.strip().lower()
+        for name in (config or os.getenv("STATUS_SINK", "document")).split(",")
+        if name.strip()
+    ]
+    in_document = "document" in names
+    sinks = []
+    for name in names:
+        if name in ("document", "none"):
+            continue
+        sink_type = SINK_TYPES.get(name)
+        if sink_type is None:
+            logger.error(f"无效的状态输出配置：{name}")
+            continue
+        sinks.append(sink_type())
+    logger.info(f"状态输出：{', '.join(names) or 'none'}")
+    return in_document, sinks
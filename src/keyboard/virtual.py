@@ -0,0 +1,130 @@
+import contextlib
+import threading
+from enum import Enum
+
+KEY_NAMES = [
+    "alt", "alt_l", "alt_r", "alt_gr", "backspace", "caps_lock", "cmd", "cmd_l", "cmd_r",
+    "ctrl", "ctrl_l", "ctrl_r", "delete", "down", "end", "enter", "esc", "home", "left",
+    "menu", "page_down", "page_up", "pause", "right", "shift", "shift_l", "shift_r",
+    "space", "tab", "up",
+] + [f"f{i}" for i in range(1, 21)]
+
+# 与 pynput.keyboard.Key 同名的虚拟按键，无图形界面时用于配置按钮
+Key = Enum("Key", KEY_NAMES)
+
+
+def _key_name(key):
+    """按键名称，兼容 pynput 和虚拟按键"""
+    return getattr(key, "name", None)
+
+
+class VirtualController:
+    """虚拟键盘控制器
+
+    不向系统发送任何事件，只把按键合成到内存中的“文档”里，并记录事件序列，
+    用于无图形界面环境下的测试和基准测试。
+    """
+
+    synchronous = True  # press/release 返回时输入已经完成
+
+    def __init__(self, clipboard=None):
+        self.clipboard = clipboard  # 提供 get() 的剪贴板后端，用于模拟粘贴
+        self.document = []
+        self.events = []
+        self._held = set()
+        self._lock = threading.Lock()
+
+    @property
+    def text(self):
+        """当前文档内容"""
+        return "".join(self.document)
+
+    def press(self, key):
+        with self._lock:
+            self.events.append(("press", key))
+            name = _key_name(key)
+            if name == "backspace":
+                if self.document:
+                    self.document.pop()
+            elif key == "v" and self._held & {"cmd", "ctrl"}:
+                if self.clipboard is not None:
+                    self.document.extend(self.clipboard.get())
+            elif name:
+                self._held.add(name)
+            elif isinstance(key, str):
+                self.document.append(key)
+
+    def release(self, key):
+        with self._lock:
+            self.events.append(("release", key))
+            self._held.discard(_key_name(key))
+
+    def type(self, text):
+        with self._lock:
+            self.events.append(("type", text))
+            self.document.extend(text)
+
+    @contextlib.contextmanager
+    def pressed(self, *keys):
+        for key in keys:
+            self.press(key)
+        try:
+            yield
+        finally:
+            for key in reversed(keys):
+                self.release(key)
+
+
+class VirtualListener:
+    """虚拟键盘监听器，接口与 pynput.keyboard.Listener 一致
+
+    由测试代码调用 emit_press / emit_release 注入按键事件。
+    """
+
+    def __init__(self, on_press=None, on_release=None):
+        self.on_press = on_press
+        self.on_release = on_release
+        self._stopped = threading.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        self._stopped.set()
+
+    def join(self, timeout=None):
+        self._stopped.wait(timeout)
+
+    def emit_press(self, key):
+        if self.on_press:
+            self.on_press(key)
+
+    def emit_release(self, key):
+        if self.on_release:
+            self.on_release(key)
+
+
+class VirtualClipboardBackend:
+    """内存剪贴板后端，接口与 ClipboardService 的后端一致"""
+
+    name = "virtual"
+
+    def __init__(self, text=""):
+        self.text = text
+        self.changes = 0
+
+    def get(self):
+        return self.text
+
+    def set(self, text):
+        self.text = text
+        self.changes += 1
+
+    def change_count(self):
+        return self.changes
@@ -6,7 +6,8 @@ load_dotenv()
 
 class TranslateProcessor:
     def __init__(self):
-        self.url = "https://api.siliconflow.cn/v1/chat/completions"
+        base_url = os.getenv("SILICONFLOW_BASE_URL", "https://api.siliconflow.cn/v1").rstrip("/")
+        self.url = f"{base_url}/chat/completions"
         self.headers = {
             'Authorization': f"Bearer {os.getenv('SILICONFLOW_API_KEY')}",
             "Content-Type": "application/json"
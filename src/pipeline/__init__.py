@@ -0,0 +1,9 @@
+"""语音处理流水线模块
+在后台线程中处理录音，并按录制顺序交付结果；
+拆分进程模式下转录和后处理在单独的转录进程中执行
+"""
+
+from .remote import RemoteProcessor
+from .utterance import UtterancePipeline
+
+__all__ = ['RemoteProcessor', 'UtterancePipeline']
@@ -0,0 +1,390 @@
+"""拆分进程模式
+
+PROCESS_MODE=split 时，主进程只负责录音、按键监听和文本输入，
+转录请求、繁简转换、翻译等网络和 CPU 开销较大的处理放到单独的转录进程中，
+避免与 PortAudio 回调和按键监听线程争用 GIL 导致录音溢出。
+
+录音数据通过 multiprocessing.shared_memory 共享内存块传递，控制消息走本机认证连接；
+转录进程的日志转发回主进程统一写入，追踪记录的各阶段也合并回主进程的 Trace。
+"""
+import atexit
+import io
+import itertools
+import logging
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from multiprocessing.connection import Client, Listener
+
+from ..transcription import AUTO_PLATFORM, PROCESSORS
+from ..utils.logger import apply_log_levels, logger
+
+ADDRESS_ENV = "TRANSCRIBER_ADDRESS"
+AUTHKEY_ENV = "TRANSCRIBER_AUTHKEY"
+
+# 项目根目录，转录进程在这里启动
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class SharedAudioPool:
+    """可复用的共享内存块
+
+    每段录音占用一个内存块，处理完成后归还复用，只有并发数超过已有内存块
+    或录音超过内存块大小时才创建新的内存块。
+    """
+
+    DEFAULT_SLOT_BYTES = 2 * 1024 * 1024  # 约 60 秒 16kHz 单声道 WAV
+
+    def __init__(self, slot_bytes=None):
+        self.slot_bytes = slot_bytes or self.DEFAULT_SLOT_BYTES
+        self._free = []
+        self._all = []
+        self._lock = threading.Lock()
+
+    def acquire(self, size):
+        with self._lock:
+            for index, block in enumerate(self._free):
+                if block.size >= size:
+                    return self._free.pop(index)
+            block = shared_memory.SharedMemory(create=True, size=max(size, self.slot_bytes))
+            self._all.append(block)
+            return block
+
+    def release(self, block):
+        with self._lock:
+            self._free.append(block)
+
+    def close(self):
+        with self._lock:
+            for block in self._all:
+                block.close()
+                try:
+                    block.unlink()
+                except FileNotFoundError:
+                    pass
+            self._all = []
+            self._free = []
+
+
+class RemoteProcessor:
+    """在转录进程中执行的转录处理器代理
+
+    接口与 WhisperProcessor / SenseVoiceSmallProcessor 一致，可以直接交给 UtterancePipeline
+    和本地转录接口使用；转录进程意外退出时，未完成的请求返回错误，并在下一次请求前重新启动。
+    """
+
+    STARTUP_TIMEOUT = 30.0
+    DEFAULT_TIMEOUT = 300.0  # 单次请求的上限，正常情况下由转录请求自身的超时（含一次重试）先触发
+
+    def __init__(self, platform):
+        if platform != AUTO_PLATFORM and platform not in PROCESSORS:
+            raise ValueError(f"无效的服务平台: {platform}")
+        self.platform = platform
+        self.CLIENT_KEYS = ()  # 由转录进程在就绪后报告
+        self.timeout = float(os.getenv("TRANSCRIBER_TIMEOUT", self.DEFAULT_TIMEOUT))
+        self.pool = SharedAudioPool()
+        self._authkey = secrets.token_bytes(32)
+        self._listener = Listener(("127.0.0.1", 0), authkey=self._authkey)
+        self._ids = itertools.count(1)
+        self._pending = {}  # 请求编号 -> (Future, 共享内存块, 发送请求的连接)
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._conn = None
+        self._connected = threading.Event()
+        self._process = None
+        self._closed = False
+        self._start()
+        atexit.register(self.close)
+
+    # ---- 转录进程管理 ----
+
+    def _start(self):
+        host, port = self._listener.address
+        env = dict(os.environ)
+        env[ADDRESS_ENV] = f"{host}:{port}"
+        env[AUTHKEY_ENV] = self._authkey.hex()
+        env["SERVICE_PLATFORM"] = self.platform
+        # 日志由主进程统一写入，转录进程不打开日志文件
+        env["LOG_FILE"] = os.devnull
+        self._connected.clear()
+        self._process = subprocess.Popen(
+            [sys.executable, "-c", "from src.pipeline.remote import main; main()"], env=env, cwd=PROJECT_ROOT
+        )
+        logger.info(f"已启动转录进程 {self._process.pid}")
+        threading.Thread(target=self._read_loop, name="transcriber-reader", daemon=True).start()
+
+    def _ensure_running(self):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("转录进程已关闭")
+            if self._process.poll() is not None:
+                logger.warning(f"转录进程已退出 (退出码 {self._process.returncode})，正在重新启动")
+                self._start()
+        deadline = time.monotonic() + self.STARTUP_TIMEOUT
+        while not self._connected.wait(0.1):
+            code = self._process.poll()
+            if code is not None:
+                raise RuntimeError(f"转录进程启动失败 (退出码 {code})")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"转录进程未在 {self.STARTUP_TIMEOUT:.0f} 秒内就绪")
+        return self._conn
+
+    def _read_loop(self):
+        conn = None
+        try:
+            conn = self._listener.accept()
+            hello = conn.recv()
+            self.CLIENT_KEYS = tuple(hello.get("client_keys", ()))
+            with self._lock:
+                self._conn = conn
+                self._connected.set()
+            while True:
+                message = conn.recv()
+                kind = message.get("type")
+                if kind == "log":
+                    record = logging.makeLogRecord(message["record"])
+                    logging.getLogger(record.name).handle(record)
+                elif kind == "client_keys":
+                    self.CLIENT_KEYS = tuple(message["client_keys"])
+                else:
+                    with self._lock:
+                        future, block, _ = self._pending.pop(message.get("id"), (None, None, None))
+                    if block is not None:
+                        self.pool.release(block)
+                    if future is not None:
+                        future.set_result(message)
+        except (EOFError, OSError):
+            pass
+        if conn is None:
+            return
+        # 连接断开后转录进程不会再访问这些内存块，归还并让等待中的请求失败
+        with self._lock:
+            if self._conn is conn:
+                self._connected.clear()
+            failed = [key for key, item in self._pending.items() if item[2] is conn]
+            failed = [self._pending.pop(key) for key in failed]
+        for future, block, _ in failed:
+            if block is not None:
+                self.pool.release(block)
+            future.set_exception(RuntimeError("转录进程已退出"))
+
+    def _call(self, kind, block=None, timeout=None, **fields):
+        """发送一条请求并等待转录进程回复"""
+        try:
+            conn = self._ensure_running()
+        except Exception:
+            if block is not None:
+                self.pool.release(block)
+            raise
+        future = Future()
+        with self._lock:
+            request_id = next(self._ids)
+            self._pending[request_id] = (future, block, conn)
+        try:
+            with self._send_lock:
+                conn.send({"type": kind, "id": request_id, **fields})
+        except (OSError, ValueError) as e:
+            with self._lock:
+                self._pending.pop(request_id, None)
+            if block is not None:
+                self.pool.release(block)
+            raise RuntimeError(f"无法连接转录进程: {e}") from None
+        # 超时后内存块仍归属这个请求，等转录进程回复或退出时才归还
+        reply = future.result(timeout or self.timeout)
+        if reply.get("error") and kind != "process":
+            raise RuntimeError(reply["error"])
+        return reply
+
+    # ---- 转录处理器接口 ----
+
+    def process_audio(self, audio_buffer, mode="transcriptions", prompt="", trace=None):
+        """把录音写入共享内存，由转录进程处理，返回 (结果文本, 错误信息)"""
+        with audio_buffer.getbuffer() as data:
+            size = data.nbytes
+            block = self.pool.acquire(size)
+            block.buf[:size] = data
+        audio_buffer.close()
+
+        sent_at = time.monotonic()
+        try:
+            reply = self._call(
+                "process", block=block, name=block.name, size=size, mode=mode, prompt=prompt,
+                trace=trace is not None,
+            )
+        except Exception as e:
+            error_msg = f"❌ 转录进程出错: {e or type(e).__name__}"
+            logger.error(error_msg)
+            if trace is not None and isinstance(e, TimeoutError):
+                trace.set(error_kind="timeout")
+            return None, error_msg
+
+        if trace is not None:
+            trace.add_span("handoff", sent_at, reply["received_at"])
+            for name, start, end in reply.get("spans", ()):
+                trace.add_span(name, start, end)
+            trace.set(**reply.get("attributes", {}))
+        return reply.get("text"), reply.get("error")
+
+    def warm_up(self):
+        self._call("warm_up")
+
+    def reconfigure(self):
+        self._call("reconfigure")
+
+    def sync_env(self, keys):
+        """把主进程中变化的环境变量同步到转录进程"""
+        self._call("config", env={key: os.environ.get(key) for key in keys})
+
+    def switch(self, platform):
+        """在转录进程中创建并预热新的处理器后整体替换，失败时抛出异常并保留原处理器"""
+        self._call("switch", platform=platform)
+        self.platform = platform
+
+    def close(self, timeout=5.0):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        if self._conn is not None:
+            self._conn.close()
+        if self._process is not None:
+            try:
+                self._process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        self._listener.close()
+        self.pool.close()
+
+
+# ---------------- 转录进程 ----------------
+
+
+class ConnectionLogHandler(logging.Handler):
+    """把日志记录发送给主进程"""
+
+    def __init__(self, send):
+        super().__init__()
+        self.send = send
+
+    def emit(self, record):
+        try:
+            # 与 QueueHandler.prepare 相同，提前格式化消息和异常，保证可以序列化
+            message = record.getMessage()
+            data = dict(record.__dict__)
+            data.update(msg=message, args=None, exc_info=None, exc_text=None)
+            if record.exc_info:
+                data["msg"] = f"{message}\n{logging.Formatter().formatException(record.exc_info)}"
+            self.send({"type": "log", "record": data})
+        except Exception:
+            self.handleError(record)
+
+
+class TranscriberWorker:
+    """转录进程：接收主进程的请求，在线程池中调用转录处理器"""
+
+    def __init__(self, conn):
+        from ..transcription import create_processor
+        from ..utils.tracing import Trace
+
+        self.conn = conn
+        self.create_processor = create_processor
+        self.Trace = Trace
+        self._send_lock = threading.Lock()
+        self._blocks = {}  # 共享内存块名称 -> 已映射的 SharedMemory
+        self._blocks_lock = threading.Lock()
+        workers = int(os.getenv("PIPELINE_WORKERS", 2)) + int(os.getenv("API_MAX_CONCURRENT", 2))
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcriber")
+        self.processor = create_processor(os.getenv("SERVICE_PLATFORM", "siliconflow"))
+
+    def send(self, message):
+        with self._send_lock:
+            self.conn.send(message)
+
+    def run(self):
+        for handler in logger.handlers[:]:
+            logger.removeHandler(handler)
+        logger.addHandler(ConnectionLogHandler(self.send))
+        self.send({"type": "hello", "pid": os.getpid(), "client_keys": list(self.processor.CLIENT_KEYS)})
+        try:
+            while True:
+                message = self.conn.recv()
+                self._executor.submit(self._handle, message, time.monotonic())
+        except (EOFError, OSError):
+            pass
+        # 主进程已关闭连接，处理完已收到的请求后退出
+        self._executor.shutdown(wait=True)
+        for block in self._blocks.values():
+            block.close()
+
+    def _handle(self, message, received_at):
+        kind = message["type"]
+        reply = {"id": message["id"], "received_at": received_at}
+        try:
+            if kind == "process":
+                reply.update(self._process(message))
+            elif kind == "warm_up":
+                self.processor.warm_up()
+            elif kind == "reconfigure":
+                self.processor.reconfigure()
+            elif kind == "config":
+                for key, value in message["env"].items():
+                    if value is None:
+                        os.environ.pop(key, None)
+                    else:
+                        os.environ[key] = value
+                apply_log_levels()
+            elif kind == "switch":
+                processor = self.create_processor(message["platform"])
+                processor.warm_up()
+                self.processor = processor
+                self.send({"type": "client_keys", "client_keys": list(processor.CLIENT_KEYS)})
+        except Exception as e:
+            logger.error(f"转录进程处理 {kind} 失败: {e}", exc_info=True)
+            reply["error"] = f"❌ {e}"
+        try:
+            self.send(reply)
+        except (OSError, ValueError):
+            pass
+
+    def _attach(self, name):
+        with self._blocks_lock:
+            block = self._blocks.get(name)
+            if block is None:
+                block = _attach_shared_memory(name)
+                self._blocks[name] = block
+            return block
+
+    def _process(self, message):
+        block = self._attach(message["name"])
+        audio = io.BytesIO(block.buf[:message["size"]])
+        trace = self.Trace(message["mode"]) if message["trace"] else None
+        text, error = self.processor.process_audio(audio, mode=message["mode"], prompt=message["prompt"], trace=trace)
+        result = {"text": text, "error": error}
+        if trace is not None:
+            result["spans"] = trace.spans
+            result["attributes"] = trace.attributes
+        return result
+
+
+def _attach_shared_memory(name):
+    """映射主进程创建的共享内存块，由主进程负责释放"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.13 之前没有 track 参数，需要取消 resource_tracker 的登记，
+        # 否则转录进程退出时会删除主进程仍在使用的内存块
+        from multiprocessing import resource_tracker
+        block = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(block._name, "shared_memory")
+        return block
+
+
+def main():
+    host, port = os.environ[ADDRESS_ENV].rsplit(":", 1)
+    conn = Client((host, int(port)), authkey=bytes.fromhex(os.environ[AUTHKEY_ENV]))
+    TranscriberWorker(conn).run()
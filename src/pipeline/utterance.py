@@ -0,0 +1,82 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ..utils.logger import hot_logger, logger
+from ..utils.profiling import profile_thread
+
+
+class UtterancePipeline:
+    """语音片段工作队列
+
+    键盘线程只负责提交录音，转录、翻译等网络请求在工作线程中并发执行，
+    结果由交付线程按提交顺序依次回调，保证先说的话先输入。
+    """
+
+    DEFAULT_WORKERS = 2
+
+    def __init__(self, process, deliver, workers=None):
+        """
+        Args:
+            process: 处理函数 process(audio, mode, trace)，返回 (文本, 错误信息)
+            deliver: 交付函数 deliver(文本, 错误信息, trace)，按提交顺序调用
+            workers: 工作线程数，默认读取 PIPELINE_WORKERS 环境变量
+        """
+        self.process = process
+        self.deliver = deliver
+        workers = workers or int(os.getenv("PIPELINE_WORKERS", self.DEFAULT_WORKERS))
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="utterance")
+        self._futures = queue.Queue()  # 按提交顺序排列的待交付任务
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._delivery_thread = threading.Thread(target=self._deliver_loop, name="utterance-delivery", daemon=True)
+        self._delivery_thread.start()
+
+    @property
+    def pending(self):
+        """尚未交付的语音片段数量"""
+        return self._pending
+
+    def submit(self, audio, mode, trace=None):
+        """提交一段录音，立即返回"""
+        with self._lock:
+            self._pending += 1
+        future = self._executor.submit(self._process, audio, mode, trace, time.monotonic())
+        self._futures.put((future, trace))
+        hot_logger.info(f"录音已加入处理队列 (模式: {mode}, 待处理: {self.pending})")
+
+    def _process(self, audio, mode, trace, submitted_at):
+        """在工作线程中执行处理函数"""
+        if trace is not None:
+            trace.add_span("queue", submitted_at)
+        with profile_thread(trace):
+            return self.process(audio, mode, trace)
+
+    def _deliver_loop(self):
+        """按提交顺序等待并交付结果"""
+        while True:
+            item = self._futures.get()
+            if item is None:
+                break
+            future, trace = item
+            try:
+                text, error = future.result()
+            except Exception as e:
+                logger.error(f"语音处理失败: {e}", exc_info=True)
+                text, error = None, f"❌ {e}"
+            try:
+                self.deliver(text, error, trace)
+            except Exception as e:
+                logger.error(f"交付识别结果失败: {e}", exc_info=True)
+            finally:
+                with self._lock:
+                    self._pending -= 1
+
+    def shutdown(self, wait=True):
+        """停止接收新任务，等待已提交的任务交付完毕"""
+        self._futures.put(None)
+        self._executor.shutdown(wait=wait)
+        if wait:
+            self._delivery_thread.join()
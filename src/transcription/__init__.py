@@ -1 +1,29 @@
+"""语音转录模块
+按 SERVICE_PLATFORM 只导入选中的转录服务，未使用的服务及其依赖不会被加载；
+SERVICE_PLATFORM=auto 时按各服务商最近的耗时自动选择
+"""
 
+import importlib
+
+# 服务平台 -> (模块名, 类名)
+PROCESSORS = {
+    "groq": ("whisper", "WhisperProcessor"),
+    "siliconflow": ("senseVoiceSmall", "SenseVoiceSmallProcessor"),
+}
+AUTO_PLATFORM = "auto"
+
+
+def create_processor(platform):
+    """导入并创建指定平台的转录处理器，auto 时创建在各服务商之间选择的 ProviderRouter"""
+    if platform == AUTO_PLATFORM:
+        from .router import ProviderRouter
+        return ProviderRouter()
+    try:
+        module_name, class_name = PROCESSORS[platform]
+    except KeyError:
+        raise ValueError(f"无效的服务平台: {platform}") from None
+    module = importlib.import_module(f".{module_name}", __name__)
+    return getattr(module, class_name)()
+
+
+__all__ = ['AUTO_PLATFORM', 'PROCESSORS', 'create_processor']
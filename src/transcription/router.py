@@ -0,0 +1,164 @@
+import io
+import os
+import random
+import threading
+import time
+
+from ..utils.logger import hot_logger, logger
+from ..utils.metrics import get_registry
+from .timeouts import AdaptiveTimeout, wav_duration
+
+
+class ProviderStats:
+    """一个服务商在一个录音时长区间内的指数加权平均耗时和失败率"""
+
+    def __init__(self):
+        self.latency = None  # 秒
+        self.error_rate = 0.0
+        self.count = 0
+
+    def update(self, seconds, error, alpha):
+        self.count += 1
+        self.error_rate += alpha * ((1.0 if error else 0.0) - self.error_rate)
+        if error:
+            return
+        self.latency = seconds if self.latency is None else self.latency + alpha * (seconds - self.latency)
+
+    def expected(self):
+        """预计得到结果的时间：失败后需要重新录音，按成功率折算；没有成功样本时返回 None"""
+        if self.latency is None:
+            return None
+        return self.latency / max(0.05, 1.0 - self.error_rate)
+
+
+class ProviderRouter:
+    """按录音时长选择预计最快的转录服务（SERVICE_PLATFORM=auto）
+
+    每个服务商、每个录音时长区间分别统计处理耗时和失败率的指数加权平均（ROUTER_EWMA_ALPHA），
+    每句语音交给预计最快的服务商；以 ROUTER_PROBE_RATE 的比例随机交给其他服务商，
+    使统计跟上网络和服务端负载的变化。没有统计数据的区间使用 ROUTER_PROVIDERS 中的第一个。
+    ROUTER_OVERRIDE 可以临时固定使用某个服务商，修改 .env 后立即生效。
+    选中的服务商失败时交给下一个服务商重试一次（ROUTER_FAILOVER）；此时选中的服务商不再用新连接
+    重试，第一次超时后立即转交，短录音在一秒内就能换到另一个服务商。
+
+    对外接口与单个转录处理器相同，可以直接替换 create_processor 的返回值。
+    """
+
+    DEFAULT_PROBE_RATE = 0.05
+    DEFAULT_ALPHA = 0.2
+    SUMMARY_EVERY = 50  # 每处理多少句输出一次统计
+
+    def __init__(self, platforms=None):
+        from . import PROCESSORS, create_processor
+
+        if platforms is None:
+            platforms = [name.strip() for name in os.getenv("ROUTER_PROVIDERS", ",".join(PROCESSORS)).split(",")]
+        self.processors = {}
+        for platform in filter(None, platforms):
+            try:
+                self.processors[platform] = create_processor(platform)
+            except (AssertionError, ValueError) as e:
+                # 未配置 API KEY 的服务商不参与路由
+                logger.warning(f"转录服务 {platform} 不可用，不参与自动选择: {e}")
+        if not self.processors:
+            raise ValueError("没有可用的转录服务，请检查 ROUTER_PROVIDERS 和各服务商的 API KEY")
+        self.CLIENT_KEYS = tuple(sorted({
+            key for processor in self.processors.values() for key in processor.CLIENT_KEYS
+        } | {"ROUTER_PROVIDERS"}))
+        self.metrics = get_registry()
+        self._stats = {
+            (platform, bucket): ProviderStats() for platform in self.processors for bucket in AdaptiveTimeout.BUCKETS
+        }
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self._decisions = 0
+        logger.info(f"自动选择转录服务: {', '.join(self.processors)}")
+
+    @staticmethod
+    def _bucket(audio_seconds):
+        return next(bucket for bucket in AdaptiveTimeout.BUCKETS if audio_seconds <= bucket)
+
+    def reconfigure(self):
+        for processor in self.processors.values():
+            processor.reconfigure()
+
+    def warm_up(self):
+        for processor in self.processors.values():
+            processor.warm_up()
+
+    def choose(self, audio_seconds):
+        """返回 (服务商, 原因, 预计耗时)，原因为 override/best/probe/default"""
+        override = os.getenv("ROUTER_OVERRIDE", "").strip()
+        if override:
+            if override in self.processors:
+                return override, "override", None
+            hot_logger.warning(f"ROUTER_OVERRIDE={override} 不是可用的转录服务，忽略")
+        bucket = self._bucket(audio_seconds)
+        with self._lock:
+            expected = {platform: self._stats[(platform, bucket)].expected() for platform in self.processors}
+        known = sorted((seconds, platform) for platform, seconds in expected.items() if seconds is not None)
+        if known:
+            best, reason = known[0][1], "best"
+        else:
+            best, reason = next(iter(self.processors)), "default"
+        others = [platform for platform in self.processors if platform != best]
+        probe_rate = float(os.getenv("ROUTER_PROBE_RATE", self.DEFAULT_PROBE_RATE))
+        if others and self._random.random() < probe_rate:
+            platform = self._random.choice(others)
+            return platform, "probe", expected[platform]
+        return best, reason, expected[best]
+
+    def observe(self, platform, audio_seconds, seconds, error):
+        alpha = float(os.getenv("ROUTER_EWMA_ALPHA", self.DEFAULT_ALPHA))
+        with self._lock:
+            self._stats[(platform, self._bucket(audio_seconds))].update(seconds, error, alpha)
+            self._decisions += 1
+            summary = self._decisions % self.SUMMARY_EVERY == 0
+        if summary:
+            logger.info(f"转录服务统计: {self.snapshot()}")
+
+    def snapshot(self):
+        """各服务商、各时长区间的统计，用于日志和排查"""
+        with self._lock:
+            return {
+                f"{platform}/≤{bucket:g}s": {
+                    "latency_ms": None if stats.latency is None else round(stats.latency * 1000),
+                    "error_rate": round(stats.error_rate, 3),
+                    "count": stats.count,
+                }
+                for (platform, bucket), stats in self._stats.items() if stats.count
+            }
+
+    def process_audio(self, audio_buffer, mode="transcriptions", prompt="", trace=None):
+        """选择服务商处理音频，返回值与单个处理器相同: (结果文本, 错误信息)"""
+        audio_seconds = wav_duration(audio_buffer)
+        platform, reason, expected = self.choose(audio_seconds)
+        estimate = "" if expected is None else f"，预计 {expected * 1000:.0f}ms"
+        hot_logger.info(f"路由: {platform}（{reason}，录音 {audio_seconds:.1f}秒{estimate}）")
+        self.metrics.inc("route_decisions", provider=platform, reason=reason)
+        if trace is not None:
+            trace.set(route=platform, route_reason=reason)
+
+        fallback = None
+        if reason != "override" and os.getenv("ROUTER_FAILOVER", "true").lower() == "true":
+            fallback = next((name for name in self.processors if name != platform), None)
+
+        # 处理器结束时会关闭缓冲区，失败转移时用原始字节重新创建
+        data = audio_buffer.getvalue()
+        result, error = self._process(
+            platform, audio_buffer, mode, prompt, trace, audio_seconds, retry=fallback is None)
+        if error and fallback is not None:
+            hot_logger.warning(f"{platform} 处理失败，转交 {fallback}: {error}")
+            self.metrics.inc("route_decisions", provider=fallback, reason="failover")
+            if trace is not None:
+                trace.set(route=fallback, route_reason="failover", route_failed=platform)
+            result, error = self._process(fallback, io.BytesIO(data), mode, prompt, trace, audio_seconds)
+        return result, error
+
+    def _process(self, platform, audio_buffer, mode, prompt, trace, audio_seconds, retry=True):
+        start = time.monotonic()
+        result = self.processors[platform].process_audio(
+            audio_buffer, mode=mode, prompt=prompt, trace=trace, retry=retry)
+        result, error = result if isinstance(result, tuple) else (result, None)
+        self.observe(platform, audio_seconds, time.monotonic() - start, bool(error))
+        return result, error
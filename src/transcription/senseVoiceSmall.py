@@ -1,72 +1,105 @@
 import os
 import threading
 import time
-from functools import wraps
+from collections import namedtuple
 
 import dotenv
 import httpx
 
-from src.llm.translate import TranslateProcessor
-from ..utils.logger import logger
+from ..utils.converter import get_t2s_converter
+from ..utils.logger import hot_logger, logger
+from ..utils.tracing import HttpTraceHook, span
+from .timeouts import get_adaptive_timeout
 
 dotenv.load_dotenv()
 
-def timeout_decorator(seconds):
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            result = [None]
-            error = [None]
-            completed = threading.Event()
-
-            def target():
-                try:
-                    result[0] = func(*args, **kwargs)
-                except Exception as e:
-                    error[0] = e
-                finally:
-                    completed.set()
-
-            thread = threading.Thread(target=target)
-            thread.daemon = True
-            thread.start()
-
-            if completed.wait(seconds):
-                if error[0] is not None:
-                    raise error[0]
-                return result[0]
-            raise TimeoutError(f"操作超时 ({seconds}秒)")
-
-        return wrapper
-    return decorator
+# 后处理配置，热更新时整体替换；处理中的语音在开始时取一次，之后不受替换影响
+PostProcessing = namedtuple("PostProcessing", ["base_url", "converter"])
 
 class SenseVoiceSmallProcessor:
     # 类级别的配置参数
-    DEFAULT_TIMEOUT = 20  # API 超时时间（秒）
+    PROVIDER = "siliconflow"
+    CLIENT_KEYS = ()  # API KEY 每次请求时读取，配置变化不需要重新创建处理器
     DEFAULT_MODEL = "FunAudioLLM/SenseVoiceSmall"
+    DEFAULT_BASE_URL = "https://api.siliconflow.cn/v1"
     
     def __init__(self):
         api_key = os.getenv("SILICONFLOW_API_KEY")
         assert api_key, "未设置 SILICONFLOW_API_KEY 环境变量"
         
-        self.convert_to_simplified = os.getenv("CONVERT_TO_SIMPLIFIED", "false").lower() == "true"
-        # self.cc = OpenCC('t2s') if self.convert_to_simplified else None
         # self.symbol = SymbolProcessor()
         # self.add_symbol = os.getenv("ADD_SYMBOL", "false").lower() == "true"
         # self.optimize_result = os.getenv("OPTIMIZE_RESULT", "false").lower() == "true"
-        self.timeout_seconds = self.DEFAULT_TIMEOUT
-        self.translate_processor = TranslateProcessor()
+        self.timeouts = get_adaptive_timeout(self.PROVIDER)  # 按录音时长和最近耗时计算每次请求的超时
+        # HTTP 客户端和翻译处理器在首次使用（或后台预热）时才创建
+        self._client = None
+        self._translate_processor = None
+        self._init_lock = threading.Lock()
+        self.reconfigure()
 
-    def _convert_traditional_to_simplified(self, text):
+    def reconfigure(self):
+        """重新读取后处理配置，保留常驻的 HTTP 连接和繁简转换表
+
+        在配置监控线程中调用，新配置一次赋值生效，不会与处理中的语音交错读到一半新、一半旧的配置。
+        """
+        convert = os.getenv("CONVERT_TO_SIMPLIFIED", "false").lower() == "true"
+        self.post_processing = PostProcessing(
+            base_url=os.getenv("SILICONFLOW_BASE_URL", self.DEFAULT_BASE_URL).rstrip("/"),
+            converter=get_t2s_converter() if convert else None,
+        )
+        # 翻译处理器在创建时读取模型和 API KEY，下次使用时按新配置重新创建
+        self._translate_processor = None
+
+    @property
+    def client(self):
+        """常驻的 HTTP 客户端，多次请求复用同一连接，省去每次的 TCP/TLS 握手"""
+        if self._client is None:
+            with self._init_lock:
+                if self._client is None:
+                    self._client = httpx.Client()
+        return self._client
+
+    @property
+    def translate_processor(self):
+        """翻译处理器，首次访问时创建"""
+        # 只读一次属性，配置热更新同时把它重置为 None 时仍返回可用的处理器
+        processor = self._translate_processor
+        if processor is None:
+            with self._init_lock:
+                processor = self._translate_processor
+                if processor is None:
+                    from ..llm.translate import TranslateProcessor
+                    processor = self._translate_processor = TranslateProcessor()
+        return processor
+
+    def warm_up(self):
+        """提前创建客户端并加载繁简转换表，由后台线程在启动后调用"""
+        self.client
+        self.translate_processor
+        converter = self.post_processing.converter
+        if converter is not None:
+            converter.load()
+
+    @staticmethod
+    def _convert_traditional_to_simplified(text, settings):
         """将繁体中文转换为简体中文"""
-        if not self.convert_to_simplified or not text:
+        if settings.converter is None or not text:
             return text
-        return self.cc.convert(text)
-
-    @timeout_decorator(10)
-    def _call_api(self, audio_data):
-        """调用硅流 API"""
-        transcription_url = "https://api.siliconflow.cn/v1/audio/transcriptions"
+        return settings.converter.convert(text)
+
+    def _call_api(self, audio_data, base_url, trace=None, retry=True):
+        """调用硅流 API，超时或连接失败时换新连接重试一次"""
+        return self.timeouts.run(
+            lambda timeout: self._post_audio(audio_data, base_url, timeout, trace),
+            audio_data,
+            retryable=(httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError),
+            timeouts=httpx.TimeoutException,
+            retry=retry,
+        )
+
+    def _post_audio(self, audio_data, base_url, timeout, trace=None):
+        """上传音频并返回识别文本"""
+        transcription_url = f"{base_url}/audio/transcriptions"
         
         files = {
             'file': ('audio.wav', audio_data),
@@ -77,35 +110,44 @@ class SenseVoiceSmallProcessor:
             'Authorization': f"Bearer {os.getenv('SILICONFLOW_API_KEY')}"
         }
 
-        with httpx.Client() as client:
-            response = client.post(transcription_url, files=files, headers=headers)
-            response.raise_for_status()
-            return response.json().get('text', '获取失败')
+        # 通过 httpx 的 trace 扩展记录连接、上传、服务端处理和下载耗时
+        extensions = {"trace": HttpTraceHook(trace)} if trace is not None else None
+        response = self.client.post(
+            transcription_url, files=files, headers=headers, timeout=timeout, extensions=extensions)
+        response.raise_for_status()
+        return response.json().get('text', '获取失败')
 
 
-    def process_audio(self, audio_buffer, mode="transcriptions", prompt=""):
+    def process_audio(self, audio_buffer, mode="transcriptions", prompt="", trace=None, retry=True):
         """处理音频（转录或翻译）
         
         Args:
             audio_buffer: 音频数据缓冲
             mode: 'transcriptions' 或 'translations'，决定是转录还是翻译
+            trace: 可选的 Trace，记录请求和后处理各阶段耗时
+            retry: 超时或连接失败时是否用新连接重试；有其他服务商可以转交时为 False
         
         Returns:
             tuple: (结果文本, 错误信息)
             - 如果成功，错误信息为 None
             - 如果失败，结果文本为 None
         """
+        settings = self.post_processing
         try:
             start_time = time.time()
+            if trace is not None:
+                trace.set(provider=self.PROVIDER, audio_bytes=audio_buffer.getbuffer().nbytes)
             
-            logger.info(f"正在调用 硅基流动 API... (模式: {mode})")
-            result = self._call_api(audio_buffer)
+            hot_logger.info(f"正在调用 硅基流动 API... (模式: {mode})")
+            result = self._call_api(audio_buffer, settings.base_url, trace, retry)
 
-            logger.info(f"API 调用成功 ({mode}), 耗时: {time.time() - start_time:.1f}秒")
-            # result = self._convert_traditional_to_simplified(result)
+            hot_logger.info(f"API 调用成功 ({mode}), 耗时: {time.time() - start_time:.1f}秒")
+            with span(trace, "t2s"):
+                result = self._convert_traditional_to_simplified(result, settings)
             if mode == "translations":
-                result = self.translate_processor.translate(result)
-            logger.info(f"识别结果: {result}")
+                with span(trace, "translate"):
+                    result = self.translate_processor.translate(result)
+            hot_logger.info(f"识别结果: {result}")
             
             # if self.add_symbol:
             #     result = self.symbol.add_symbol(result)
@@ -116,9 +158,11 @@ class SenseVoiceSmallProcessor:
 
             return result, None
 
-        except TimeoutError:
-            error_msg = f"❌ API 请求超时 ({self.timeout_seconds}秒)"
+        except TimeoutError as e:
+            error_msg = f"❌ API 请求超时 ({e})"
             logger.error(error_msg)
+            if trace is not None:
+                trace.set(error_kind="timeout")
             return None, error_msg
         except Exception as e:
             error_msg = f"❌ {str(e)}"
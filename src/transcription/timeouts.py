@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+import wave
+from collections import deque
+
+import httpx
+
+from ..utils.logger import hot_logger
+from ..utils.metrics import get_registry
+
+
+def wav_duration(audio_buffer):
+    """从 WAV 头读取录音时长（秒）；不是 WAV 时按 16kHz 16 位单声道估算（压缩格式会偏大，超时更宽松）"""
+    position = audio_buffer.tell()
+    try:
+        with wave.open(audio_buffer, "rb") as wav:
+            return wav.getnframes() / wav.getframerate()
+    except (wave.Error, EOFError, ZeroDivisionError):
+        return audio_buffer.getbuffer().nbytes / 32000
+    finally:
+        audio_buffer.seek(position)
+
+
+class AdaptiveTimeout:
+    """按录音时长、上传大小和最近的请求耗时计算单次转录请求的超时
+
+    - connect：建立连接（TIMEOUT_CONNECT），复用长连接时不涉及
+    - write：按最低上传速度（TIMEOUT_UPLOAD_KBPS）估算上传这段音频所需的时间
+    - read：上传完成后等待服务端响应的时间。同一时长区间内有足够样本时取最近请求耗时的 p95
+      乘以 TIMEOUT_READ_FACTOR，否则按录音时长估算；再限制在 TIMEOUT_READ_MIN ~ TIMEOUT_READ_MAX
+
+    短录音的 read 超时通常不到一秒，连接失效（如休眠唤醒后）时很快失败，
+    再用新连接和按时长估算的宽松超时重试一次（TIMEOUT_RETRY）。
+    """
+
+    BUCKETS = (3, 10, 30, 120, float("inf"))  # 按录音时长（秒）分开统计，长录音不会拉高短录音的超时
+    WINDOW = 100
+    MIN_SAMPLES = 5
+    READ_BASE = 3.0  # 没有足够样本时的估算：基础耗时 + 每秒录音增加的耗时
+    READ_PER_AUDIO_SECOND = 0.25
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.metrics = get_registry()
+        self._samples = {bucket: deque(maxlen=self.WINDOW) for bucket in self.BUCKETS}
+        self._lock = threading.Lock()
+
+    def _bucket(self, audio_seconds):
+        return next(bucket for bucket in self.BUCKETS if audio_seconds <= bucket)
+
+    def expected(self, audio_seconds):
+        """同一时长区间内最近请求耗时的 p95（秒），样本不足时返回 None"""
+        with self._lock:
+            samples = sorted(self._samples[self._bucket(audio_seconds)])
+        if len(samples) < self.MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def observe(self, audio_seconds, seconds):
+        with self._lock:
+            self._samples[self._bucket(audio_seconds)].append(seconds)
+
+    def budget(self, audio_seconds, upload_bytes, retry=False):
+        """返回 httpx.Timeout；重试时不使用统计值，按录音时长估算"""
+        connect = float(os.getenv("TIMEOUT_CONNECT", "1.0"))
+        upload_rate = float(os.getenv("TIMEOUT_UPLOAD_KBPS", "128")) * 1024
+        read_min = float(os.getenv("TIMEOUT_READ_MIN", "0.8"))
+        read_max = float(os.getenv("TIMEOUT_READ_MAX", "120"))
+        expected = None if retry else self.expected(audio_seconds)
+        if expected is None:
+            read = self.READ_BASE + self.READ_PER_AUDIO_SECOND * audio_seconds
+        else:
+            read = expected * float(os.getenv("TIMEOUT_READ_FACTOR", "3"))
+        read = min(read_max, max(read_min, read))
+        write = connect + upload_bytes / upload_rate
+        return httpx.Timeout(connect=connect, write=write, read=read, pool=connect)
+
+    def run(self, call, audio_buffer, retryable, timeouts, retry=True):
+        """执行 call(timeout) 并记录耗时；timeouts 中的异常或 retryable 中的连接错误时重试一次
+
+        retry=False 时不重试，由调用方（如 ProviderRouter 转交其他服务商）处理失败。
+        超时最终以 TimeoutError 抛出，由处理器按超时错误上报。
+        """
+        audio_seconds = wav_duration(audio_buffer)
+        upload_bytes = audio_buffer.getbuffer().nbytes
+        attempts = 2 if retry and os.getenv("TIMEOUT_RETRY", "true").lower() == "true" else 1
+        for attempt in range(attempts):
+            timeout = self.budget(audio_seconds, upload_bytes, retry=attempt > 0)
+            audio_buffer.seek(0)
+            start = time.monotonic()
+            try:
+                result = call(timeout)
+            except retryable as e:
+                elapsed = time.monotonic() - start
+                if attempt + 1 < attempts:
+                    self.metrics.inc("request_retries", provider=self.provider, kind=type(e).__name__)
+                    hot_logger.warning(f"请求失败 ({type(e).__name__}, {elapsed:.1f}秒)，使用新连接重试")
+                    continue
+                if isinstance(e, timeouts):
+                    raise TimeoutError(
+                        f"{type(e).__name__}，read 超时 {timeout.read:.1f}秒，已等待 {elapsed:.1f}秒") from e
+                raise
+            self.observe(audio_seconds, time.monotonic() - start)
+            return result
+
+
+_timeouts = {}
+_timeouts_lock = threading.Lock()
+
+
+def get_adaptive_timeout(provider):
+    """获取服务商共享的超时统计，切换平台重新创建处理器时保留"""
+    with _timeouts_lock:
+        timeout = _timeouts.get(provider)
+        if timeout is None:
+            timeout = _timeouts[provider] = AdaptiveTimeout(provider)
+        return timeout
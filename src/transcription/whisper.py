@@ -1,69 +1,45 @@
 import os
 import threading
 import time
-from functools import wraps
+from collections import namedtuple
 
 import dotenv
 import httpx
-from openai import OpenAI
-from opencc import OpenCC
 
-from ..llm.symbol import SymbolProcessor
-from ..utils.logger import logger
+from ..utils.converter import get_t2s_converter
+from ..utils.logger import hot_logger, logger
+from ..utils.tracing import HttpTraceHook, span
+from .timeouts import get_adaptive_timeout
 
 dotenv.load_dotenv()
 
-def timeout_decorator(seconds):
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            result = [None]
-            error = [None]
-            completed = threading.Event()
-
-            def target():
-                try:
-                    result[0] = func(*args, **kwargs)
-                except Exception as e:
-                    error[0] = e
-                finally:
-                    completed.set()
-
-            thread = threading.Thread(target=target)
-            thread.daemon = True
-            thread.start()
-
-            if completed.wait(seconds):
-                if error[0] is not None:
-                    raise error[0]
-                return result[0]
-            raise TimeoutError(f"操作超时 ({seconds}秒)")
-
-        return wrapper
-    return decorator
+# 后处理配置，热更新时整体替换；处理中的语音在开始时取一次，之后不受替换影响
+PostProcessing = namedtuple("PostProcessing", ["converter", "add_symbol", "optimize_result"])
 
 class WhisperProcessor:
     # 类级别的配置参数
-    DEFAULT_TIMEOUT = 20  # API 超时时间（秒）
+    PROVIDER = "groq"
+    CLIENT_KEYS = ("GROQ_API_KEY", "GROQ_BASE_URL")  # 变化后需要重新创建处理器的配置
     DEFAULT_MODEL = None
     
     def __init__(self):
         api_key = os.getenv("GROQ_API_KEY")
-        base_url = os.getenv("GROQ_BASE_URL")
-        self.convert_to_simplified = os.getenv("CONVERT_TO_SIMPLIFIED", "false").lower() == "true"
-        self.cc = OpenCC('t2s') if self.convert_to_simplified else None
-        self.symbol = SymbolProcessor()
-        self.add_symbol = os.getenv("ADD_SYMBOL", "false").lower() == "true"
-        self.optimize_result = os.getenv("OPTIMIZE_RESULT", "false").lower() == "true"
-        self.timeout_seconds = self.DEFAULT_TIMEOUT
+        self.base_url = os.getenv("GROQ_BASE_URL")
+        self.api_key = api_key
+        # API 客户端和标点处理器在首次使用（或后台预热）时才创建，避免启动时导入 openai
+        self._client = None
+        self._symbol = None
+        self._init_lock = threading.Lock()
+        self._request_trace = threading.local()  # 当前线程正在上传的语音的 Trace，供 HTTP 请求钩子读取
+        self.reconfigure()
+        self.timeouts = get_adaptive_timeout(self.PROVIDER)  # 按录音时长和最近耗时计算每次请求的超时
         self.service_platform = os.getenv("SERVICE_PLATFORM", "groq").lower()
+        if self.service_platform == "auto":
+            # 由 ProviderRouter 创建时作为 Groq 处理器使用
+            self.service_platform = self.PROVIDER
 
         if self.service_platform == "groq":
             assert api_key, "未设置 GROQ_API_KEY 环境变量"
-            self.client = OpenAI(
-                api_key=api_key,
-                base_url=base_url if base_url else None
-            )
             self.DEFAULT_MODEL = "whisper-large-v3-turbo"
         elif self.service_platform == "siliconflow":
             assert api_key, "未设置 SILICONFLOW_API_KEY 环境变量"
@@ -71,68 +47,153 @@ class WhisperProcessor:
         else:
             raise ValueError(f"未知的平台: {self.service_platform}")
 
-    def _convert_traditional_to_simplified(self, text):
+    def reconfigure(self):
+        """重新读取后处理配置，保留已创建的客户端和繁简转换表
+
+        在配置监控线程中调用，新配置一次赋值生效，不会与处理中的语音交错读到一半新、一半旧的配置。
+        """
+        convert = os.getenv("CONVERT_TO_SIMPLIFIED", "false").lower() == "true"
+        self.post_processing = PostProcessing(
+            converter=get_t2s_converter() if convert else None,
+            add_symbol=os.getenv("ADD_SYMBOL", "false").lower() == "true",
+            optimize_result=os.getenv("OPTIMIZE_RESULT", "false").lower() == "true",
+        )
+        if self._symbol is not None:
+            self._symbol.model = os.getenv("GROQ_ADD_SYMBOL_MODEL", "llama3-8b-8192")
+
+    @property
+    def client(self):
+        """Groq API 客户端，首次访问时创建"""
+        if self._client is None and self.service_platform == "groq":
+            with self._init_lock:
+                if self._client is None:
+                    from openai import DefaultHttpxClient, OpenAI
+                    self._client = OpenAI(
+                        api_key=self.api_key,
+                        base_url=self.base_url if self.base_url else None,
+                        max_retries=0,  # 由 AdaptiveTimeout 按本次的超时预算重试，避免客户端自身的退避等待
+                        # openai 不支持按请求传 httpx 扩展，由请求钩子挂上 trace 扩展
+                        http_client=DefaultHttpxClient(event_hooks={"request": [self._attach_trace]}),
+                    )
+        return self._client
+
+    def _attach_trace(self, request):
+        """httpx 请求钩子：通过 trace 扩展记录连接、上传、服务端处理和下载耗时"""
+        trace = getattr(self._request_trace, "trace", None)
+        if trace is not None:
+            request.extensions["trace"] = HttpTraceHook(trace)
+
+    @property
+    def symbol(self):
+        """标点和润色处理器，首次访问时创建"""
+        symbol = self._symbol
+        if symbol is None:
+            with self._init_lock:
+                symbol = self._symbol
+                if symbol is None:
+                    from ..llm.symbol import SymbolProcessor
+                    symbol = self._symbol = SymbolProcessor()
+        return symbol
+
+    def warm_up(self):
+        """提前创建客户端并加载繁简转换表，由后台线程在启动后调用"""
+        self.client
+        settings = self.post_processing
+        if settings.add_symbol or settings.optimize_result:
+            self.symbol
+        if settings.converter is not None:
+            settings.converter.load()
+
+    @staticmethod
+    def _convert_traditional_to_simplified(text, settings):
         """将繁体中文转换为简体中文"""
-        if not self.convert_to_simplified or not text:
+        if settings.converter is None or not text:
             return text
-        return self.cc.convert(text)
+        return settings.converter.convert(text)
     
-    @timeout_decorator(10)
-    def _call_whisper_api(self, mode, audio_data, prompt):
-        """调用 Whisper API"""
+    def _call_whisper_api(self, mode, audio_data, prompt, trace=None, retry=True):
+        """调用 Whisper API，超时或连接失败时换新连接重试一次"""
+        from openai import APIConnectionError, APITimeoutError
+
+        self._request_trace.trace = trace
+        try:
+            return self.timeouts.run(
+                lambda timeout: self._create(mode, audio_data, prompt, timeout),
+                audio_data,
+                retryable=APIConnectionError,  # 包括 APITimeoutError
+                timeouts=APITimeoutError,
+                retry=retry,
+            )
+        finally:
+            self._request_trace.trace = None
+
+    def _create(self, mode, audio_data, prompt, timeout):
+        """上传音频并返回识别文本"""
         if mode == "translations":
             response = self.client.audio.translations.create(
                 model="whisper-large-v3",
                 response_format="text",
                 prompt=prompt,
-                file=("audio.wav", audio_data)
+                file=("audio.wav", audio_data),
+                timeout=timeout
             )
         else:  # transcriptions
             response = self.client.audio.transcriptions.create(
                 model="whisper-large-v3-turbo",
                 response_format="text",
                 prompt=prompt,
-                file=("audio.wav", audio_data)
+                file=("audio.wav", audio_data),
+                timeout=timeout
             )
         return str(response).strip()
 
-    def process_audio(self, audio_buffer, mode="transcriptions", prompt=""):
+    def process_audio(self, audio_buffer, mode="transcriptions", prompt="", trace=None, retry=True):
         """调用 Whisper API 处理音频（转录或翻译）
         
         Args:
             audio_path: 音频文件路径
             mode: 'transcriptions' 或 'translations'，决定是转录还是翻译
             prompt: 提示词
+            trace: 可选的 Trace，记录请求和后处理各阶段耗时
+            retry: 超时或连接失败时是否用新连接重试；有其他服务商可以转交时为 False
         
         Returns:
             tuple: (结果文本, 错误信息)
             - 如果成功，错误信息为 None
             - 如果失败，结果文本为 None
         """
+        settings = self.post_processing
         try:
             start_time = time.time()
+            if trace is not None:
+                trace.set(provider=self.PROVIDER, audio_bytes=audio_buffer.getbuffer().nbytes)
 
-            logger.info(f"正在调用 Whisper API... (模式: {mode})")
-            result = self._call_whisper_api(mode, audio_buffer, prompt)
+            hot_logger.info(f"正在调用 Whisper API... (模式: {mode})")
+            result = self._call_whisper_api(mode, audio_buffer, prompt, trace, retry)
 
-            logger.info(f"API 调用成功 ({mode}), 耗时: {time.time() - start_time:.1f}秒")
-            result = self._convert_traditional_to_simplified(result)
-            logger.info(f"识别结果: {result}")
+            hot_logger.info(f"API 调用成功 ({mode}), 耗时: {time.time() - start_time:.1f}秒")
+            with span(trace, "t2s"):
+                result = self._convert_traditional_to_simplified(result, settings)
+            hot_logger.info(f"识别结果: {result}")
             
             # 仅在 groq API 时添加标点符号
-            if self.service_platform == "groq" and self.add_symbol:
-                result = self.symbol.add_symbol(result)
-                logger.info(f"添加标点符号: {result}")
-            if self.optimize_result:
-                result = self.symbol.optimize_result(result)
-                logger.info(f"优化结果: {result}")
+            if self.service_platform == "groq" and settings.add_symbol:
+                with span(trace, "add_symbol"):
+                    result = self.symbol.add_symbol(result)
+                hot_logger.info(f"添加标点符号: {result}")
+            if settings.optimize_result:
+                with span(trace, "optimize"):
+                    result = self.symbol.optimize_result(result)
+                hot_logger.info(f"优化结果: {result}")
 
             return result, None
             
 
-        except TimeoutError:
-            error_msg = f"❌ API 请求超时 ({self.timeout_seconds}秒)"
+        except TimeoutError as e:
+            error_msg = f"❌ API 请求超时 ({e})"
             logger.error(error_msg)
+            if trace is not None:
+                trace.set(error_kind="timeout")
             return None, error_msg
         except Exception as e:
             error_msg = f"❌ {str(e)}"
@@ -0,0 +1,8 @@
+"""控制界面组件模块
+在控制界面中展示主程序通过本地事件通道发布的状态和性能数据，以及语音历史记录
+"""
+
+from .dashboard import DashboardModel, DashboardPanel
+from .history import HistoryPanel
+
+__all__ = ['DashboardModel', 'DashboardPanel', 'HistoryPanel']
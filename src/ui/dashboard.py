@@ -0,0 +1,169 @@
+import time
+from collections import deque
+
+from PyQt5.QtWidgets import (
+    QGroupBox, QHBoxLayout, QHeaderView, QLabel, QTableWidget, QTableWidgetItem, QVBoxLayout
+)
+
+from ..utils.metrics import LatencyHistogram
+
+STATE_NAMES = {
+    "IDLE": "空闲",
+    "RECORDING": "正在录音",
+    "RECORDING_TRANSLATE": "正在录音（翻译）",
+    "PROCESSING": "正在转录",
+    "TRANSLATING": "正在翻译",
+    "ERROR": "错误",
+    "WARNING": "警告",
+}
+
+# 面板中按顺序展示的阶段，其余阶段排在后面
+STAGE_ORDER = [
+    "hold", "stream_open", "capture", "encode", "queue",
+    "connect", "upload", "provider", "download", "t2s", "translate",
+    "add_symbol", "optimize", "inject",
+]
+
+
+def _format_ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.0f}"
+
+
+class DashboardModel:
+    """根据主程序发布的 state / trace 事件维护面板数据（不依赖界面）
+
+    延迟分位数使用最近 window 句语音的滑动窗口，服务商错误率同样只统计窗口内的语音。
+    """
+
+    def __init__(self, window=200, recent=20):
+        self.window = window
+        self.state = None
+        self.pending = 0
+        self.recent = deque(maxlen=recent)  # 最近的追踪记录，最新的在前
+        self.total = LatencyHistogram(window)
+        self.stages = {}  # 阶段名 -> LatencyHistogram
+        self.outcomes = {}  # 服务商 -> deque[是否失败]
+
+    def handle_event(self, event):
+        """处理一个事件，返回是否需要刷新界面"""
+        event_type = event.get("type")
+        if event_type == "state":
+            self.state = event.get("state")
+            self.pending = event.get("pending", 0)
+            return True
+        if event_type == "trace" and isinstance(event.get("trace"), dict):
+            self.add_trace(event["trace"])
+            return True
+        return False
+
+    def add_trace(self, trace):
+        self.recent.appendleft(trace)
+        failed = bool(trace.get("error"))
+        provider = trace.get("provider", "none")
+        self.outcomes.setdefault(provider, deque(maxlen=self.window)).append(failed)
+        if failed:
+            return
+        self.total.observe(trace.get("total_ms", 0) / 1000)
+        for span in trace.get("spans", []):
+            histogram = self.stages.get(span["name"])
+            if histogram is None:
+                histogram = self.stages[span["name"]] = LatencyHistogram(self.window)
+            histogram.observe(span["duration_ms"] / 1000)
+
+    def stage_rows(self):
+        """[(阶段, p50 秒, p95 秒)]，按流水线顺序排列"""
+        order = {name: index for index, name in enumerate(STAGE_ORDER)}
+        names = sorted(self.stages, key=lambda name: (order.get(name, len(order)), name))
+        return [(name, *self.stages[name].percentiles(50, 95)) for name in names]
+
+    def provider_rows(self):
+        """[(服务商, 语音数, 错误率)]"""
+        return [
+            (provider, len(outcomes), sum(outcomes) / len(outcomes))
+            for provider, outcomes in sorted(self.outcomes.items())
+            if outcomes
+        ]
+
+
+class DashboardPanel(QGroupBox):
+    """实时性能面板：当前状态、滚动分位数、服务商错误率和最近语音的阶段耗时"""
+
+    RECENT_COLUMNS = ["时间", "模式", "服务商", "总耗时(ms)", "各阶段耗时(ms)", "结果"]
+
+    def __init__(self, parent=None):
+        super().__init__("实时性能", parent)
+        self.model = DashboardModel()
+
+        layout = QVBoxLayout()
+        summary_layout = QHBoxLayout()
+        self.state_label = QLabel("当前状态: 未连接")
+        self.latency_label = QLabel("总耗时 p50/p95: - / - ms")
+        summary_layout.addWidget(self.state_label)
+        summary_layout.addStretch()
+        summary_layout.addWidget(self.latency_label)
+        layout.addLayout(summary_layout)
+
+        tables_layout = QHBoxLayout()
+        self.stage_table = self._create_table(["阶段", "p50(ms)", "p95(ms)"])
+        self.provider_table = self._create_table(["服务商", "语音数", "错误率"])
+        tables_layout.addWidget(self.stage_table, 3)
+        tables_layout.addWidget(self.provider_table, 2)
+        layout.addLayout(tables_layout)
+
+        self.recent_table = self._create_table(self.RECENT_COLUMNS)
+        self.recent_table.horizontalHeader().setSectionResizeMode(
+            self.RECENT_COLUMNS.index("各阶段耗时(ms)"), QHeaderView.Stretch)
+        layout.addWidget(self.recent_table)
+        self.setLayout(layout)
+
+    @staticmethod
+    def _create_table(columns):
+        table = QTableWidget(0, len(columns))
+        table.setHorizontalHeaderLabels(columns)
+        table.verticalHeader().setVisible(False)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        return table
+
+    @staticmethod
+    def _fill_table(table, rows):
+        table.setRowCount(len(rows))
+        for row_index, row in enumerate(rows):
+            for column, value in enumerate(row):
+                table.setItem(row_index, column, QTableWidgetItem(str(value)))
+
+    def handle_event(self, event):
+        """处理主程序发布的事件"""
+        if not self.model.handle_event(event):
+            return
+        if event.get("type") == "state":
+            self._update_state()
+        else:
+            self._update_latency()
+
+    def _update_state(self):
+        state = STATE_NAMES.get(self.model.state, self.model.state)
+        pending = f"（{self.model.pending} 句处理中）" if self.model.pending else ""
+        self.state_label.setText(f"当前状态: {state}{pending}")
+
+    def _update_latency(self):
+        model = self.model
+        p50, p95 = model.total.percentiles(50, 95)
+        self.latency_label.setText(f"总耗时 p50/p95: {_format_ms(p50)} / {_format_ms(p95)} ms")
+        self._fill_table(self.stage_table, [
+            (name, _format_ms(p50), _format_ms(p95)) for name, p50, p95 in model.stage_rows()
+        ])
+        self._fill_table(self.provider_table, [
+            (provider, count, f"{error_rate:.1%}") for provider, count, error_rate in model.provider_rows()
+        ])
+        self._fill_table(self.recent_table, [
+            (
+                time.strftime("%H:%M:%S", time.localtime(trace.get("time", 0))),
+                trace.get("mode", ""),
+                trace.get("provider", "-"),
+                f"{trace.get('total_ms', 0):.0f}",
+                " · ".join(f"{span['name']} {span['duration_ms']:.0f}" for span in trace.get("spans", [])),
+                trace.get("error") or "成功",
+            )
+            for trace in model.recent
+        ])
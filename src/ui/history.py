@@ -0,0 +1,77 @@
+import sqlite3
+import time
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import (
+    QGroupBox, QHeaderView, QLineEdit, QTableWidget, QTableWidgetItem, QVBoxLayout
+)
+
+from ..history import HistoryStore, default_history_path
+
+MODE_NAMES = {"transcriptions": "转录", "translations": "翻译"}
+
+
+class HistoryPanel(QGroupBox):
+    """历史记录面板：按文本搜索主程序保存的语音历史
+
+    输入停顿后再查询；主程序完成一句语音时（trace 事件）刷新列表，
+    数据库由主程序在后台写入，界面只读取。
+    """
+
+    COLUMNS = ["时间", "模式", "总耗时(ms)", "文本"]
+    SEARCH_DELAY_MS = 200
+    REFRESH_DELAY_MS = 1500  # 主程序批量写入，收到事件后稍等再读取
+    LIMIT = 100
+
+    def __init__(self, path=None, parent=None):
+        super().__init__("历史记录", parent)
+        self.path = path or default_history_path()
+        self.store = None
+
+        layout = QVBoxLayout()
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("搜索识别结果...")
+        self.search_input.textChanged.connect(lambda: self._search_timer.start(self.SEARCH_DELAY_MS))
+        layout.addWidget(self.search_input)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(self.COLUMNS.index("文本"), QHeaderView.Stretch)
+        layout.addWidget(self.table)
+        self.setLayout(layout)
+
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.timeout.connect(self.refresh)
+        self.refresh()
+
+    def handle_event(self, event):
+        """主程序完成一句语音后刷新"""
+        if event.get("type") == "trace":
+            self._search_timer.start(self.REFRESH_DELAY_MS)
+
+    def refresh(self):
+        records = self._query(self.search_input.text())
+        self.table.setRowCount(len(records))
+        for row, record in enumerate(records):
+            total = record["total_ms"]
+            values = [
+                time.strftime("%m-%d %H:%M:%S", time.localtime(record["time"])),
+                MODE_NAMES.get(record["mode"], record["mode"] or "-"),
+                "-" if total is None else f"{total:.0f}",
+                record["text"] if not record["error"] else f"❌ {record['error']}",
+            ]
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(value))
+
+    def _query(self, text):
+        try:
+            if self.store is None:
+                self.store = HistoryStore(self.path)
+            return self.store.search(text, self.LIMIT)
+        except sqlite3.Error:
+            # 数据库尚未创建或正在被写入，下次刷新时再试
+            return []
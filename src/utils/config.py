@@ -0,0 +1,105 @@
+import os
+import threading
+
+from dotenv import dotenv_values, find_dotenv
+
+from .logger import logger
+from .scheduler import get_scheduler
+
+
+class ConfigWatcher:
+    """监控 .env 文件，变化后把新的配置写入环境变量并通知回调
+
+    - 通过共享定时器按间隔检查文件的修改时间和大小，不额外占用线程
+    - 检测到变化后稍等片刻再确认一次，避免读到写了一半的文件
+    - 只更新文件中值发生变化的键；文件中删除的键同时从环境变量中删除，
+      启动时由真实环境变量提供、文件中未改动的值不受影响
+    - 回调 on_change(changed_keys) 在单独的线程中执行，可以安全地创建客户端等耗时操作，
+      同一时间只会有一次重新加载
+    """
+
+    DEFAULT_INTERVAL = 2.0  # 检查间隔（秒）
+    DEBOUNCE = 0.3  # 检测到变化后再次确认的间隔（秒）
+
+    def __init__(self, on_change, path=None, interval=None, scheduler=None):
+        self.on_change = on_change
+        self.path = path or find_dotenv(usecwd=True) or ".env"
+        self.interval = interval or float(os.getenv("CONFIG_WATCH_INTERVAL", self.DEFAULT_INTERVAL))
+        self.scheduler = scheduler or get_scheduler()
+        self._values = self._read_values()
+        self._applied_signature = self._signature()
+        self._seen_signature = self._applied_signature
+        self._timer = None
+        self._reload_thread = None
+        self._stopped = True
+
+    def start(self):
+        self._stopped = False
+        self._schedule(self.interval)
+        logger.info(f"正在监控配置文件: {self.path}")
+        return self
+
+    def stop(self):
+        self._stopped = True
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _schedule(self, delay):
+        if not self._stopped:
+            self._timer = self.scheduler.call_later(delay, self._check)
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read_values(self):
+        if not os.path.exists(self.path):
+            return {}
+        return {key: value for key, value in dotenv_values(self.path).items() if value is not None}
+
+    def _check(self):
+        """在定时器线程中执行，只做 stat，不读取文件内容"""
+        signature = self._signature()
+        if signature == self._applied_signature:
+            self._schedule(self.interval)
+            return
+        if signature != self._seen_signature:
+            # 文件刚发生变化，可能仍在写入，稍后再确认
+            self._seen_signature = signature
+            self._schedule(self.DEBOUNCE)
+            return
+        if self._reload_thread is not None and self._reload_thread.is_alive():
+            self._schedule(self.interval)
+            return
+        self._applied_signature = signature
+        self._reload_thread = threading.Thread(target=self._reload, name="config-reload", daemon=True)
+        self._reload_thread.start()
+        self._schedule(self.interval)
+
+    def _reload(self):
+        try:
+            values = self._read_values()
+        except Exception as e:
+            logger.error(f"读取配置文件失败: {e}")
+            return
+        changed = {
+            key for key in set(values) | set(self._values)
+            if values.get(key) != self._values.get(key)
+        }
+        self._values = values
+        if not changed:
+            return
+        for key in changed:
+            if key in values:
+                os.environ[key] = values[key]
+            else:
+                os.environ.pop(key, None)
+        logger.info(f"配置已更新: {', '.join(sorted(changed))}")
+        try:
+            self.on_change(changed)
+        except Exception as e:
+            logger.error(f"应用新配置失败: {e}", exc_info=True)
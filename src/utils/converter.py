@@ -0,0 +1,174 @@
+import marshal
+import mmap
+import os
+import threading
+import time
+from importlib.util import find_spec
+
+from .logger import logger
+from .metrics import get_registry
+
+# 缓存格式版本，修改序列化结构时递增
+CACHE_VERSION = 1
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "whisper-input", "t2s.bin")
+DICTIONARY_FILES = ("TSPhrases.txt", "TSCharacters.txt")
+
+
+def _find_dictionary_dir():
+    """定位 opencc-python-reimplemented 自带的词典目录"""
+    spec = find_spec("opencc")
+    if spec is None or not spec.origin:
+        return None
+    dictionary_dir = os.path.join(os.path.dirname(spec.origin), "dictionary")
+    return dictionary_dir if os.path.isdir(dictionary_dir) else None
+
+
+def _read_dictionary(path):
+    """读取 OpenCC 文本词典，多个候选时取第一个"""
+    entries = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) < 2 or not parts[0]:
+                continue
+            entries[parts[0]] = parts[1].split(" ")[0]
+    return entries
+
+
+class T2SConverter:
+    """繁体转简体转换器
+
+    首次使用时从 OpenCC 文本词典编译出单字映射表和词组表，并以 marshal
+    格式缓存到磁盘；之后启动直接 mmap 读取缓存，只需几毫秒。转换时按词组
+    最长匹配，未命中的片段整体交给 str.translate，整体为线性时间。
+    """
+
+    def __init__(self, dictionary_dir=None, cache_path=None):
+        self.dictionary_dir = dictionary_dir or _find_dictionary_dir()
+        self.cache_path = cache_path or os.getenv("T2S_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._chars = {}           # 码点 -> 简体字符串，供 str.translate 使用
+        self._phrases = {}         # 繁体词组 -> 简体词组
+        self._phrase_lengths = {}  # 词组首字 -> 以该字开头的最长词组长度
+
+    def _source_signature(self):
+        """词典文件签名，词典升级后自动重建缓存"""
+        signature = []
+        for name in DICTIONARY_FILES:
+            stat = os.stat(os.path.join(self.dictionary_dir, name))
+            signature.append((name, stat.st_size, int(stat.st_mtime)))
+        return tuple(signature)
+
+    def _load_cache(self, signature):
+        """通过 mmap 读取编译好的缓存"""
+        try:
+            with open(self.cache_path, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    version, cached_signature, chars, phrases, phrase_lengths = marshal.loads(mm)
+        except (OSError, ValueError, EOFError, TypeError):
+            return False
+        if version != CACHE_VERSION or cached_signature != signature:
+            return False
+        self._chars, self._phrases, self._phrase_lengths = chars, phrases, phrase_lengths
+        return True
+
+    def _compile(self, signature):
+        """从文本词典编译映射表并写入缓存"""
+        characters = _read_dictionary(os.path.join(self.dictionary_dir, "TSCharacters.txt"))
+        phrases = _read_dictionary(os.path.join(self.dictionary_dir, "TSPhrases.txt"))
+
+        chars = {}
+        for source, target in characters.items():
+            if len(source) == 1:
+                chars[ord(source)] = target
+            else:
+                phrases.setdefault(source, target)
+
+        phrase_lengths = {}
+        for source in phrases:
+            if len(source) > phrase_lengths.get(source[0], 0):
+                phrase_lengths[source[0]] = len(source)
+
+        self._chars, self._phrases, self._phrase_lengths = chars, phrases, phrase_lengths
+
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            temp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                marshal.dump((CACHE_VERSION, signature, chars, phrases, phrase_lengths), f)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"写入繁简转换缓存失败: {e}")
+
+    def load(self):
+        """加载转换表（线程安全，只执行一次）"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            start_time = time.perf_counter()
+            if not self.dictionary_dir:
+                logger.warning("未找到 OpenCC 词典，繁简转换将保持原文")
+            else:
+                signature = self._source_signature()
+                if self._load_cache(signature):
+                    source = "缓存"
+                    get_registry().inc("t2s_cache", result="hit")
+                else:
+                    self._compile(signature)
+                    source = "词典编译"
+                    get_registry().inc("t2s_cache", result="miss")
+                logger.info(f"繁简转换表已加载 ({source}), 耗时: {(time.perf_counter() - start_time) * 1000:.1f}毫秒")
+            self._loaded = True
+
+    def convert(self, text):
+        """将繁体中文转换为简体中文"""
+        if not text:
+            return text
+        self.load()
+
+        phrases = self._phrases
+        phrase_lengths = self._phrase_lengths
+        chars = self._chars
+        parts = []
+        pending_start = 0
+        i = 0
+        n = len(text)
+        while i < n:
+            max_length = phrase_lengths.get(text[i])
+            if max_length:
+                for length in range(min(max_length, n - i), 1, -1):
+                    target = phrases.get(text[i:i + length])
+                    if target is not None:
+                        if pending_start < i:
+                            parts.append(text[pending_start:i].translate(chars))
+                        parts.append(target)
+                        i += length
+                        pending_start = i
+                        break
+                else:
+                    i += 1
+            else:
+                i += 1
+
+        if pending_start == 0:
+            return text.translate(chars)
+        if pending_start < n:
+            parts.append(text[pending_start:].translate(chars))
+        return "".join(parts)
+
+
+_t2s_converter = None
+_t2s_lock = threading.Lock()
+
+
+def get_t2s_converter():
+    """获取进程内共享的繁简转换器"""
+    global _t2s_converter
+    if _t2s_converter is None:
+        with _t2s_lock:
+            if _t2s_converter is None:
+                _t2s_converter = T2SConverter()
+    return _t2s_converter
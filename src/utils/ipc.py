@@ -0,0 +1,65 @@
+import json
+import os
+import socket
+import threading
+import time
+
+DEFAULT_IPC_HOST = "127.0.0.1"
+DEFAULT_IPC_PORT = 28731
+
+
+def ipc_events_enabled():
+    """是否向控制界面发布结构化事件（状态切换、每句语音的追踪记录）"""
+    return os.getenv("IPC_EVENTS", "true").lower() == "true"
+
+
+def get_ipc_address():
+    """本地事件通道地址，主程序和控制界面读取同一组环境变量"""
+    return os.getenv("IPC_HOST", DEFAULT_IPC_HOST), int(os.getenv("IPC_PORT", DEFAULT_IPC_PORT))
+
+
+class EventPublisher:
+    """本地事件发布器
+
+    通过 UDP 向本机端口发送 JSON 事件，发送方不等待、不建立连接，没有订阅者
+    时数据报直接被丢弃，不会阻塞调用线程。
+    """
+
+    def __init__(self, address=None):
+        self.address = address or get_ipc_address()
+        self.sent = 0
+        self.dropped = 0
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+        self._lock = threading.Lock()
+
+    def publish(self, event_type, **fields):
+        """发布一个事件: {"type": event_type, "ts": 时间戳, **fields}"""
+        payload = json.dumps(
+            {"type": event_type, "ts": time.time(), **fields},
+            ensure_ascii=False
+        ).encode("utf-8")
+        with self._lock:
+            try:
+                self._socket.sendto(payload, self.address)
+                self.sent += 1
+            except OSError:
+                # 缓冲区已满或端口不可达，丢弃事件而不是阻塞
+                self.dropped += 1
+
+    def close(self):
+        self._socket.close()
+
+
+_publisher = None
+_publisher_lock = threading.Lock()
+
+
+def get_publisher():
+    """获取进程内共享的事件发布器"""
+    global _publisher
+    if _publisher is None:
+        with _publisher_lock:
+            if _publisher is None:
+                _publisher = EventPublisher()
+    return _publisher
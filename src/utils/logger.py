@@ -1,13 +1,91 @@
+import atexit
 import logging
 import colorlog
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+
+class DroppingQueueHandler(QueueHandler):
+    """非阻塞的队列处理器
+
+    只把日志记录放入队列，格式化和文件写入都在后台线程完成；队列已满时
+    直接丢弃并计数，调用线程永远不会因为日志 I/O 而等待。
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # 同一进程内传递，无需提前格式化
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class ReportingQueueListener(QueueListener):
+    """后台写日志的监听器，定期报告被丢弃的日志数量"""
+
+    def __init__(self, log_queue, queue_handler, *handlers):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.queue_handler = queue_handler
+        self._reported_drops = 0
+
+    def handle(self, record):
+        dropped = self.queue_handler.dropped
+        if dropped > self._reported_drops:
+            super().handle(logging.makeLogRecord({
+                "name": record.name,
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": f"日志队列已满，丢弃了 {dropped - self._reported_drops} 条日志",
+            }))
+            self._reported_drops = dropped
+        super().handle(record)
+
+
+def create_async_handler(*handlers):
+    """按 LOG_ASYNC 配置包装处理器
+
+    异步模式下返回一个只负责入队的处理器，由后台线程把记录交给 handlers；
+    同步模式下直接返回 handlers。
+    """
+    if os.getenv("LOG_ASYNC", "true").lower() != "true":
+        return list(handlers)
+    log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", 10000)))
+    queue_handler = DroppingQueueHandler(log_queue)
+    listener = ReportingQueueListener(log_queue, queue_handler, *handlers)
+    queue_handler.listener = listener
+    listener.start()
+    atexit.register(listener.stop)
+    return [queue_handler]
+
+
+def create_file_handler():
+    """滚动的日志文件处理器"""
+    file_handler = RotatingFileHandler(
+        os.getenv("LOG_FILE", 'logs/app.log'),
+        maxBytes=1024*1024,  # 1MB
+        backupCount=5,
+        encoding='utf-8'
+    )
+    file_handler.setFormatter(logging.Formatter(
+        '%(asctime)s - %(levelname)s - %(message)s'
+    ))
+    return file_handler
+
 
 def setup_logger():
     """配置彩色日志"""
     # 创建logs目录
     os.makedirs('logs', exist_ok=True)
-    
+
     # 控制台处理器
     console_handler = colorlog.StreamHandler()
     console_handler.setFormatter(colorlog.ColoredFormatter(
@@ -23,27 +101,71 @@ def setup_logger():
         secondary_log_colors={},
         style='%'
     ))
-    
-    # 文件处理器
-    file_handler = RotatingFileHandler(
-        'logs/app.log',
-        maxBytes=1024*1024,  # 1MB
-        backupCount=5,
-        encoding='utf-8'
-    )
-    file_handler.setFormatter(logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(message)s'
-    ))
-    
+
+    # 文件处理器。由监督进程启动的主程序先作为备用进程，接管后才打开日志文件
+    # （enable_file_logging），避免备用进程和活动进程同时滚动同一个文件
+    handlers = [console_handler]
+    if not os.getenv("SUPERVISOR_WORKER_ID"):
+        handlers.append(create_file_handler())
+
     logger = colorlog.getLogger(__name__)
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
-    logger.setLevel(logging.INFO)
-    
+    logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
     # 移除可能存在的默认处理器
-    for handler in logger.handlers[:-2]:
+    for handler in logger.handlers[:]:
         logger.removeHandler(handler)
-    
+
+    # 异步模式下调用线程只入队，由后台线程格式化并写入控制台和文件
+    for handler in create_async_handler(*handlers):
+        logger.addHandler(handler)
+
     return logger
 
 logger = setup_logger()
+_file_logging_lock = threading.Lock()
+
+# 热路径日志（录音回调、转录、文本输入等每次语音都会经过的位置），
+# 可通过 HOT_PATH_LOG_LEVEL 单独提高级别来关闭
+hot_logger = logger.getChild("hot")
+
+
+def apply_log_levels():
+    """按 LOG_LEVEL / HOT_PATH_LOG_LEVEL 设置日志级别，配置热更新时再次调用"""
+    logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    hot_logger.setLevel(os.getenv("HOT_PATH_LOG_LEVEL", os.getenv("LOG_LEVEL", "INFO")).upper())
+
+
+apply_log_levels()
+
+
+def enable_file_logging():
+    """开始写日志文件（备用进程接管时调用），已经在写时不做任何事"""
+    with _file_logging_lock:
+        for handler in logger.handlers:
+            listener = getattr(handler, "listener", None)
+            handlers = listener.handlers if listener is not None else (handler,)
+            if any(isinstance(h, RotatingFileHandler) for h in handlers):
+                return
+        file_handler = create_file_handler()
+        for handler in logger.handlers:
+            if isinstance(handler, DroppingQueueHandler):
+                # 后台线程每条记录都重新遍历 handlers，整体替换元组即可生效
+                handler.listener.handlers = handler.listener.handlers + (file_handler,)
+                return
+        logger.addHandler(file_handler)
+
+
+def get_dropped_count():
+    """异步模式下因队列已满被丢弃的日志数量"""
+    for handler in logger.handlers:
+        if isinstance(handler, DroppingQueueHandler):
+            return handler.dropped
+    return 0
+
+
+def get_queue_depth():
+    """异步日志队列中等待写入的记录数"""
+    for handler in logger.handlers:
+        if isinstance(handler, DroppingQueueHandler):
+            return handler.queue.qsize()
+    return 0
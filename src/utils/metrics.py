@@ -0,0 +1,245 @@
+import bisect
+import os
+import threading
+from collections import deque
+
+from .logger import logger
+
+METRIC_PREFIX = "whisper_input_"
+DEFAULT_METRICS_PORT = 28732
+
+# 导出到监控系统的指标说明
+METRIC_HELP = {
+    "utterances": "完成的语音数量",
+    "utterance_seconds": "从按下按键到文本输入完成的总耗时",
+    "stage_seconds": "各阶段耗时",
+    "errors": "转录失败次数，kind=timeout 为请求超时",
+    "upload_bytes": "上传到转录服务的音频字节数",
+    "audio_seconds": "提交转录的录音时长",
+    "http_connections": "转录请求使用的连接，reused 为复用的长连接",
+    "t2s_cache": "繁简转换表加载次数，hit 为命中预编译缓存",
+    "clipboard_writes": "剪贴板写入次数，skipped 为内容未变化而跳过",
+    "audio_overflows": "录音回调报告的输入溢出次数",
+    "pipeline_pending": "已提交但尚未交付的语音数量",
+    "keyboard_event_queue": "键盘事件队列中等待处理的事件数",
+    "log_queue": "异步日志队列中等待写入的记录数",
+    "log_dropped": "因异步日志队列已满被丢弃的日志数量",
+    "api_requests": "本地转录接口的请求数，按状态码区分",
+    "api_active": "本地转录接口正在处理的请求数",
+    "api_queued": "本地转录接口正在上传或排队的请求数",
+    "history_writes": "写入历史记录数据库的语音数量",
+    "history_dropped": "因队列已满或写入失败未能保存的历史记录数量",
+    "request_retries": "转录请求超时或连接失败后使用新连接重试的次数",
+    "route_decisions": "自动选择转录服务的次数，按服务商和原因（best/probe/default/override/failover）区分",
+    "archive_writes": "保存的录音数量",
+    "archive_dropped": "未能保存的录音数量，reason=queue_full 为写入线程跟不上而丢弃",
+    "archive_evicted": "因超过总大小上限被删除的录音数量",
+    "archive_queue": "等待保存的录音和元数据数量",
+    "archive_bytes": "已保存录音和元数据的总字节数",
+    "process_rss_bytes": "进程常驻内存（字节）",
+    "process_threads": "进程中的线程数",
+    "process_open_fds": "进程打开的文件描述符数",
+}
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class LatencyHistogram:
+    """延迟统计
+
+    保留最近 window 个样本用于计算分位数，同时维护固定分桶的累计计数，
+    供 Prometheus/OpenMetrics 直方图导出。
+    """
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, window=1000):
+        self.count = 0
+        self.total = 0.0
+        self._samples = deque(maxlen=window)
+        self._bucket_counts = [0] * len(self.BUCKETS)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.BUCKETS, seconds)
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self._samples.append(seconds)
+            if index < len(self._bucket_counts):
+                self._bucket_counts[index] += 1
+
+    def percentiles(self, *percents):
+        """计算窗口内的分位数（秒），没有样本时返回 None"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return [None] * len(percents)
+        last = len(samples) - 1
+        return [samples[min(last, int(round(percent / 100 * last)))] for percent in percents]
+
+    def summary(self):
+        p50, p95, p99 = self.percentiles(50, 95, 99)
+        return {"count": self.count, "p50": p50, "p95": p95, "p99": p99}
+
+    def buckets(self):
+        """累计分桶计数 [(上界, 次数)]，最后一项为 +Inf，以及 (总次数, 总耗时)"""
+        with self._lock:
+            counts = list(self._bucket_counts)
+            count, total = self.count, self.total
+        cumulative = []
+        running = 0
+        for bound, bucket_count in zip(self.BUCKETS, counts):
+            running += bucket_count
+            cumulative.append((bound, running))
+        cumulative.append((float("inf"), count))
+        return cumulative, count, total
+
+
+class HistogramRegistry:
+    """进程内的指标注册表
+
+    - 直方图：按名称和标签区分，如 stage_seconds{stage="upload"}
+    - 计数器：只增不减的累计值
+    - 回调指标：抓取时才调用回调读取当前值（如队列长度），平时没有任何开销
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._histograms = {}  # (名称, 标签) -> LatencyHistogram
+        self._counters = {}  # (名称, 标签) -> 数值
+        self._callbacks = {}  # 名称 -> (类型, 回调)
+        self._lock = threading.Lock()
+
+    def histogram(self, name, **labels):
+        key = (name, _label_key(labels))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, LatencyHistogram(self.window))
+        return histogram
+
+    def observe(self, name, seconds, **labels):
+        self.histogram(name, **labels).observe(seconds)
+
+    def inc(self, name, amount=1, **labels):
+        """计数器加 amount"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def counter_value(self, name, **labels):
+        with self._lock:
+            return self._counters.get((name, _label_key(labels)), 0)
+
+    def gauge(self, name, callback):
+        """注册抓取时读取的瞬时值，如队列长度"""
+        with self._lock:
+            self._callbacks[name] = ("gauge", callback)
+
+    def counter_callback(self, name, callback):
+        """注册抓取时读取的累计值，适合已有计数的组件"""
+        with self._lock:
+            self._callbacks[name] = ("counter", callback)
+
+    def snapshot(self):
+        """所有直方图的 p50/p95/p99 摘要"""
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {
+            name + _format_labels(labels): histogram.summary()
+            for (name, labels), histogram in sorted(histograms.items())
+        }
+
+    def render(self, openmetrics=True):
+        """按 OpenMetrics（或 Prometheus 0.0.4）文本格式导出所有指标"""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            callbacks = sorted(self._callbacks.items())
+
+        families = {}  # 名称 -> (类型, [行])
+        for (name, labels), value in counters:
+            families.setdefault(name, ("counter", []))[1].append((labels, value))
+        for name, (kind, callback) in callbacks:
+            try:
+                value = callback()
+            except Exception as e:
+                logger.warning(f"读取指标 {name} 失败: {e}")
+                continue
+            families[name] = (kind, [((), value)])
+
+        lines = []
+        for name, (kind, samples) in sorted(families.items()):
+            full_name = METRIC_PREFIX + name
+            sample_name = f"{full_name}_total" if kind == "counter" else full_name
+            family_name = full_name if openmetrics or kind != "counter" else sample_name
+            self._render_header(lines, name, family_name, kind)
+            for labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+
+        last_name = None
+        for (name, labels), histogram in histograms:
+            full_name = METRIC_PREFIX + name
+            if name != last_name:
+                self._render_header(lines, name, full_name, "histogram")
+                last_name = name
+            buckets, count, total = histogram.buckets()
+            for bound, bucket_count in buckets:
+                lines.append(
+                    f"{full_name}_bucket{_format_labels(labels, [('le', _format_value(bound))])} {bucket_count}")
+            lines.append(f"{full_name}_count{_format_labels(labels)} {count}")
+            lines.append(f"{full_name}_sum{_format_labels(labels)} {_format_value(total)}")
+
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_header(lines, name, family_name, kind):
+        help_text = METRIC_HELP.get(name)
+        if help_text:
+            lines.append(f"# HELP {family_name} {help_text}")
+        lines.append(f"# TYPE {family_name} {kind}")
+
+
+def start_metrics_server(registry=None):
+    """METRICS_ENABLED=true 时启动指标接口，返回 MetricsServer，否则返回 None"""
+    if os.getenv("METRICS_ENABLED", "false").lower() != "true":
+        return None
+    # 未开启时不导入 http.server，启动时少加载 http.client、email 等模块
+    from .metrics_server import MetricsServer
+    return MetricsServer(registry).start()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """获取进程内共享的指标注册表"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = HistogramRegistry()
+    return _registry
@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .logger import logger
+from .metrics import DEFAULT_METRICS_PORT, get_registry
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """只响应 GET /metrics"""
+
+    OPENMETRICS_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+    PROMETHEUS_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+        body = self.server.registry.render(openmetrics=openmetrics).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", self.OPENMETRICS_TYPE if openmetrics else self.PROMETHEUS_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 抓取请求很频繁，不写入应用日志
+        pass
+
+
+class MetricsServer:
+    """在后台线程中提供本地 HTTP 指标接口，只有被抓取时才会生成内容"""
+
+    BIND_TIMEOUT = 10.0  # 重启时旧进程可能还没有释放端口
+
+    def __init__(self, registry=None, host=None, port=None):
+        self.registry = registry or get_registry()
+        self.host = host or os.getenv("METRICS_HOST", "127.0.0.1")
+        self.port = int(port if port is not None else os.getenv("METRICS_PORT", DEFAULT_METRICS_PORT))
+        self._server = None
+        self._thread = None
+        self._stopped = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        """在后台线程中绑定端口并开始服务，不阻塞调用方"""
+        self._thread = threading.Thread(target=self._serve, name="metrics-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def _serve(self):
+        """绑定端口后开始服务，端口被占用时在 BIND_TIMEOUT 内重试"""
+        deadline = time.monotonic() + self.BIND_TIMEOUT
+        while True:
+            try:
+                server = ThreadingHTTPServer((self.host, self.port), MetricsRequestHandler)
+                break
+            except OSError as e:
+                if self._stopped or time.monotonic() > deadline:
+                    logger.error(f"指标接口启动失败: {e}")
+                    return
+                time.sleep(0.2)
+        server.daemon_threads = True
+        server.registry = self.registry
+        with self._lock:
+            if self._stopped:
+                server.server_close()
+                return
+            self.port = server.server_address[1]
+            self._server = server
+        logger.info(f"指标接口已启动: http://{self.host}:{self.port}/metrics")
+        server.serve_forever()
+
+    def stop(self):
+        """停止服务并释放端口，重启时新进程可以立即接管"""
+        with self._lock:
+            self._stopped = True
+            server, self._server = self._server, None
+        if server is not None:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,237 @@
+import contextlib
+import glob
+import json
+import os
+import sys
+import threading
+import time
+
+from .logger import logger
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+class UtteranceProfile:
+    """一句语音的采样数据，按线程分别记录"""
+
+    def __init__(self, trace):
+        self.trace = trace
+        self.created = time.monotonic()
+        self.attached = 0  # 正在处理这句语音的线程数
+        self.data = None  # 追踪完成后的记录
+        self.threads = {}  # 线程名 -> {"samples": [...], "weights": [...], "cpu": 秒}
+
+
+class UtteranceProfiler:
+    """按语音采样的性能分析
+
+    处理一句语音的线程（键盘线程编码、工作线程转录和后处理、分发线程输入文本）在开始时
+    attach、结束时 detach；采样线程只在有语音处理时运行，按固定间隔通过 sys._current_frames()
+    记录这些线程的调用栈，同时统计每个线程在这段时间内实际消耗的 CPU 时间。
+    语音完成后总耗时超过阈值才写入 speedscope 格式的文件，否则直接丢弃。
+
+    调用栈中停在 socket 读取、锁等待等位置的样本表示在等待，其余为 Python 代码占用的 CPU；
+    文件中每个线程的名称附带该线程的 CPU 时间，可以直接与墙钟时间对比。
+    """
+
+    DEFAULT_INTERVAL_MS = 5
+    DEFAULT_THRESHOLD_MS = 1500
+    DEFAULT_KEEP = 50
+    MAX_DEPTH = 128
+    STALE_SECONDS = 120  # 超过这个时间仍未完成的语音（例如录音太短被丢弃）直接清理
+
+    def __init__(self, directory=None, threshold_ms=None, interval_ms=None, keep=None):
+        self.directory = directory or os.getenv("PROFILE_DIR", "logs/profiles")
+        self.threshold_ms = float(threshold_ms if threshold_ms is not None
+                                  else os.getenv("PROFILE_THRESHOLD_MS", self.DEFAULT_THRESHOLD_MS))
+        self.interval = float(interval_ms or os.getenv("PROFILE_INTERVAL_MS", self.DEFAULT_INTERVAL_MS)) / 1000
+        self.keep = int(keep if keep is not None else os.getenv("PROFILE_KEEP", self.DEFAULT_KEEP))
+        os.makedirs(self.directory, exist_ok=True)
+        self._profiles = {}  # trace_id -> UtteranceProfile
+        self._threads = {}  # 线程 id -> (UtteranceProfile, 线程名, attach 时的 thread_time)
+        self._completed = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    # ---- 处理线程调用 ----
+
+    def attach(self, trace):
+        """当前线程开始处理这句语音"""
+        with self._lock:
+            profile = self._profiles.get(trace.trace_id)
+            if profile is None:
+                profile = self._profiles[trace.trace_id] = UtteranceProfile(trace)
+            profile.attached += 1
+            thread = threading.current_thread()
+            self._threads[thread.ident] = (profile, thread.name, time.thread_time())
+        self._wake.set()
+
+    def detach(self, trace):
+        """当前线程处理完这句语音"""
+        cpu_end = time.thread_time()
+        with self._lock:
+            entry = self._threads.pop(threading.get_ident(), None)
+            if entry is None:
+                return
+            profile, name, cpu_start = entry
+            thread = profile.threads.setdefault(name, {"samples": [], "weights": [], "cpu": 0.0})
+            thread["cpu"] += cpu_end - cpu_start
+            profile.attached -= 1
+            self._maybe_complete(profile)
+
+    def on_trace(self, data):
+        """追踪完成的回调（TraceRecorder.listeners）"""
+        with self._lock:
+            profile = self._profiles.get(data["trace_id"])
+            if profile is None:
+                return
+            profile.data = data
+            self._maybe_complete(profile)
+
+    def _maybe_complete(self, profile):
+        """所有线程都已离开且追踪已完成时，决定保存还是丢弃（调用方持有锁）"""
+        if profile.attached or profile.data is None:
+            return
+        del self._profiles[profile.trace.trace_id]
+        if profile.data["total_ms"] >= self.threshold_ms:
+            self._completed.append(profile)
+            self._wake.set()
+
+    # ---- 采样线程 ----
+
+    def _run(self):
+        last = time.monotonic()
+        while True:
+            with self._lock:
+                threads = dict(self._threads)
+                completed, self._completed = self._completed, []
+            for profile in completed:
+                self._write(profile)
+            if not threads:
+                self._purge_stale()
+                self._wake.wait()
+                self._wake.clear()
+                last = time.monotonic()
+                continue
+
+            now = time.monotonic()
+            weight = (now - last) * 1000
+            last = now
+            frames = sys._current_frames()
+            for thread_id, (profile, name, _) in threads.items():
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = self._stack(frame)
+                with self._lock:
+                    thread = profile.threads.setdefault(name, {"samples": [], "weights": [], "cpu": 0.0})
+                    thread["samples"].append(stack)
+                    thread["weights"].append(weight)
+            del frames
+            time.sleep(self.interval)
+
+    def _stack(self, frame):
+        """调用栈（从外到内）的代码对象列表"""
+        stack = []
+        while frame is not None and len(stack) < self.MAX_DEPTH:
+            stack.append(frame.f_code)
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def _purge_stale(self):
+        deadline = time.monotonic() - self.STALE_SECONDS
+        with self._lock:
+            for trace_id in [key for key, p in self._profiles.items() if p.created < deadline and not p.attached]:
+                del self._profiles[trace_id]
+
+    # ---- 输出 ----
+
+    def _write(self, profile):
+        data = profile.data
+        frames, frame_index = [], {}
+        profiles = []
+        for name, thread in profile.threads.items():
+            if not thread["samples"]:
+                continue
+            samples = []
+            for stack in thread["samples"]:
+                indexes = []
+                for code in stack:
+                    index = frame_index.get(code)
+                    if index is None:
+                        index = frame_index[code] = len(frames)
+                        frames.append({"name": code.co_name, "file": code.co_filename, "line": code.co_firstlineno})
+                    indexes.append(index)
+                samples.append(indexes)
+            total = sum(thread["weights"])
+            profiles.append({
+                "type": "sampled",
+                "name": f"{name} (CPU {thread['cpu'] * 1000:.0f} ms / 采样 {total:.0f} ms)",
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": total,
+                "samples": samples,
+                "weights": [round(weight, 3) for weight in thread["weights"]],
+            })
+        document = {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": f"{data['trace_id']} {data['mode']} {data['total_ms']:.0f}ms",
+            "exporter": "whisper-input",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+        timestamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(data["time"]))
+        path = os.path.join(
+            self.directory, f"{timestamp}-{data['trace_id']}-{data['total_ms']:.0f}ms.speedscope.json")
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(document, f, ensure_ascii=False)
+        except OSError as e:
+            logger.error(f"保存性能分析失败: {e}")
+            return
+        cpu_ms = sum(thread["cpu"] for thread in profile.threads.values()) * 1000
+        logger.info(f"语音耗时 {data['total_ms']:.0f}ms（CPU {cpu_ms:.0f}ms），已保存性能分析: {path}")
+        self._apply_retention()
+
+    def _apply_retention(self):
+        """只保留最新的 keep 个文件"""
+        files = sorted(glob.glob(os.path.join(self.directory, "*.speedscope.json")), key=os.path.getmtime)
+        for path in files[:max(0, len(files) - self.keep)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+@contextlib.contextmanager
+def profile_thread(trace):
+    """在 with 代码块内把当前线程的调用栈计入这句语音的性能分析（未启用时不做任何事）"""
+    profiler = get_profiler()
+    if profiler is None or trace is None:
+        yield
+        return
+    profiler.attach(trace)
+    try:
+        yield
+    finally:
+        profiler.detach(trace)
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler():
+    """获取进程内共享的性能分析器，PROFILE_ENABLED 未开启时返回 None"""
+    global _profiler
+    if os.getenv("PROFILE_ENABLED", "false").lower() != "true":
+        return None
+    if _profiler is None:
+        with _profiler_lock:
+            if _profiler is None:
+                _profiler = UtteranceProfiler()
+    return _profiler
@@ -0,0 +1,64 @@
+import os
+import sys
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes():
+    """当前进程的常驻内存（字节），无法获取时返回 None
+
+    Linux 读取 /proc/self/statm；其他系统安装了 psutil 时使用 psutil，
+    否则退回 getrusage 的峰值常驻内存（只增不减，只能发现增长，看不到回落）。
+    """
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        pass
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # macOS 为字节，Linux 为 KB
+
+
+def open_fds():
+    """当前进程打开的文件描述符数量，无法获取时返回 None"""
+    for directory in ("/proc/self/fd", "/dev/fd"):
+        try:
+            return len(os.listdir(directory)) - 1  # 不计 listdir 自身打开的目录
+        except OSError:
+            continue
+    if psutil is not None and hasattr(psutil.Process, "num_fds"):
+        return psutil.Process().num_fds()
+    return None
+
+
+def process_resources():
+    """进程资源占用快照，供指标接口和长时间运行测试使用"""
+    return {
+        "rss_bytes": rss_bytes(),
+        "threads": threading.active_count(),
+        "open_fds": open_fds(),
+    }
+
+
+def register_resource_gauges(registry):
+    """在指标注册表中登记常驻内存、线程数和文件描述符数"""
+    if rss_bytes() is not None:
+        registry.gauge("process_rss_bytes", rss_bytes)
+    registry.gauge("process_threads", threading.active_count)
+    if open_fds() is not None:
+        registry.gauge("process_open_fds", open_fds)
@@ -0,0 +1,163 @@
+import heapq
+import itertools
+import threading
+import time
+
+from .logger import logger
+
+
+class Timer:
+    """定时任务句柄"""
+
+    __slots__ = ("deadline", "callback", "args", "cancelled")
+
+    def __init__(self, deadline, callback, args):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        """取消任务，已取消的任务到期时直接丢弃"""
+        self.cancelled = True
+
+
+class TimerScheduler:
+    """单线程定时器
+
+    所有定时任务放在一个最小堆中，调度线程只在最近的截止时间或有新任务
+    插入时被唤醒，空闲时不做任何轮询。回调在调度线程中执行，应尽快返回，
+    耗时操作请交给其他线程（例如放入事件队列）。
+    """
+
+    def __init__(self, clock=time.monotonic, name="timer-scheduler"):
+        self.clock = clock
+        self.name = name
+        self.wakeups = 0  # 调度线程被唤醒的次数，用于衡量空闲开销
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        """启动调度线程"""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """停止调度线程，未到期的任务不再执行"""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def call_at(self, deadline, callback, *args):
+        """在指定时刻（clock 时间）执行回调"""
+        timer = Timer(deadline, callback, args)
+        with self._condition:
+            heapq.heappush(self._heap, (deadline, next(self._counter), timer))
+            # 只有新任务成为最早到期的任务时才需要唤醒调度线程
+            if self._heap[0][2] is timer:
+                self._condition.notify()
+        if not self._running:
+            self.start()
+        return timer
+
+    def call_later(self, delay, callback, *args):
+        """延迟指定秒数后执行回调"""
+        return self.call_at(self.clock() + delay, callback, *args)
+
+    def _pop_due(self):
+        """取出所有已到期的任务，返回 (到期任务, 下次等待秒数)"""
+        due = []
+        now = self.clock()
+        while self._heap:
+            deadline, _, timer = self._heap[0]
+            if timer.cancelled:
+                heapq.heappop(self._heap)
+            elif deadline <= now:
+                heapq.heappop(self._heap)
+                due.append(timer)
+            else:
+                return due, deadline - now
+        return due, None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._running:
+                    return
+                due, timeout = self._pop_due()
+                if not due:
+                    self._condition.wait(timeout)
+                    self.wakeups += 1
+                    continue
+
+            for timer in due:
+                try:
+                    timer.callback(*timer.args)
+                except Exception as e:
+                    logger.error(f"定时任务执行失败: {e}", exc_info=True)
+
+
+class ManualScheduler(TimerScheduler):
+    """手动推进时间的定时器，不启动线程
+
+    回放测试和基准测试通过 advance / advance_to 控制时间，到期任务在调用线程中
+    同步执行，结果可重复。
+    """
+
+    def __init__(self, start_time=0.0):
+        self.now = start_time
+        super().__init__(clock=lambda: self.now, name="manual-scheduler")
+        self._running = True  # 不需要后台线程
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def next_deadline(self):
+        """最早的未取消任务的到期时刻，没有任务时返回 None"""
+        with self._condition:
+            while self._heap and self._heap[0][2].cancelled:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def advance_to(self, deadline):
+        """推进到指定时刻，依次执行期间到期的任务"""
+        while True:
+            with self._condition:
+                if not self._heap or self._heap[0][0] > deadline:
+                    break
+                self.now = max(self.now, self._heap[0][0])
+                due, _ = self._pop_due()
+            for timer in due:
+                timer.callback(*timer.args)
+        self.now = max(self.now, deadline)
+
+    def advance(self, seconds):
+        """推进指定秒数"""
+        self.advance_to(self.now + seconds)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """获取进程内共享的定时器"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = TimerScheduler()
+    return _scheduler
@@ -0,0 +1,399 @@
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from .logger import logger
+
+# 监督进程通过环境变量把控制通道地址传给主程序进程
+ADDRESS_ENV = "SUPERVISOR_ADDRESS"
+AUTHKEY_ENV = "SUPERVISOR_AUTHKEY"
+WORKER_ID_ENV = "SUPERVISOR_WORKER_ID"
+
+
+class WorkerProcess:
+    """受监督的主程序进程"""
+
+    def __init__(self, worker_id, process):
+        self.worker_id = worker_id
+        self.process = process
+        self.conn = None
+        self.ready = False  # 已完成导入和预热，可以立即接管按键
+        self.active = False  # 正在监听按键
+        self.draining = False  # 正在等待处理中的语音完成后退出
+        self.started_at = time.monotonic()
+        self.activated_at = None
+        self.drain_started = None
+        self.ping_sent = None
+        self.last_pong = None
+        self.health = {}
+        self._send_lock = threading.Lock()
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def send(self, command, **fields):
+        """发送控制命令，通道不可用时返回 False"""
+        if self.conn is None:
+            return False
+        try:
+            with self._send_lock:
+                self.conn.send({"cmd": command, **fields})
+            return True
+        except (OSError, EOFError, ValueError):
+            return False
+
+    def terminate(self, timeout=3.0):
+        """结束进程，超时后强制结束"""
+        if not self.alive():
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class Supervisor:
+    """主程序监督器
+
+    - 除活动进程外始终保持一个已完成导入和预热的备用进程，崩溃或重启时
+      直接激活备用进程，下一次按键只需等待键盘监听启动
+    - 通过本地控制通道（multiprocessing.connection，带随机认证密钥）定期检查活动进程，
+      超时未响应视为卡死并结束
+    - 进程异常退出后按指数退避重新创建，长时间稳定运行后重置退避
+    - 停止或重启时先让旧进程停止接收新录音，等处理中的语音输入完成后再退出
+
+    事件通过 on_event(event, **fields) 通知调用方，在监督线程中调用。
+    """
+
+    HEALTH_INTERVAL = 1.0  # 健康检查间隔（秒）
+    HEALTH_TIMEOUT = 3.0  # 超过该时间未响应视为卡死
+    STARTUP_TIMEOUT = 60.0  # 进程启动和预热的最长时间
+    DRAIN_TIMEOUT = 10.0  # 等待处理中的语音完成的最长时间
+    MAX_BACKOFF = 30.0  # 重新创建进程的最长等待时间
+    STABLE_TIME = 60.0  # 运行超过该时间后重置退避
+
+    def __init__(self, command=None, on_event=None, standby=True, cwd=None):
+        self.command = command or [sys.executable, "main.py"]
+        self.on_event = on_event or (lambda event, **fields: None)
+        self.standby_enabled = standby
+        self.cwd = cwd
+        self._authkey = secrets.token_bytes(32)
+        self._listener = None
+        self._workers = {}  # 进程编号 -> WorkerProcess
+        self._next_id = 0
+        self._lock = threading.RLock()
+        self._running = False
+        self._crashes = 0
+        self._respawn_at = 0.0
+        self._wake = threading.Event()
+
+    # ---- 对外接口 ----
+
+    def start(self):
+        """启动监督线程和第一个主程序进程"""
+        self._listener = Listener(("127.0.0.1", 0), authkey=self._authkey)
+        self._running = True
+        threading.Thread(target=self._accept_loop, name="supervisor-accept", daemon=True).start()
+        threading.Thread(target=self._monitor_loop, name="supervisor-monitor", daemon=True).start()
+        with self._lock:
+            self._ensure_workers()
+        return self
+
+    def restart(self):
+        """切换到备用进程，旧进程处理完当前语音后退出"""
+        with self._lock:
+            old = self._active()
+            standby = self._ready_standby()
+            if standby is not None:
+                self._activate(standby)
+            if old is not None:
+                self._drain(old)
+            self._ensure_workers()
+
+    def stop(self, timeout=None):
+        """停止所有进程（活动进程会先处理完当前语音），阻塞直到全部退出"""
+        timeout = self.DRAIN_TIMEOUT if timeout is None else timeout
+        with self._lock:
+            self._running = False
+            workers = list(self._workers.values())
+            for worker in workers:
+                if worker.active:
+                    self._drain(worker)
+                else:
+                    worker.send("drain")
+        deadline = time.monotonic() + timeout
+        for worker in workers:
+            try:
+                worker.process.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                logger.warning(f"主程序进程 {worker.pid} 未在 {timeout} 秒内退出，强制结束")
+                worker.terminate()
+        with self._lock:
+            self._workers.clear()
+        self._wake.set()
+        self._close_listener()
+        self.on_event("stopped")
+
+    def status(self):
+        """各进程的状态"""
+        with self._lock:
+            return [
+                {
+                    "worker_id": worker.worker_id,
+                    "pid": worker.pid,
+                    "ready": worker.ready,
+                    "active": worker.active,
+                    "draining": worker.draining,
+                    **worker.health,
+                }
+                for worker in self._workers.values()
+            ]
+
+    # ---- 进程管理（调用方持有 self._lock） ----
+
+    def _active(self):
+        return next((w for w in self._workers.values() if w.active), None)
+
+    def _ready_standby(self):
+        return next(
+            (w for w in self._workers.values() if w.ready and not w.active and not w.draining and w.alive()),
+            None
+        )
+
+    def _spawn(self):
+        worker_id = self._next_id
+        self._next_id += 1
+        host, port = self._listener.address
+        env = dict(os.environ)
+        env[ADDRESS_ENV] = f"{host}:{port}"
+        env[AUTHKEY_ENV] = self._authkey.hex()
+        env[WORKER_ID_ENV] = str(worker_id)
+        process = subprocess.Popen(self.command, env=env, cwd=self.cwd)
+        worker = WorkerProcess(worker_id, process)
+        self._workers[worker_id] = worker
+        logger.info(f"已启动主程序进程 {process.pid}（编号 {worker_id}）")
+        return worker
+
+    def _ensure_workers(self):
+        """补足一个活动进程和一个备用进程，异常退出后按退避时间等待"""
+        if not self._running or time.monotonic() < self._respawn_at:
+            return
+        serving = [w for w in self._workers.values() if not w.draining]
+        desired = 2 if self.standby_enabled else 1
+        for _ in range(desired - len(serving)):
+            self._spawn()
+
+    def _activate(self, worker):
+        if worker.send("activate"):
+            worker.active = True
+            worker.activated_at = time.monotonic()
+            worker.ping_sent = None
+            logger.info(f"主程序进程 {worker.pid} 已接管按键")
+            self.on_event("activated", pid=worker.pid)
+
+    def _drain(self, worker):
+        worker.active = False
+        worker.draining = True
+        worker.drain_started = time.monotonic()
+        if not worker.send("drain"):
+            worker.terminate()
+
+    def _on_ready(self, worker):
+        worker.ready = True
+        if self._running and self._active() is None and not worker.draining:
+            self._activate(worker)
+        else:
+            self.on_event("standby", pid=worker.pid)
+
+    def _on_exit(self, worker):
+        """进程退出：主动停止的直接移除，异常退出则切换到备用进程并安排重建"""
+        del self._workers[worker.worker_id]
+        code = worker.process.returncode
+        if worker.draining or not self._running:
+            logger.info(f"主程序进程 {worker.pid} 已退出")
+            return
+
+        now = time.monotonic()
+        uptime = now - (worker.activated_at or worker.started_at)
+        self._crashes = 1 if uptime > self.STABLE_TIME else self._crashes + 1
+        backoff = min(self.MAX_BACKOFF, 2 ** (self._crashes - 1))
+        self._respawn_at = now + backoff
+        logger.error(f"主程序进程 {worker.pid} 异常退出 (退出码 {code})，{backoff:.0f} 秒后重新创建")
+        self.on_event("crashed", pid=worker.pid, code=code, backoff=backoff)
+
+        if worker.active:
+            standby = self._ready_standby()
+            if standby is not None:
+                self._activate(standby)
+
+    # ---- 监督线程 ----
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                conn = self._listener.accept()
+            except AuthenticationError:
+                continue
+            except OSError:
+                break
+            if not self._running:
+                conn.close()
+                break
+            threading.Thread(target=self._read_loop, args=(conn,), name="supervisor-reader", daemon=True).start()
+
+    def _read_loop(self, conn):
+        """读取一个主程序进程发来的消息"""
+        worker = None
+        try:
+            hello = conn.recv()
+            with self._lock:
+                worker = self._workers.get(hello.get("worker_id"))
+                if worker is None:
+                    conn.close()
+                    return
+                worker.conn = conn
+            while True:
+                message = conn.recv()
+                kind = message.get("type")
+                with self._lock:
+                    if kind == "ready":
+                        self._on_ready(worker)
+                    elif kind == "pong":
+                        worker.last_pong = time.monotonic()
+                        worker.health = {k: v for k, v in message.items() if k != "type"}
+        except (EOFError, OSError):
+            pass
+        # 通道断开，等进程退出后立即检查，不必等到下一次健康检查
+        if worker is not None:
+            try:
+                worker.process.wait(self.HEALTH_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                pass
+        self._wake.set()
+
+    def _monitor_loop(self):
+        while self._running:
+            self._wake.wait(self.HEALTH_INTERVAL)
+            self._wake.clear()
+            with self._lock:
+                if not self._running:
+                    break
+                self._check_workers()
+                self._ensure_workers()
+
+    def _check_workers(self):
+        now = time.monotonic()
+        for worker in list(self._workers.values()):
+            if not worker.alive():
+                self._on_exit(worker)
+            elif worker.active:
+                if (worker.ping_sent is not None and
+                        (worker.last_pong is None or worker.last_pong < worker.ping_sent) and
+                        now - worker.ping_sent > self.HEALTH_TIMEOUT):
+                    logger.error(f"主程序进程 {worker.pid} 超过 {self.HEALTH_TIMEOUT} 秒未响应，强制结束")
+                    worker.process.kill()
+                elif worker.ping_sent is None or worker.last_pong is None or worker.last_pong >= worker.ping_sent:
+                    worker.ping_sent = now
+                    worker.send("ping")
+            elif worker.draining:
+                if now - worker.drain_started > self.DRAIN_TIMEOUT + self.HEALTH_TIMEOUT:
+                    logger.warning(f"主程序进程 {worker.pid} 未在 {self.DRAIN_TIMEOUT} 秒内处理完，强制结束")
+                    worker.process.kill()
+            elif not worker.ready and now - worker.started_at > self.STARTUP_TIMEOUT:
+                logger.error(f"主程序进程 {worker.pid} 启动超时，强制结束")
+                worker.process.kill()
+
+    def _close_listener(self):
+        if self._listener is None:
+            return
+        # accept() 阻塞时关闭监听不一定能唤醒，先建立一次连接
+        try:
+            Client(self._listener.address, authkey=self._authkey).close()
+        except OSError:
+            pass
+        self._listener.close()
+        self._listener = None
+
+
+class WorkerChannel:
+    """主程序进程一侧的控制通道
+
+    以备用进程启动：完成导入和预热后报告 ready，收到 activate 后才开始监听按键；
+    收到 drain 或监督进程退出时，停止接收新录音并在处理完当前语音后退出。
+    """
+
+    def __init__(self, conn, worker_id):
+        self.conn = conn
+        self.worker_id = worker_id
+        self.assistant = None
+        self._activated = threading.Event()
+        self._closed = False
+        self._draining = False
+        self._send_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """由监督进程启动时连接控制通道，否则返回 None"""
+        address = os.getenv(ADDRESS_ENV)
+        if not address:
+            return None
+        host, port = address.rsplit(":", 1)
+        conn = Client((host, int(port)), authkey=bytes.fromhex(os.environ[AUTHKEY_ENV]))
+        channel = cls(conn, int(os.environ[WORKER_ID_ENV]))
+        channel.send("hello", worker_id=channel.worker_id, pid=os.getpid())
+        return channel
+
+    def send(self, kind, **fields):
+        try:
+            with self._send_lock:
+                self.conn.send({"type": kind, **fields})
+        except (OSError, EOFError, ValueError):
+            pass
+
+    def serve(self, assistant):
+        """预热后等待激活，激活后运行到被停止为止"""
+        self.assistant = assistant
+        threading.Thread(target=self._read_loop, name="supervisor-channel", daemon=True).start()
+        assistant.warm_up()
+        self.send("ready")
+        logger.info("备用进程已就绪，等待接管")
+        self._activated.wait()
+        if self._closed:
+            return
+        assistant.run()
+
+    def _read_loop(self):
+        while True:
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            command = message.get("cmd")
+            if command == "ping":
+                self.send("pong", **self.assistant.health())
+            elif command == "activate":
+                self._activated.set()
+            elif command == "drain":
+                self._drain()
+        # 监督进程已退出
+        self._drain()
+
+    def _drain(self):
+        if self._draining:
+            return
+        self._draining = True
+        if not self._activated.is_set():
+            self._closed = True
+            self._activated.set()
+            return
+        threading.Thread(target=self.assistant.drain, name="drain", daemon=True).start()
@@ -0,0 +1,125 @@
+import os
+import threading
+
+
+class LogTailer:
+    """在后台线程中增量读取日志文件
+
+    - 文件保持打开，每次只读取新增的字节
+    - 通过 inode 判断日志是否被轮转（RotatingFileHandler 会把文件改名后新建），
+      轮转后先读完旧文件剩余内容再切换到新文件；文件被截断时从头读取
+    - 每个轮询周期内新增的完整行合并成一批交给 on_lines，不完整的行留到下次
+    - Windows 上打开的文件无法被改名，会导致日志轮转失败，因此每次读取后关闭，
+      下次按记录的位置重新打开
+    """
+
+    DEFAULT_INTERVAL = 0.2  # 轮询间隔（秒）
+    READ_SIZE = 256 * 1024  # 每次最多读取的字节数，避免一次读入超大文件
+
+    def __init__(self, path, on_lines, interval=None, from_end=False):
+        """
+        Args:
+            path: 日志文件路径
+            on_lines: 回调 on_lines(text)，text 为若干完整行（不含末尾换行），在后台线程中调用
+            interval: 轮询间隔（秒）
+            from_end: 是否跳过已有内容，只读取之后新增的部分
+        """
+        self.path = path
+        self.on_lines = on_lines
+        self.interval = interval or self.DEFAULT_INTERVAL
+        self.keep_open = os.name != "nt"
+        self._from_end = from_end
+        self._file = None
+        self._inode = None
+        self._position = 0
+        self._partial = b""
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="log-tailer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except OSError:
+                self._close()
+            self._stop.wait(self.interval)
+
+    def _open(self, stat):
+        self._file = open(self.path, "rb")
+        if self._inode is None and self._from_end:
+            self._position = stat.st_size
+        elif self._inode != _inode_of(stat):
+            # 新文件（首次打开或轮转后）从头读取
+            self._position = 0
+        self._inode = _inode_of(stat)
+        self._file.seek(self._position)
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _read_available(self):
+        """读取当前文件中新增的全部内容"""
+        chunks = []
+        while True:
+            data = self._file.read(self.READ_SIZE)
+            if not data:
+                break
+            chunks.append(data)
+        self._position = self._file.tell()
+        return b"".join(chunks)
+
+    def poll(self):
+        """读取一次新增内容，有完整行时调用 on_lines"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            stat = None
+
+        if self._file is not None and (stat is None or _inode_of(stat) != self._inode):
+            # 已被轮转：先读完旧文件中轮转前写入的内容
+            rest = self._partial + self._read_available()
+            self._partial = b""
+            self._close()
+            if rest:
+                self.on_lines(rest.rstrip(b"\n").decode("utf-8", errors="replace"))
+        if stat is None:
+            return
+
+        if self._file is None:
+            self._open(stat)
+        if stat.st_size < self._position:
+            # 文件被截断
+            self._file.seek(0)
+            self._position = 0
+            self._partial = b""
+        data = self._read_available()
+        if not self.keep_open:
+            self._close()
+        self._emit(data)
+
+    def _emit(self, data):
+        if not data:
+            return
+        data = self._partial + data
+        complete, separator, self._partial = data.rpartition(b"\n")
+        if separator:
+            self.on_lines(complete.decode("utf-8", errors="replace"))
+
+
+def _inode_of(stat):
+    return (stat.st_dev, stat.st_ino)
@@ -0,0 +1,189 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from logging.handlers import RotatingFileHandler
+
+from .logger import create_async_handler, logger
+from .metrics import get_registry
+
+
+class Trace:
+    """单次语音的追踪记录
+
+    从按下按键到文本输入完成，各阶段以 span 的形式记录起止时间（time.monotonic），
+    完成后交给 TraceRecorder 写入 JSONL 并更新延迟统计。
+    """
+
+    def __init__(self, mode, recorder=None, start_time=None):
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.mode = mode
+        self.recorder = recorder
+        self.start_time = start_time if start_time is not None else time.monotonic()
+        self.wall_time = time.time()
+        self.attributes = {}
+        self.spans = []
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def add_span(self, name, start, end=None):
+        """记录一个阶段，start/end 为 time.monotonic() 时间"""
+        end = time.monotonic() if end is None else end
+        with self._lock:
+            self.spans.append((name, start, end))
+
+    @contextlib.contextmanager
+    def span(self, name):
+        """记录 with 代码块的耗时"""
+        start = time.monotonic()
+        try:
+            yield self
+        finally:
+            self.add_span(name, start)
+
+    def set(self, **attributes):
+        """附加属性，如 provider、音频时长、上传字节数"""
+        with self._lock:
+            self.attributes.update(attributes)
+
+    def finish(self, **attributes):
+        """结束追踪并提交记录，重复调用只生效一次"""
+        with self._lock:
+            if self.finished:
+                return
+            self.finished = True
+            self.attributes.update(attributes)
+        if self.recorder is not None:
+            self.recorder.record(self)
+
+    def to_dict(self):
+        end = max((span[2] for span in self.spans), default=self.start_time)
+        return {
+            "trace_id": self.trace_id,
+            "mode": self.mode,
+            "time": self.wall_time,
+            "total_ms": round((end - self.start_time) * 1000, 1),
+            "spans": [
+                {
+                    "name": name,
+                    "start_ms": round((start - self.start_time) * 1000, 1),
+                    "duration_ms": round((end - start) * 1000, 1),
+                }
+                for name, start, end in self.spans
+            ],
+            **self.attributes,
+        }
+
+
+def span(trace, name):
+    """trace 可能为空时使用的 span"""
+    return trace.span(name) if trace is not None else contextlib.nullcontext()
+
+
+class HttpTraceHook:
+    """httpx 的 trace 扩展回调，把一次请求拆分为连接、上传、服务端处理和下载阶段
+
+    用法: client.post(..., extensions={"trace": HttpTraceHook(trace)})
+    """
+
+    # httpcore 事件（去掉 http11/http2/connection 前缀）-> (结束的阶段, 开始的阶段)
+    EVENTS = {
+        "connect_tcp.started": (None, "connect"),
+        "send_request_headers.started": ("connect", "upload"),
+        "send_request_body.complete": ("upload", "provider"),
+        "receive_response_headers.complete": ("provider", "download"),
+        "receive_response_body.complete": ("download", None),
+    }
+
+    def __init__(self, trace):
+        self.trace = trace
+        self._started = {}
+
+    def __call__(self, event_name, info):
+        # 事件名形如 http11.send_request_body.complete
+        stages = self.EVENTS.get(event_name.split(".", 1)[-1])
+        if stages is None:
+            return
+        now = time.monotonic()
+        ended, started = stages
+        # 复用连接时没有 connect 阶段
+        start = self._started.pop(ended, None)
+        if start is not None:
+            self.trace.add_span(ended, start, now)
+        if started is not None:
+            self._started[started] = now
+
+
+class TraceRecorder:
+    """把完成的追踪写入滚动 JSONL 文件，并更新各阶段的延迟分位数统计"""
+
+    def __init__(self, path=None, registry=None):
+        self.path = path or os.getenv("TRACE_FILE", "logs/traces.jsonl")
+        self.registry = registry or get_registry()
+        self.listeners = []  # 追踪完成后的回调，如历史记录、事件通道
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        file_handler = RotatingFileHandler(
+            self.path,
+            maxBytes=5*1024*1024,  # 5MB
+            backupCount=5,
+            encoding='utf-8'
+        )
+        file_handler.setFormatter(logging.Formatter('%(message)s'))
+        self._logger = logging.getLogger("whisper_input.traces")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        for handler in self._logger.handlers[:]:
+            self._logger.removeHandler(handler)
+        for handler in create_async_handler(file_handler):
+            self._logger.addHandler(handler)
+
+    def record(self, trace):
+        data = trace.to_dict()
+        self._update_metrics(data)
+        # 追踪文件只记录耗时，识别文本由历史记录保存
+        self._logger.info(json.dumps({k: v for k, v in data.items() if k != "text"}, ensure_ascii=False))
+        for listener in self.listeners:
+            try:
+                listener(data)
+            except Exception as e:
+                logger.error(f"处理追踪记录失败: {e}", exc_info=True)
+
+    def _update_metrics(self, data):
+        """按服务商更新延迟直方图和计数器"""
+        provider = data.get("provider", "none")
+        registry = self.registry
+        for item in data["spans"]:
+            registry.observe("stage_seconds", item["duration_ms"] / 1000, stage=item["name"], provider=provider)
+        registry.observe("utterance_seconds", data["total_ms"] / 1000, provider=provider)
+        registry.inc("utterances", mode=data["mode"], provider=provider,
+                     result="error" if data.get("error") else "ok")
+        if data.get("error"):
+            registry.inc("errors", provider=provider, kind=data.get("error_kind", "error"))
+        if data.get("audio_bytes"):
+            registry.inc("upload_bytes", data["audio_bytes"], provider=provider)
+        if data.get("audio_seconds"):
+            registry.inc("audio_seconds", data["audio_seconds"], provider=provider)
+        span_names = {item["name"] for item in data["spans"]}
+        if "upload" in span_names:
+            # 复用长连接时没有 connect 阶段
+            registry.inc("http_connections", provider=provider,
+                         result="new" if "connect" in span_names else "reused")
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_trace_recorder():
+    """获取进程内共享的追踪记录器，TRACE_ENABLED=false 时返回 None"""
+    global _recorder
+    if os.getenv("TRACE_ENABLED", "true").lower() != "true":
+        return None
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                _recorder = TraceRecorder()
+    return _recorder